@@ -2,65 +2,217 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response
 from starlette.middleware.sessions import SessionMiddleware
 
+from company_summary import (
+    COMPANIES_PAGE_SIZE,
+    afetch_company_page,
+    afetch_examples,
+    fetch_company_page,
+    fetch_examples,
+)
+from db_async import DB_DRIVER, async_pool_stats, create_async_pool
+from db_pool import create_pool
+from history import (
+    HistoryError,
+    as_of,
+    company_timeline,
+    diff_runs,
+    list_history_runs,
+    parse_when,
+    payloads_as_of,
+)
+from page_cache import (
+    PAGE_CACHE_ENABLED,
+    PageCache,
+    VersionPoller,
+    cache_headers,
+    etag_matches,
+    make_etag,
+)
+from queries import afetch_company_bundle, fetch_company_bundle
+from screener import SCREEN_LIMIT, Screener, ScreenError
+from search import create_search_engine
+from statements import (
+    StatementError,
+    afetch_statement,
+    encode_body,
+    fetch_statement,
+    parse_fields,
+    statement_payload,
+)
+from web_metrics import (
+    METRICS,
+    WEB_METRICS_ENABLED,
+    MetricsMiddleware,
+    TimedTemplates,
+    async_cursor_factory,
+    sync_cursor_factory,
+)
+from warmup import (
+    WARMUP_ENABLED,
+    FingerprintedStaticFiles,
+    Readiness,
+    StaticAssets,
+    start_warmup,
+    warm_templates,
+)
+
+
+# ================= LIFESPAN (POOLS + SEARCH + PAGE CACHE + SCREENER + WARMUP) =================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pool per process, opened lazily on first checkout; with
+    # DB_DRIVER=async it only serves search and the cache poller.
+    # Cursors time every query into web_metrics (WEB_METRICS=0: plain)
+    app.state.db_pool = create_pool(cursor_factory=sync_cursor_factory())
+
+    app.state.db_apool = None
+    if DB_DRIVER == "async":
+        app.state.db_apool = create_async_pool(cursor_factory=async_cursor_factory())
+        await app.state.db_apool.open()
+
+    # pg_trgm when the extension exists, in-memory trigram index otherwise
+    # (decided on the first search that reaches the DB)
+    app.state.search = create_search_engine(app.state.db_pool)
+
+    # company x year panel, loaded on the first screen
+    app.state.screener = Screener(app.state.db_pool)
+
+    # rendered company pages are dropped, screener rows reloaded and the
+    # in-memory search index rebuilt when the loaders bump content_versions
+    app.state.page_cache = PageCache() if PAGE_CACHE_ENABLED else None
+    app.state.version_poller = VersionPoller(
+        app.state.db_pool,
+        app.state.page_cache,
+        listeners=[app.state.screener.on_versions, app.state.search.on_versions]
+    )
+    app.state.version_poller.start()
+
+    # static fingerprints and compiled templates before the first request;
+    # pools, search index and screener panel warm in the background and
+    # /ready says when (WARMUP=0: all of it on first use)
+    app.state.readiness = Readiness()
+    app.state.warmup = None
+    if WARMUP_ENABLED:
+        app.state.readiness.run("static", assets.scan)
+        app.state.readiness.run("templates", warm_templates, templates)
+        app.state.warmup = start_warmup(app.state, app.state.readiness)
+
+    yield
+
+    if app.state.warmup is not None:
+        app.state.warmup.cancel()
+    app.state.version_poller.stop()
+    if app.state.db_apool is not None:
+        await app.state.db_apool.close()
+    app.state.db_pool.close()
+
+
 # ================= APP =================
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     SessionMiddleware,
     secret_key=os.getenv("SESSION_SECRET", "dev-secret")
 )
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
-
-# ================= DB (RENDER SAFE) =================
-def get_db():
-    conn = psycopg2.connect(
-        os.environ["DATABASE_URL"],
-        sslmode="require",
-        connect_timeout=5,
-        cursor_factory=RealDictCursor
+# outermost: latency per route template, DB vs render time, Server-Timing
+if WEB_METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# {{ static_url('home.css') }} -> /static/home.css?v=<content hash>
+assets = StaticAssets("static")
+app.mount("/static", FingerprintedStaticFiles(assets), name="static")
+templates = TimedTemplates(directory="templates")
+templates.env.globals["static_url"] = assets.url
+
+# ================= DB (POOLED, SYNC OR ASYNC) =================
+async def db_run(request: Request, sync_fn, async_fn, *args):
+    """
+    Runs one data-access function on the configured driver:
+      sync  -> sync_fn(conn, *args) on a psycopg2 connection, in the threadpool
+      async -> await async_fn(conn, *args) on a psycopg 3 connection
+    Both get autocommit connections with dict rows.
+    """
+    if DB_DRIVER == "async":
+        async with request.app.state.db_apool.connection() as conn:
+            return await async_fn(conn, *args)
+
+    def call():
+        with request.app.state.db_pool.connection() as conn:
+            return sync_fn(conn, *args)
+
+    return await run_in_threadpool(call)
+
+
+# ================= POOL STATS =================
+@app.get("/health/db")
+def db_health(request: Request):
+    stats = {"driver": DB_DRIVER, **request.app.state.db_pool.stats()}
+    if request.app.state.db_apool is not None:
+        stats["async"] = async_pool_stats(request.app.state.db_apool)
+    return JSONResponse(stats)
+
+
+# ================= READINESS =================
+@app.get("/ready")
+def ready(request: Request):
+    # 503 until pools, search index and screener panel are warm
+    readiness = request.app.state.readiness
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+# ================= PAGE CACHE STATS =================
+@app.get("/health/cache")
+def cache_health(request: Request):
+    cache = request.app.state.page_cache
+    if cache is None:
+        return JSONResponse({"enabled": False})
+
+    return JSONResponse({
+        "enabled": True,
+        **cache.stats(),
+        "poller": request.app.state.version_poller.stats(),
+    })
+
+
+# ================= SCREENER STATS =================
+@app.get("/health/screener")
+def screener_health(request: Request):
+    return JSONResponse(request.app.state.screener.stats())
+
+
+# ================= METRICS =================
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape target (this process only)
+    return PlainTextResponse(
+        METRICS.prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
     )
-    conn.autocommit = True   # 🔥 VERY IMPORTANT
-    return conn
+
+
+@app.get("/health/queries")
+def queries_health(limit: int = 20):
+    # slowest SQL fingerprints by total time, recent slow queries
+    return JSONResponse(METRICS.query_report(limit))
 
 
 # ================= HOME =================
 @app.get("/", response_class=HTMLResponse)
-def home(request: Request):
+async def home(request: Request):
     error = request.session.pop("error", None)  # 🔥 THIS LINE WAS MISSING
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        SELECT DISTINCT c.company_id, c.company_name
-        FROM companies c
-        WHERE EXISTS (
-            SELECT 1 FROM analysis a WHERE a.company_id = c.company_id
-        )
-        AND EXISTS (
-            SELECT 1 FROM prosandcons p
-            WHERE p.company_id = c.company_id
-              AND (p.pros IS NOT NULL OR p.cons IS NOT NULL)
-        )
-        ORDER BY c.company_name
-        LIMIT 5
-    """)
-
-    examples = cur.fetchall()
-
-    cur.close()
-    db.close()
+    # precomputed "has analysis + pros/cons" flag, index-only scan
+    examples = await db_run(request, fetch_examples, afetch_examples)
 
     return templates.TemplateResponse(
         "home.html",
@@ -82,122 +234,221 @@ def search(q: str, request: Request):
         request.session["error"] = "Please enter a company name"
         return RedirectResponse("/", status_code=302)
 
-    db = get_db()
-    cur = db.cursor()
+    # best ranked match (exact symbol always wins)
+    matches = request.app.state.search.search(q, limit=1)
 
-    cur.execute("""
-        SELECT company_id
-        FROM companies
-        WHERE company_id ILIKE %s
-           OR company_name ILIKE %s
-        LIMIT 1
-    """, (f"%{q}%", f"%{q}%"))
-
-    row = cur.fetchone()
-
-    cur.close()
-    db.close()
-
-    if not row:
+    if not matches:
         request.session["error"] = f"No company found for '{q}'"
         return RedirectResponse("/", status_code=302)
 
-    return RedirectResponse(f"/company/{row['company_id']}", status_code=302)
+    return RedirectResponse(f"/company/{matches[0]['company_id']}", status_code=302)
 
 
-# ================= ALL COMPANIES =================
-@app.get("/companies", response_class=HTMLResponse)
-def companies(request: Request):
-    db = get_db()
-    cur = db.cursor()
+# ================= SEARCH API (TYPEAHEAD) =================
+@app.get("/api/search")
+def api_search(request: Request, q: str = "", limit: int = 10):
+    start = time.perf_counter()
+    engine = request.app.state.search
+    matches = engine.search(q, limit=max(1, min(limit, 50)))
+    took = (time.perf_counter() - start) * 1000
+
+    return JSONResponse(
+        {"query": q, "backend": engine.backend, "results": matches},
+        headers={"Server-Timing": f"search;dur={took:.2f}"}
+    )
 
-    cur.execute("""
-        SELECT company_id, company_name, company_logo
-        FROM companies
-        ORDER BY company_name
-    """)
 
-    companies = cur.fetchall()
+# ================= STATEMENTS API =================
+@app.get("/api/companies/{cid}/{statement}")
+async def api_statement(
+    request: Request,
+    cid: str,
+    statement: str,
+    fields: Optional[str] = None,
+    from_year: Optional[int] = None,
+    to_year: Optional[int] = None,
+    shape: str = "rows"
+):
+    # ?fields=sales,net_profit&from_year=2018&to_year=2024&shape=columns
+    try:
+        picked = parse_fields(statement, fields)
+        rows = await db_run(
+            request, fetch_statement, afetch_statement,
+            cid, statement, picked, from_year, to_year
+        )
+        if rows is None:
+            raise StatementError(f"company '{cid}' not found", status_code=404)
+        payload = statement_payload(cid, statement, picked, rows, shape)
+    except StatementError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+    body, encoding = encode_body(payload, request.headers.get("accept-encoding"))
+    headers = {**cache_headers(make_etag(body)), "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# ================= SCREENER =================
+@app.get("/api/screen")
+def api_screen(
+    request: Request,
+    q: str = "",
+    sort: str = "",
+    limit: int = SCREEN_LIMIT,
+    fields: Optional[str] = None
+):
+    # ?q=roe > 20 and sales_cagr_5y > 15%25 and debt_equity < 0.5&sort=-opm
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        result = request.app.state.screener.screen(q, sort, limit, columns)
+    except ScreenError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse(
+        {"query": q, "sort": sort, **result},
+        headers={"Server-Timing": f"screen;dur={result['took_ms']:.2f}"}
+    )
 
-    cur.close()
-    db.close()
+
+@app.get("/screen", response_class=HTMLResponse)
+def screen(request: Request, q: str = "", sort: str = "", limit: int = SCREEN_LIMIT):
+    error, result = None, None
+    if q or sort:
+        try:
+            result = request.app.state.screener.screen(q, sort, limit)
+        except ScreenError as e:
+            error = str(e)
 
     return templates.TemplateResponse(
-        "list.html",
+        "screen.html",
         {
             "request": request,
-            "companies": companies
+            "q": q,
+            "sort": sort,
+            "limit": limit,
+            "result": result,
+            "error": error
         }
     )
 
 
-# ================= COMPANY PAGE =================
-@app.get("/company/{cid}", response_class=HTMLResponse)
-def company(cid: str, request: Request):
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("SELECT * FROM companies WHERE company_id=%s", (cid,))
-    company = cur.fetchone()
-
-    if not company:
-        cur.close()
-        db.close()
-        return HTMLResponse("Company not found", status_code=404)
+# ================= HISTORY (TIME TRAVEL + DIFF) =================
+def history_response(request: Request, fn, *args):
+    # fn(conn, *args) on a pooled connection; orjson (datetimes) + compression
+    try:
+        with request.app.state.db_pool.connection() as conn:
+            payload = fn(conn, *args)
+    except HistoryError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+    body, encoding = encode_body(payload, request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/history/runs")
+def api_history_runs(request: Request):
+    return history_response(request, lambda conn: {"runs": list_history_runs(conn)})
+
+
+@app.get("/api/history/as-of")
+def api_history_as_of(request: Request, at: str):
+    # ?at=2024-06-30 -> which version of every company was current then
+    def run(conn):
+        when = parse_when(at)
+        return {"at": when, "companies": as_of(conn, when)}
+    return history_response(request, run)
+
+
+@app.get("/api/history/companies/{cid}")
+def api_history_company(request: Request, cid: str, at: Optional[str] = None):
+    # no ?at -> the company's versions; ?at=... -> its payload as of then
+    def run(conn):
+        if at is None:
+            return {"company_id": cid, "versions": company_timeline(conn, cid)}
+        payload = next(payloads_as_of(conn, parse_when(at), [cid]), None)
+        if payload is None:
+            raise HistoryError(f"no history for '{cid}' as of {at}", status_code=404)
+        return payload
+    return history_response(request, run)
+
+
+@app.get("/api/history/diff")
+def api_history_diff(
+    request: Request,
+    from_run: str,
+    to_run: str,
+    fields: bool = True,
+    companies: Optional[str] = None
+):
+    # ?from_run=20240601T000000Z&to_run=20240701T000000Z&fields=false
+    ids = [c.strip() for c in companies.split(",") if c.strip()] if companies else None
+    return history_response(request, diff_runs, from_run, to_run, fields, ids)
 
-    cur.execute("SELECT * FROM analysis WHERE company_id=%s", (cid,))
-    analysis = cur.fetchall()
 
-    cur.execute(
-        "SELECT pros FROM prosandcons WHERE company_id=%s AND pros IS NOT NULL",
-        (cid,)
+# ================= ALL COMPANIES =================
+@app.get("/companies", response_class=HTMLResponse)
+async def companies(
+    request: Request,
+    after: Optional[str] = None,
+    limit: int = COMPANIES_PAGE_SIZE
+):
+    # keyset pagination over company_summary (name order)
+    companies, next_cursor = await db_run(
+        request, fetch_company_page, afetch_company_page, after, limit
     )
-    pros = cur.fetchall()
 
-    cur.execute(
-        "SELECT cons FROM prosandcons WHERE company_id=%s AND cons IS NOT NULL",
-        (cid,)
+    return templates.TemplateResponse(
+        "list.html",
+        {
+            "request": request,
+            "companies": companies,
+            "after": after,
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
     )
-    cons = cur.fetchall()
 
-    cur.execute(
-        "SELECT * FROM balancesheet WHERE company_id=%s ORDER BY year",
-        (cid,)
-    )
-    balancesheet = cur.fetchall()
 
-    cur.execute(
-        "SELECT * FROM profitandloss WHERE company_id=%s ORDER BY year",
-        (cid,)
-    )
-    profitandloss = cur.fetchall()
+# ================= COMPANY PAGE =================
+@app.get("/company/{cid}", response_class=HTMLResponse)
+async def company(cid: str, request: Request):
+    cache = request.app.state.page_cache
+    cached = cache.get(cid) if cache is not None else None
+
+    if cached is not None:
+        body, etag = cached
+    else:
+        # read before the DB so an invalidation during render isn't lost
+        version = cache.version(cid) if cache is not None else 0
+
+        bundle = await db_run(
+            request, fetch_company_bundle, afetch_company_bundle, cid
+        )
 
-    cur.execute(
-        "SELECT * FROM cashflow WHERE company_id=%s ORDER BY year",
-        (cid,)
-    )
-    cashflow = cur.fetchall()
+        if not bundle:
+            return HTMLResponse("Company not found", status_code=404)
 
-    cur.execute(
-        "SELECT * FROM documents WHERE company_id=%s ORDER BY year DESC",
-        (cid,)
-    )
-    documents = cur.fetchall()
+        body = templates.TemplateResponse(
+            "company.html",
+            {"request": request, **bundle}
+        ).body
 
-    cur.close()
-    db.close()
+        if cache is not None:
+            etag = cache.put(cid, body, version)
+        else:
+            etag = make_etag(body)
 
-    return templates.TemplateResponse(
-        "company.html",
-        {
-            "request": request,
-            "company": company,
-            "analysis": analysis,
-            "pros": pros,
-            "cons": cons,
-            "balancesheet": balancesheet,
-            "profitandloss": profitandloss,
-            "cashflow": cashflow,
-            "documents": documents
-        }
-    )
+    headers = cache_headers(etag)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return HTMLResponse(body, headers=headers)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the fetch / clean / load / serve hot paths.
+
+Run modules with python -m benchmarks.<name> from the repo root.
+"""
@@ -0,0 +1,130 @@
+"""
+Throughput and tail latency of the sync vs async DB drivers under load.
+
+    python -m benchmarks.bench_async --concurrency 8 32 --duration 10
+
+Starts one uvicorn process per driver (DB_DRIVER=sync / async, page cache
+off so every request hits the DB) and drives a mix of /, /companies and
+/company/{cid} with httpx.AsyncClient. Needs DATABASE_URL with companies
+already loaded (and DB_SSLMODE=disable locally).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import psycopg2
+
+from db_pool import DB_SSLMODE
+
+HOST = "127.0.0.1"
+
+
+def company_ids(limit: int):
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute("SELECT company_id FROM companies ORDER BY company_id LIMIT %s", (limit,))
+    ids = [r[0] for r in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return ids
+
+
+def start_server(driver: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DB_DRIVER=driver, PAGE_CACHE="0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", HOST,
+         "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+
+async def wait_ready(base: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health/db")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"❌ server at {base} did not come up")
+
+
+async def load(base: str, urls, concurrency: int, duration: float):
+    latencies, errors = [], 0
+    url_iter = itertools.cycle(urls)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        # warm the pool and templates
+        for u in urls[:10]:
+            await client.get(u)
+
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(next(url_iter))
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                else:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        took = time.perf_counter() - t0
+
+    return latencies, errors, took
+
+
+def report(driver: str, concurrency: int, latencies, errors: int, took: float) -> None:
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    print(f"{driver:>5}  c={concurrency:<4} {len(latencies) / took:8.1f} req/s  "
+          f"p50 {p(0.5):7.2f} ms  p99 {p(0.99):7.2f} ms  errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--drivers", nargs="+", default=["sync", "async"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    ids = company_ids(args.companies)
+    if not ids:
+        raise SystemExit("❌ no companies loaded")
+    urls = [f"/company/{cid}" for cid in ids] + ["/", "/companies"]
+
+    for i, driver in enumerate(args.drivers):
+        port = args.port + i
+        base = f"http://{HOST}:{port}"
+        server = start_server(driver, port)
+        try:
+            asyncio.run(wait_ready(base))
+            for c in args.concurrency:
+                report(driver, c, *asyncio.run(load(base, urls, c, args.duration)))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
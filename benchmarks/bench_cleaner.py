@@ -0,0 +1,162 @@
+"""
+Financial row cleaning: the per-row clean_financial_rows (memoized
+parsers, caches warm after the check) vs the vectorized
+clean_financial_frame.
+
+    python -m benchmarks.bench_cleaner --companies 10000
+
+Before timing anything it checks that both give identical values, on a
+corpus of edge cases and on every synthetic row, and exits non-zero if
+they don't (tests/test_cleaner_equivalence.py runs the same check on a
+smaller universe). Timed on two shapes of the same universe:
+  api    - what the API sends (ints, "25%", "Mar 2015")
+  messy  - 15% of numbers replaced by "1,234" / "12%" / " 12 " / "NA" / None
+"""
+import argparse
+import copy
+import math
+import random
+import sys
+import time
+
+import pandas as pd
+
+from pandas_cleaner import NON_NUMERIC_KEYS, clean_financial_frame, clean_financial_rows
+from benchmarks.synthetic import make_universe
+
+STATEMENTS = ("balancesheet", "profitandloss", "cashflow")
+
+# values the API has been seen to send (plus some it hopefully won't)
+EDGE_VALUES = [
+    None, 0, 1, -7, 1234, 12.5, -0.25, 10**15, True, False,
+    "", "   ", "NULL", "null", " NA ", "n/a", "N/A", "-", "--", "abc",
+    "1,234", "-1,234.50", "12%", "12.", ".5", "-.5", "+3", "1e5", "1E-3",
+    "10 Years: 11%", "TTM: -4%", "12.5.3", "1-2", "10--20", "3 - 4", "x 1.5",
+    "Rs. 1,00,000 Cr", "(123)", " 42 ", "4 2", "\x1c7\x1c", "٣", "１２", "inf", "nan",
+    "12\n%", [1, 2], {"a": 1}, (3,),
+]
+
+EDGE_YEARS = [
+    None, 2015, 1999, 0, "Mar 2015", "Dec 2012", "FY 2020", "FY20", "2015-16",
+    "Mar2015", "12 2099", "1899", "Sep 1990 / Mar 2001", "", "TTM", 2015.0,
+    "Mar ٢٠١٥", [2015],
+]
+
+
+def edge_rows():
+    rng = random.Random(7)
+    rows = []
+    for i in range(2000):
+        row = {"id": f"E{i}", "company_id": f"C{i % 17}",
+               "year": rng.choice(EDGE_YEARS)}
+        for col in ("sales", "tax_percentage", "Net_Profit"):
+            # drop keys now and then: rows don't all share a schema
+            if rng.random() > 0.1:
+                row[col] = rng.choice(EDGE_VALUES)
+        rows.append(row)
+    return rows
+
+
+def messy(rows, rng):
+    # the synthetic API is mostly ints; mix in the string forms the real
+    # one sends so the string path gets exercised
+    for r in rows:
+        for k, v in r.items():
+            if isinstance(v, int) and rng.random() < 0.15:
+                r[k] = rng.choice([f"{v:,}", f"{v}%", "NA", f" {v} ", None])
+    return rows
+
+
+def frame_rows(frame, rows):
+    # frame back to clean_financial_rows() shape: each row's own keys
+    cols = {c: frame[c].astype(object).where(frame[c].notna(), None).tolist()
+            for c in frame.columns}
+    return [
+        {k: (v if k.lower() in NON_NUMERIC_KEYS and k.lower() != "year"
+             else cols[k][i])
+         for k, v in r.items()}
+        for i, r in enumerate(rows)
+    ]
+
+
+def same(a, b) -> bool:
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def check(name, rows) -> bool:
+    expected = clean_financial_rows(rows)
+    got = frame_rows(clean_financial_frame(rows), rows)
+
+    for e, g in zip(expected, got):
+        if list(e) != list(g) or not all(same(e[k], g[k]) for k in e):
+            print(f"❌ equivalence: {name}")
+            print("   expected", e)
+            print("   got     ", g)
+            return False
+
+    print(f"✅ equivalence: {name} ({len(rows):,} rows)")
+    return True
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def run(shape, rows):
+    print(f"\n== {shape}")
+    base_total = frame_total = n = 0.0
+
+    for s in STATEMENTS:
+        r = rows[s]
+        raw = pd.DataFrame(r, dtype=object)
+
+        base = timed(clean_financial_rows, r)
+        to_df = timed(lambda: pd.DataFrame(clean_financial_rows(r)))
+        frame = timed(clean_financial_frame, r)
+        columnar = timed(clean_financial_frame, raw)
+
+        base_total += base
+        frame_total += frame
+        n += len(r)
+        print(f"{s:<14} {len(r):>9,} rows  per-row {base:5.2f}s  "
+              f"per-row+DataFrame {to_df:5.2f}s  "
+              f"frame {frame:5.2f}s (x{to_df / frame:.1f})  "
+              f"frame from DataFrame {columnar:5.2f}s (x{to_df / columnar:.1f})")
+
+    print(f"total {n:,.0f} rows: per-row {n / base_total:,.0f} rows/s, "
+          f"frame {n / frame_total:,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=12)
+    args = parser.parse_args()
+
+    api = {s: [] for s in STATEMENTS}
+    for p in make_universe(args.companies, years=args.years):
+        for s in STATEMENTS:
+            api[s].extend(p["data"][s])
+
+    rng = random.Random(0)
+    dirty = {s: messy(copy.deepcopy(api[s]), rng) for s in STATEMENTS}
+
+    ok = check("edge cases", edge_rows())
+    for s in STATEMENTS:
+        ok = check(f"api {s}", api[s]) and ok
+        ok = check(f"messy {s}", dirty[s]) and ok
+    if not ok:
+        sys.exit(1)
+
+    run("api", api)
+    run("messy", dirty)
+
+
+if __name__ == "__main__":
+    main()
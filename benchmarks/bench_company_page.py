@@ -0,0 +1,163 @@
+"""
+Company-page query latency before / after migrations.
+
+    python -m benchmarks.bench_company_page --sizes 100 5000
+
+Builds a throwaway schema per size (search_path isolated, dropped at the
+end), loads synthetic companies, and times both the legacy eight-query
+page and queries.fetch_company_bundle with and without the migration
+indexes. Needs DATABASE_URL (and DB_SSLMODE=disable for a local server).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from db_init import create_tables
+from db_pool import DB_SSLMODE
+from migrations import migrate
+from queries import fetch_company_bundle
+from benchmarks.synthetic import company_ids, make_universe
+
+SCHEMA = "bench_company_page"
+
+LEGACY_QUERIES = [
+    "SELECT * FROM companies WHERE company_id=%s",
+    "SELECT * FROM analysis WHERE company_id=%s",
+    "SELECT pros FROM prosandcons WHERE company_id=%s AND pros IS NOT NULL",
+    "SELECT cons FROM prosandcons WHERE company_id=%s AND cons IS NOT NULL",
+    "SELECT * FROM balancesheet WHERE company_id=%s ORDER BY year",
+    "SELECT * FROM profitandloss WHERE company_id=%s ORDER BY year",
+    "SELECT * FROM cashflow WHERE company_id=%s ORDER BY year",
+    "SELECT * FROM documents WHERE company_id=%s ORDER BY year DESC",
+]
+
+COLUMNS = {
+    "analysis": ["company_id", "compounded_sales_growth",
+                 "compounded_profit_growth", "stock_price_cagr", "roe"],
+    "prosandcons": ["company_id", "pros", "cons"],
+    "balancesheet": ["company_id", "year", "equity_capital", "reserves",
+                     "borrowings", "other_liabilities", "total_liabilities",
+                     "fixed_assets", "cwip", "investments",
+                     "other_asset", "total_assets"],
+    "profitandloss": ["company_id", "year", "sales", "expenses",
+                      "operating_profit", "opm_percentage", "other_income",
+                      "interest", "depreciation", "profit_before_tax",
+                      "tax_percentage", "net_profit", "eps", "dividend_payout"],
+    "cashflow": ["company_id", "year", "operating_activity",
+                 "investing_activity", "financing_activity", "net_cash_flow"],
+}
+
+COMPANY_COLUMNS = ["company_id", "company_logo", "company_name", "chart_link",
+                   "about_company", "website", "nse_profile", "bse_profile",
+                   "face_value", "book_value", "roce_percentage", "roe_percentage"]
+
+
+def load(cur, n: int) -> None:
+    companies, docs = [], []
+    rows: Dict[str, List[tuple]] = {t: [] for t in COLUMNS}
+
+    for payload in make_universe(n):
+        c = payload["company"]
+        companies.append(tuple(
+            c["id"] if col == "company_id" else c.get(col) for col in COMPANY_COLUMNS
+        ))
+        for table, cols in COLUMNS.items():
+            rows[table].extend(
+                tuple(r.get(col) for col in cols) for r in payload["data"][table]
+            )
+        docs.extend(
+            (c["id"], d["Year"], d["Annual_Report"]) for d in payload["data"]["documents"]
+        )
+
+    execute_values(cur, f"INSERT INTO companies ({','.join(COMPANY_COLUMNS)}) VALUES %s",
+                   companies, page_size=1000)
+    for table, cols in COLUMNS.items():
+        execute_values(cur, f"INSERT INTO {table} ({','.join(cols)}) VALUES %s",
+                       rows[table], page_size=1000)
+    execute_values(cur, "INSERT INTO documents (company_id, year, annual_report) VALUES %s",
+                   docs, page_size=1000)
+
+
+def time_page(conn, ids: List[str], repeat: int, legacy: bool) -> Dict[str, float]:
+    cur = conn.cursor()
+    samples = []
+
+    for cid in random.Random(42).choices(ids, k=repeat):
+        t0 = time.perf_counter()
+        if legacy:
+            for sql in LEGACY_QUERIES:
+                cur.execute(sql, (cid,))
+                cur.fetchall()
+        else:
+            fetch_company_bundle(conn, cid)
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    cur.close()
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def run_size(dsn: str, n: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    conn = psycopg2.connect(dsn, sslmode=DB_SSLMODE, cursor_factory=RealDictCursor)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    create_tables(cur)
+    load(cur, n)
+    cur.execute("ANALYZE")
+    conn.commit()
+    conn.autocommit = True
+
+    ids = company_ids(n)
+    result = {
+        "legacy_no_index": time_page(conn, ids, repeat, legacy=True),
+        "bundle_no_index": time_page(conn, ids, repeat, legacy=False),
+    }
+
+    migrate(conn)
+    cur.execute("ANALYZE")
+
+    result["legacy_indexed"] = time_page(conn, ids, repeat, legacy=True)
+    result["bundle_indexed"] = time_page(conn, ids, repeat, legacy=False)
+
+    cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    cur.close()
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 5000])
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for n in args.sizes:
+        print(f"\n== {n} companies ==")
+        results[n] = run_size(os.environ["DATABASE_URL"], n, args.repeat)
+        for variant, r in results[n].items():
+            print(f"{variant:<18} p50 {r['p50_ms']:>8.3f} ms   p95 {r['p95_ms']:>8.3f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Fetch throughput against the local stub API: serial loop vs FetchEngine.
+
+    python -m benchmarks.bench_fetch --companies 200 --latency-ms 80
+
+The serial baseline is the old fetch_company() loop *without* its
+time.sleep(1) per company, so the speedup shown is a lower bound.
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.stub_api import api_url, serve
+from benchmarks.synthetic import company_ids
+from fetch_engine import FetchEngine
+
+
+def serial(url: str, ids) -> int:
+    ok = 0
+    for cid in ids:
+        r = requests.get(f"{url}?id={cid}&api_key=x", timeout=15)
+        if r.status_code == 200 and "company" in r.json():
+            ok += 1
+    return ok
+
+
+def engine_run(url: str, ids, concurrency: int, rate: float) -> dict:
+    with FetchEngine(base_url=url, api_key="x", concurrency=concurrency,
+                     rate=rate, burst=concurrency, verbose=False) as engine:
+        for _ in engine.iter_fetch(ids):
+            pass
+        return dict(engine.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--rate", type=float, default=0, help="req/s limit (0 = off)")
+    args = parser.parse_args()
+
+    server = serve(latency_ms=args.latency_ms, fail_rate=args.fail_rate)
+    url = api_url(server)
+    ids = company_ids(args.companies)
+
+    t0 = time.perf_counter()
+    ok = serial(url, ids)
+    base = time.perf_counter() - t0
+    print(f"serial            {base:7.2f} s  {len(ids) / base:7.1f} companies/s  ok={ok}")
+
+    for c in args.concurrency:
+        t0 = time.perf_counter()
+        stats = engine_run(url, ids, c, args.rate)
+        took = time.perf_counter() - t0
+        print(f"engine c={c:<3}      {took:7.2f} s  {len(ids) / took:7.1f} companies/s  "
+              f"ok={stats['ok']} retries={stats['retries']}  x{base / took:.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
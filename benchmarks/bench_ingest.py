@@ -0,0 +1,85 @@
+"""
+Raw-file ingest throughput for different parse-worker / writer counts.
+
+    python -m benchmarks.bench_ingest --companies 2000 --workers 1 4 8
+
+Writes synthetic raw_data files to a temp dir and ingests them into a
+throwaway schema. Needs DATABASE_URL (and DB_SSLMODE=disable locally).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import psycopg2
+
+from db_init import create_tables
+from db_pool import DB_SSLMODE
+from ingest import ingest_dir
+from migrations import migrate
+from benchmarks.synthetic import make_universe
+
+SCHEMA = "bench_ingest"
+
+
+def connect():
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    conn.commit()
+    cur.close()
+    return conn
+
+
+def fresh_schema() -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    create_tables(cur)
+    conn.commit()
+    cur.close()
+    migrate(conn)
+    conn.close()
+
+
+def drop_schema() -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as raw_dir:
+        for p in make_universe(args.companies):
+            with open(os.path.join(raw_dir, f"{p['company']['id']}.json"), "w") as f:
+                json.dump(p, f, indent=4)
+
+        for workers in args.workers:
+            for writers in args.writers:
+                fresh_schema()
+                t0 = time.perf_counter()
+                stats = ingest_dir(raw_dir, workers=workers, writers=writers,
+                                   connect=connect)
+                took = time.perf_counter() - t0
+                print(f"== workers={workers} writers={writers}: {took:.2f}s, "
+                      f"{args.companies / took:,.0f} companies/s, "
+                      f"{stats.total_rows / took:,.0f} rows/s\n")
+
+    drop_schema()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+/company/{cid} latency: cold (DB + render) vs cached vs 304 revalidation.
+
+    python -m benchmarks.bench_page_cache --companies 50 --rounds 20
+
+Runs the app in-process (TestClient) against DATABASE_URL, so the
+companies must already be loaded. Times include the ASGI round trip.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+import app as web
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return f"p50 {p(0.5):6.2f} ms  p95 {p(0.95):6.2f} ms  mean {statistics.mean(samples):6.2f} ms"
+
+
+def timed_get(client, url, headers=None):
+    t0 = time.perf_counter()
+    r = client.get(url, headers=headers or {})
+    return r, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with TestClient(web.app) as client:
+        with web.app.state.db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT company_id FROM companies ORDER BY company_id LIMIT %s",
+                        (args.companies,))
+            ids = [r["company_id"] for r in cur.fetchall()]
+            cur.close()
+
+        cache = web.app.state.page_cache
+        if cache is None:
+            raise SystemExit("page cache disabled (PAGE_CACHE=0)")
+        cache.clear()
+
+        cold, hit, revalidate = [], [], []
+        etags = {}
+
+        for cid in ids:
+            r, ms = timed_get(client, f"/company/{cid}")
+            cold.append(ms)
+            etags[cid] = r.headers["etag"]
+
+        for _ in range(args.rounds):
+            for cid in ids:
+                hit.append(timed_get(client, f"/company/{cid}")[1])
+                r, ms = timed_get(client, f"/company/{cid}",
+                                  {"If-None-Match": etags[cid]})
+                assert r.status_code == 304
+                revalidate.append(ms)
+
+        print(f"{len(ids)} companies, {args.rounds} rounds")
+        print(f"cold (DB + render)  {percentiles(cold)}")
+        print(f"cached 200          {percentiles(hit)}")
+        print(f"cached 304          {percentiles(revalidate)}")
+        print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
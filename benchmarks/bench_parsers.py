@@ -0,0 +1,112 @@
+"""
+Micro-benchmarks for the three pandas_cleaner parsers, memoized vs not.
+
+    python -m benchmarks.bench_parsers --companies 2000
+
+Inputs are every value the cleaners would see for a synthetic universe
+(statement cells, year labels, analysis "10 Years: 11%" strings, with
+some "NA" / "1,234" noise), fed in payload order.
+"""
+import argparse
+import random
+import time
+
+import pandas_cleaner
+from pandas_cleaner import (
+    clear_parse_caches,
+    extract_period,
+    extract_year,
+    parse_cache_stats,
+    to_float,
+)
+from benchmarks.synthetic import make_universe
+
+STATEMENTS = ("balancesheet", "profitandloss", "cashflow")
+ANALYSIS_KEYS = ("compounded_sales_growth", "compounded_profit_growth",
+                 "stock_price_cagr", "roe")
+
+
+def inputs(companies: int):
+    rng = random.Random(0)
+    numbers, years, periods = [], [], []
+
+    for p in make_universe(companies):
+        d = p["data"]
+        for s in STATEMENTS:
+            for r in d[s]:
+                years.append(r["year"])
+                for k, v in r.items():
+                    if k in ("id", "company_id", "year"):
+                        continue
+                    if isinstance(v, int) and rng.random() < 0.1:
+                        v = rng.choice(["NA", "NULL", f"{v:,}", f"{v}%"])
+                    numbers.append(v)
+        for r in d["analysis"]:
+            for k in ANALYSIS_KEYS:
+                numbers.append(r[k])
+                periods.append(r[k])
+
+    return numbers, years, periods
+
+
+def uncached(parser):
+    # the same parser with its LRU bypassed
+    inner = {
+        to_float: pandas_cleaner._text_float,
+        extract_year: pandas_cleaner._text_year,
+        extract_period: pandas_cleaner._text_period,
+    }[parser]
+    name = inner.__name__
+    setattr(pandas_cleaner, name, inner.__wrapped__)
+    return lambda: setattr(pandas_cleaner, name, inner)
+
+
+def best_of(fn, values, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for v in values:
+            fn(v)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    numbers, years, periods = inputs(args.companies)
+    strings = sum(isinstance(v, str) for v in numbers)
+    print(f"{len(numbers):,} to_float inputs ({strings:,} strings), "
+          f"{len(years):,} years, {len(periods):,} periods\n")
+
+    for fn, values in ((to_float, numbers), (extract_year, years),
+                       (extract_period, periods)):
+        restore = uncached(fn)
+        plain = best_of(fn, values, args.repeat)
+        restore()
+
+        clear_parse_caches()
+        t0 = time.perf_counter()
+        for v in values:
+            fn(v)
+        cold = time.perf_counter() - t0
+        warm = best_of(fn, values, args.repeat)
+
+        s = parse_cache_stats()[fn.__name__]
+        clear_parse_caches()
+        for v in values:
+            fn(v)
+        first_pass = parse_cache_stats()[fn.__name__]
+
+        n = len(values)
+        print(f"{fn.__name__:<15} uncached {1e9 * plain / n:6.0f} ns/call  "
+              f"cold {1e9 * cold / n:6.0f} ns/call  warm {1e9 * warm / n:6.0f} ns/call  "
+              f"x{plain / warm:.1f}  first-pass hit rate {first_pass['hit_rate']:.1%}  "
+              f"entries {s['size']:,}")
+
+
+if __name__ == "__main__":
+    main()
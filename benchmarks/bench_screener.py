@@ -0,0 +1,123 @@
+"""
+Screener latency over a synthetic universe (company x 12 years).
+
+    python -m benchmarks.bench_screener --companies 5000 --rounds 200
+
+Builds the panel in memory from synthetic payloads (no DB), checks the
+vectorized metrics against a plain per-company loop, then times panel
+build, screens and an incremental refresh of a few companies.
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+from panel import PANEL_COLUMNS, build_panel
+from screener import Screener
+from benchmarks.synthetic import make_payload, make_universe
+
+SCREENS = [
+    ("roe > 20 and sales_cagr_5y > 15% and debt_equity < 0.5", "-opm"),
+    ("opm > 25, interest_coverage > 5", "-roe"),
+    ("npm > 10 or profit_cagr_3y > 20", "-sales, roe"),
+    ("", "-sales"),
+]
+
+
+def rows_of(payloads):
+    companies, statements = [], {t: [] for t in PANEL_COLUMNS}
+    for p in payloads:
+        c = dict(p["company"])
+        c["company_id"] = c.pop("id")
+        companies.append(c)
+        for t in PANEL_COLUMNS:
+            statements[t].extend(p["data"][t])
+    return companies, statements
+
+
+def reference(payload):
+    """
+    Same metrics as compute_metrics, one company at a time.
+    """
+    pl = payload["data"]["profitandloss"]
+    bs = payload["data"]["balancesheet"]
+    last, last_bs = pl[-1], bs[-1]
+    equity = float(last_bs["equity_capital"]) + last_bs["reserves"]
+    start = pl[-6]["sales"] if len(pl) > 5 else None
+    return {
+        "roe": last["net_profit"] / equity * 100 if equity else math.nan,
+        "debt_equity": last_bs["borrowings"] / equity if equity else math.nan,
+        "opm": last["operating_profit"] / last["sales"] * 100,
+        "sales_cagr_5y": ((last["sales"] / start) ** 0.2 - 1) * 100
+        if start and start > 0 and last["sales"] > 0 else math.nan,
+    }
+
+
+def check(screener: Screener, payloads) -> None:
+    panel, metrics = screener._state
+    for p in payloads:
+        i = panel.index[p["company"]["id"]]
+        for k, want in reference(p).items():
+            got = metrics[k][i]
+            if math.isnan(want) and math.isnan(got):
+                continue
+            if not math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-9):
+                raise SystemExit(f"❌ {p['company']['id']} {k}: {got} != {want}")
+    print(f"✅ metrics match the per-company reference ({len(payloads)} companies)")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return f"p50 {p(0.5):7.3f} ms  p99 {p(0.99):7.3f} ms  mean {statistics.mean(samples):7.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--changed", type=int, default=50)
+    args = parser.parse_args()
+
+    payloads = list(make_universe(args.companies))
+    companies, statements = rows_of(payloads)
+
+    screener = Screener()
+    t0 = time.perf_counter()
+    screener.load(companies, statements)
+    print(f"== panel build: {args.companies} x {screener.stats()['years']}: "
+          f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    check(screener, payloads)
+
+    for where, sort in SCREENS:
+        times = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            result = screener.screen(where, sort, limit=50)
+            times.append((time.perf_counter() - t0) * 1000)
+        print(f"== {where or '(all)'!r} sort {sort!r}: {result['count']} hits\n   {percentiles(times)}")
+
+    # incremental refresh: rebuild only a few companies on top of the panel
+    rng = random.Random(1)
+    changed = rng.sample([p["company"]["id"] for p in payloads], args.changed)
+    fresh = [make_payload(cid, rng=random.Random(cid + "v2")) for cid in changed]
+    c_rows, s_rows = rows_of(fresh)
+
+    t0 = time.perf_counter()
+    screener.load(c_rows, s_rows, base=screener._state[0], replace=changed)
+    took = (time.perf_counter() - t0) * 1000
+
+    by_id = {p["company"]["id"]: p for p in payloads}
+    by_id.update({p["company"]["id"]: p for p in fresh})
+    check(screener, list(by_id.values()))
+
+    t0 = time.perf_counter()
+    build_panel(*rows_of(by_id.values()))
+    full = (time.perf_counter() - t0) * 1000
+    print(f"== refresh {args.changed} companies: {took:.1f} ms (full panel build {full:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
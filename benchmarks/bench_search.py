@@ -0,0 +1,67 @@
+"""
+Typeahead latency of the in-memory search fallback.
+
+    python -m benchmarks.bench_search --companies 10000
+
+The pg_trgm backend is timed in production through the Server-Timing
+header that /api/search returns.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from search import MemorySearch
+
+WORDS = [
+    "Tata", "Reliance", "Infosys", "Wipro", "Adani", "Bajaj", "Hindustan",
+    "Mahindra", "Larsen", "Bharat", "Power", "Steel", "Motors", "Finance",
+    "Bank", "Consultancy", "Services", "Petroleum", "Cement", "Pharma",
+    "Chemicals", "Textiles", "Energy", "Ports", "Green", "Life", "Insurance",
+]
+
+QUERIES = [
+    "tata", "tcs", "reliance ind", "infosys", "b", "relaince", "steel",
+    "bank", "hindustan petroleum", "mahindra fin", "zzz", "SYM00042",
+]
+
+
+def universe(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 4))) + " Ltd"
+        out.append({"company_id": f"SYM{i:05d}", "company_name": name})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = MemorySearch()
+    t0 = time.perf_counter()
+    engine.build(universe(args.companies))
+    print(f"index build: {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"({args.companies} companies)\n")
+
+    worst = 0.0
+    for q in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            engine.search(q, args.limit)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        worst = max(worst, p95)
+        print(f"{q!r:<24} p50 {statistics.median(samples):6.2f} ms   p95 {p95:6.2f} ms")
+
+    print(f"\nworst p95: {worst:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
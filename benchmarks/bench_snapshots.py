@@ -0,0 +1,114 @@
+"""
+Disk footprint and load time: raw_data/*.json vs columnar snapshots.
+
+    python -m benchmarks.bench_snapshots --companies 2000
+
+Writes the same synthetic universe as the indent-4 JSON directory that
+fetch.save_raw_json produces and as snapshot runs in each format, checks
+that every snapshot gives back identical payloads, then times
+  - full load: every payload rebuilt (what saver.py ingests)
+  - column read: profitandloss year + sales + net_profit only
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+from snapshots import SnapshotWriter, iter_payloads, read_section
+from benchmarks.synthetic import make_universe
+
+FORMATS = [
+    ("parquet", "zstd"),
+    ("parquet", "snappy"),
+    ("feather", "lz4"),
+    ("feather", "uncompressed"),
+]
+
+COLUMNS = ["_company", "year", "sales", "net_profit"]
+
+
+def dir_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(d, f))
+        for d, _, files in os.walk(path) for f in files
+    )
+
+
+def best_of(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def json_payloads(raw_dir: str):
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def json_columns(raw_dir: str):
+    # JSON has no projection: every file is parsed in full
+    out = {c: [] for c in COLUMNS}
+    for p in json_payloads(raw_dir):
+        for r in p["data"]["profitandloss"]:
+            out["_company"].append(p["company"]["id"])
+            for c in COLUMNS[1:]:
+                out[c].append(r.get(c))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    payloads = list(make_universe(args.companies))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw_data")
+        os.makedirs(raw_dir)
+        t0 = time.perf_counter()
+        for p in payloads:
+            with open(os.path.join(raw_dir, f"{p['company']['id']}.json"), "w") as f:
+                json.dump(p, f, indent=4)
+        json_write = time.perf_counter() - t0
+        json_size = dir_bytes(raw_dir)
+
+        full = best_of(lambda: sum(1 for _ in json_payloads(raw_dir)), args.rounds)
+        cols = best_of(lambda: json_columns(raw_dir), args.rounds)
+
+        print(f"{'format':<24}{'disk':>10}{'x':>6}{'write':>9}{'full load':>11}{'columns':>10}")
+        print(f"{'json (indent 4)':<24}{json_size / 2**20:>8.1f}MB{1:>6.1f}"
+              f"{json_write:>8.2f}s{full:>10.2f}s{cols:>9.3f}s")
+
+        for fmt, compression in FORMATS:
+            root = os.path.join(tmp, f"{fmt}-{compression}")
+
+            t0 = time.perf_counter()
+            w = SnapshotWriter(root=root, fmt=fmt, compression=compression)
+            for p in payloads:
+                w.add(p)
+            w.close()
+            write = time.perf_counter() - t0
+
+            if list(iter_payloads(root=root)) != payloads:
+                raise SystemExit(f"❌ {fmt}/{compression}: payloads differ after round trip")
+
+            size = dir_bytes(root)
+            full = best_of(lambda: sum(1 for _ in iter_payloads(root=root)), args.rounds)
+            cols = best_of(lambda: read_section("profitandloss", COLUMNS, root=root), args.rounds)
+
+            print(f"{fmt + ' ' + compression:<24}{size / 2**20:>8.1f}MB{json_size / size:>6.1f}"
+                  f"{write:>8.2f}s{full:>10.2f}s{cols:>9.3f}s")
+
+    print("\n✅ every snapshot format round-trips the payloads exactly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Web process startup time: app import, lifespan, /ready and first requests.
+
+    python -m benchmarks.bench_startup --runs 5
+
+Each run is a fresh interpreter (so imports and Jinja compiles are cold)
+that imports app, enters its lifespan with TestClient, polls /ready and
+then times the first and second request to each page. Runs with startup
+warming on (WARMUP=1) and off (WARMUP=0) and prints the medians, plus
+which heavy modules the import pulled in. Page cache off, so the second
+request is a warm render rather than a cache hit. Needs DATABASE_URL
+with companies loaded (and DB_SSLMODE=disable locally).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import psycopg2
+
+from db_pool import DB_SSLMODE
+
+HEAVY_MODULES = ["pandas", "pyarrow", "openpyxl", "numpy"]
+
+
+def first_company() -> str:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute("SELECT company_id FROM companies ORDER BY company_id LIMIT 1")
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if row is None:
+        raise SystemExit("❌ no companies loaded")
+    return row[0]
+
+
+def child(urls) -> None:
+    """
+    One measurement in this (fresh) process; prints a JSON line.
+    """
+    t0 = time.perf_counter()
+    import app
+    imported = time.perf_counter() - t0
+
+    from fastapi.testclient import TestClient
+
+    result = {
+        "import": imported,
+        "modules": len(sys.modules),
+        "heavy": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+    t0 = time.perf_counter()
+    with TestClient(app.app) as client:
+        result["startup"] = time.perf_counter() - t0
+
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.005)
+        result["ready"] = time.perf_counter() - t0
+
+        for url in urls:
+            times = []
+            for _ in range(2):
+                t = time.perf_counter()
+                status = client.get(url).status_code
+                times.append(time.perf_counter() - t)
+            if status != 200:
+                raise SystemExit(f"❌ {url}: {status}")
+            result[url] = times
+
+    print(json.dumps(result))
+
+
+def run(warmup: bool, urls):
+    env = dict(os.environ, WARMUP="1" if warmup else "0", PAGE_CACHE="0")
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", *urls],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - t0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", nargs="+", metavar="URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    urls = ["/", "/companies", f"/company/{first_company()}", "/screen?q=roe > 0"]
+    ms = lambda values: f"{statistics.median(values) * 1000:8.1f}"
+
+    for warmup in (True, False):
+        results = [run(warmup, urls) for _ in range(args.runs)]
+        heavy = ", ".join(results[0]["heavy"]) or "none"
+
+        print(f"\nWARMUP={int(warmup)}  ({args.runs} runs, median ms; heavy modules: {heavy}, "
+              f"{results[0]['modules']} modules)")
+        print(f"  {'import app':<28}{ms([r['import'] for r in results])}")
+        print(f"  {'lifespan startup':<28}{ms([r['startup'] for r in results])}")
+        print(f"  {'/ready OK after':<28}{ms([r['ready'] for r in results])}")
+        print(f"  {'process (spawn to exit)':<28}{ms([r['process'] for r in results])}")
+        print(f"  {'first / second request':<28}")
+        for url in urls:
+            first = ms([r[url][0] for r in results])
+            second = ms([r[url][1] for r in results])
+            print(f"    {url:<26}{first}{second}")
+
+
+if __name__ == "__main__":
+    main()
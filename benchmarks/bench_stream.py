@@ -0,0 +1,111 @@
+"""
+Peak memory and speed: json.load + clean_payload vs the streaming parse.
+
+    python -m benchmarks.bench_stream --years 12 200 2000 --documents 5000
+
+For one synthetic payload per size (long statement histories, many
+documents) written as indent-4 raw JSON, measures with tracemalloc the
+peak Python memory of
+  dict    parse_file():  whole document decoded, cleaned as dicts, then
+          turned into row tuples by the loader (payload_rows)
+  stream  stream_payload(): json_stream events cleaned chunk by chunk
+          into row tuples
+and checks both give the same rows and the same payload hash. Then
+times them over a directory of ordinary payloads, plus stream_file(),
+which only streams files of INGEST_STREAM_MIN_BYTES or more.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_payload, make_universe
+from bulk_loader import payload_hash, payload_rows
+from ingest import parse_file, stream_file, stream_payload
+
+
+def big_payload(years: int, documents: int):
+    p = make_payload("BIG00001", years=years)
+    p["data"]["documents"] = [
+        {"Year": str(2000 + i % 25), "Annual_Report": f"https://example.com/ar/{i}.pdf"}
+        for i in range(documents)
+    ]
+    return p
+
+
+def dict_path(path: str):
+    result = parse_file(path)
+    payload = result["payload"]
+    return payload_rows(payload), payload_hash(payload)
+
+
+def stream_path(path: str):
+    payload = stream_payload(path, path)["payload"]
+    return payload.rows, payload.content_hash
+
+
+def auto_path(path: str):
+    payload = stream_file(path)["payload"]
+    return payload.rows, payload.content_hash
+
+
+def peak(fn, path: str):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(path)
+    took = time.perf_counter() - t0
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, top, took
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[12, 200, 2000])
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--companies", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'payload':<22}{'file':>9}{'dict peak':>12}{'stream peak':>13}{'ratio':>7}"
+              f"{'dict':>9}{'stream':>9}")
+        for years in args.years:
+            path = os.path.join(tmp, f"big-{years}.json")
+            with open(path, "w") as f:
+                json.dump(big_payload(years, args.documents), f, indent=4)
+
+            (d_rows, d_hash), d_peak, d_time = peak(dict_path, path)
+            (s_rows, s_hash), s_peak, s_time = peak(stream_path, path)
+            if d_rows != s_rows or d_hash != s_hash:
+                raise SystemExit(f"❌ {years} years: streamed rows / hash differ")
+
+            print(f"{f'{years} yrs, {args.documents} docs':<22}"
+                  f"{os.path.getsize(path) / 2**20:>7.1f}MB"
+                  f"{d_peak / 2**20:>10.1f}MB{s_peak / 2**20:>11.1f}MB"
+                  f"{d_peak / s_peak:>6.1f}x{d_time * 1000:>7.0f}ms{s_time * 1000:>7.0f}ms")
+
+        # throughput over ordinary payloads (what a nightly ingest sees)
+        raw_dir = os.path.join(tmp, "raw_data")
+        os.makedirs(raw_dir)
+        paths = []
+        for p in make_universe(args.companies):
+            path = os.path.join(raw_dir, f"{p['company']['id']}.json")
+            with open(path, "w") as f:
+                json.dump(p, f, indent=4)
+            paths.append(path)
+
+        for name, fn in (("dict", dict_path), ("stream", stream_path),
+                         ("auto", auto_path)):
+            t0 = time.perf_counter()
+            for path in paths:
+                fn(path)
+            took = time.perf_counter() - t0
+            print(f"{name:<8} {len(paths)} files in {took:.2f}s ({len(paths) / took:,.0f} files/s)")
+
+    print("\n✅ streamed rows and hashes match the dict path")
+
+
+if __name__ == "__main__":
+    main()
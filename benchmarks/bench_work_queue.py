@@ -0,0 +1,125 @@
+"""
+Work queue claim throughput and exactly-once check with concurrent workers.
+
+    python -m benchmarks.bench_work_queue --jobs 20000 --workers 1 4 8 --claim 50
+
+For each worker count, enqueues --jobs companies as one run in a throwaway
+schema, then lets that many threads (one connection each) claim batches
+and mark them loaded, like run_pipeline workers on separate machines.
+One extra worker "crashes" after its first claim; its jobs come back once
+the (short) lease expires; jobs/s is measured until everything else is
+done. Checks every job ends loaded and no company was processed by two
+workers while leased.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import os
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+
+from db_init import create_tables
+from db_pool import DB_SSLMODE
+from migrations import migrate
+from work_queue import LOADED, WorkQueue, claim_rounds, create_run
+
+SCHEMA = "bench_work_queue"
+
+
+def connect(autocommit: bool = True):
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    conn.autocommit = autocommit
+    conn.cursor().execute(f"SET search_path TO {SCHEMA}")
+    return conn
+
+
+def setup() -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    conn.autocommit = True
+    conn.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    conn.close()
+
+    conn = connect(autocommit=False)
+    cur = conn.cursor()
+    create_tables(cur)
+    conn.commit()
+    cur.close()
+    migrate(conn)
+    conn.close()
+
+
+def drop() -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    conn.autocommit = True
+    conn.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.close()
+
+
+def run(jobs: int, workers: int, claim: int, lease: float):
+    conn = connect()
+    conn.cursor().execute("TRUNCATE pipeline_runs CASCADE")
+    run_id = create_run(conn, (f"C{i:06d}" for i in range(jobs)), f"bench-{workers}")
+
+    processed = Counter()
+    lock = threading.Lock()
+    drained = []   # time the non-abandoned jobs were all done
+
+    # crashes holding its first claim; those jobs wait out the lease
+    crasher = WorkQueue(connect(), run_id, owner="crasher", lease_s=lease)
+    abandoned = crasher.claim(claim)
+
+    def worker(i: int):
+        q = WorkQueue(connect(), run_id, owner=f"worker-{i}", lease_s=lease)
+        for batch in claim_rounds(q, claim, wait_s=lease + 1):
+            q.mark(batch, LOADED)
+            with lock:
+                processed.update(batch)
+                if not drained and len(processed) >= jobs - len(abandoned):
+                    drained.append(time.perf_counter() - t0)
+        q.conn.close()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    took = drained[0] if drained else time.perf_counter() - t0
+
+    counts = WorkQueue(conn, run_id).counts()
+    crasher.conn.close()
+    conn.close()
+
+    twice = sum(1 for n in processed.values() if n > 1)
+    return took, counts, twice, len(abandoned)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--claim", type=int, default=50)
+    parser.add_argument("--lease", type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup()
+    try:
+        print(f"{'workers':>8}{'time':>9}{'jobs/s':>10}{'loaded':>9}{'reclaimed':>11}{'twice':>7}")
+        for n in args.workers:
+            took, counts, twice, abandoned = run(args.jobs, n, args.claim, args.lease)
+            print(f"{n:>8}{took:>8.2f}s{args.jobs / took:>10,.0f}{counts[LOADED]:>9}"
+                  f"{abandoned:>11}{twice:>7}")
+            if counts[LOADED] != args.jobs or twice:
+                raise SystemExit("❌ jobs lost or processed twice")
+    finally:
+        drop()
+
+    print("\n✅ every job loaded exactly once (crashed worker's jobs reclaimed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Local stand-in for the bluemutualfund.in company API.
+
+    python -m benchmarks.stub_api --port 8765 --latency-ms 80 --fail-rate 0.05
+
+Serves synthetic payloads at /server/api/company.php?id=<ID>&api_key=...
+with optional per-request latency, random 500s and 429 throttling, and
+ETag / If-None-Match revalidation, so the fetcher can be exercised
+without touching the real API. Point the
+pipeline at it with COMPANY_API_URL=http://127.0.0.1:8765/server/api/company.php
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import make_payload
+
+API_PATH = "/server/api/company.php"
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, fail_rate: float = 0.0,
+                 max_rps: Optional[float] = None, seed: int = 0,
+                 etags: bool = True):
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.max_rps = max_rps
+        self.etags = etags
+        self.revisions: Dict[str, int] = {}   # bump() -> new payload
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0,
+                       "not_modified": 0, "bytes": 0}
+
+    def bump(self, company_ids: Iterable[str]) -> None:
+        """
+        Restates these companies: their next response has new numbers.
+        """
+        with self.lock:
+            for cid in company_ids:
+                self.revisions[cid] = self.revisions.get(cid, 0) + 1
+
+    def body(self, cid: str) -> bytes:
+        rev = self.revisions.get(cid, 0)
+        payload = make_payload(cid, rng=random.Random(f"{cid}#{rev}") if rev else None)
+        return json.dumps(payload).encode()
+
+    def throttled(self) -> bool:
+        if not self.max_rps:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            return self.window_count > self.max_rps
+
+
+def make_handler(config: StubConfig):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, headers=None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            config.counts["requests"] += 1
+
+            if url.path != API_PATH:
+                return self._send(404, b'{"error": "not found"}')
+
+            if config.latency_ms:
+                time.sleep(config.latency_ms / 1000)
+
+            if config.throttled():
+                config.counts["throttled"] += 1
+                return self._send(429, b'{"error": "rate limited"}', {"Retry-After": "1"})
+
+            with config.lock:
+                fail = config.rng.random() < config.fail_rate
+            if fail:
+                config.counts["errors"] += 1
+                return self._send(500, b'{"error": "boom"}')
+
+            cid = parse_qs(url.query).get("id", [""])[0]
+            body = config.body(cid)
+            headers = {}
+            if config.etags:
+                headers["ETag"] = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    config.counts["not_modified"] += 1
+                    return self._send(304, b"", headers)
+
+            config.counts["ok"] += 1
+            config.counts["bytes"] += len(body)
+            self._send(200, body, headers)
+
+    return Handler
+
+
+def serve(port: int = 0, **config_kwargs) -> ThreadingHTTPServer:
+    """
+    Starts the stub in a daemon thread. port=0 picks a free port;
+    the API URL is f"http://127.0.0.1:{server.server_port}{API_PATH}".
+    """
+    config = StubConfig(**config_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def api_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_port}{API_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--no-etags", action="store_true", help="never send ETag / 304")
+    args = parser.parse_args()
+
+    server = serve(args.port, latency_ms=args.latency_ms,
+                   fail_rate=args.fail_rate, max_rps=args.max_rps,
+                   etags=not args.no_etags)
+    print(f"stub API on {api_url(server)}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
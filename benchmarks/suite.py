@@ -0,0 +1,394 @@
+"""
+Benchmark suite: fetch, parse, clean, rows, bulk load and page render per scale.
+
+    python -m benchmarks.suite run --scales 100 1000 10000 --out bench-results/new.json
+    python -m benchmarks.suite compare bench-results/old.json bench-results/new.json
+
+run writes synthetic raw_data files for each scale (the payload shape
+fetch_company returns) and times every stage separately:
+  fetch     FetchEngine against the in-process stub API (no latency,
+            no cache): client, threading and decode overhead only
+  parse     json.load of every raw file
+  clean     ingest.clean_payload over the decoded payloads
+  rows      bulk_loader.payload_rows + payload_hash
+  load      bulk_loader.load_batch into a throwaway schema (fresh per scale)
+  reload    the same load again with --changed-only (every company skipped)
+  render    FastAPI TestClient against that schema, page cache off:
+            /company/{cid}, /companies, /, statements API, screener
+Stage times are the best of --repeat rounds; render is p50 / p95 over
+--requests requests per route. Results go to --out as JSON.
+
+compare matches results by name and flags every one that got slower by
+more than --threshold (exit status 1), so it can gate CI. Needs
+DATABASE_URL (and DB_SSLMODE=disable for a local server).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+from urllib.parse import quote
+
+import psycopg2
+
+from benchmarks.stub_api import api_url, serve
+from bulk_loader import LOAD_BATCH_SIZE, LoadStats, batched, load_batch, payload_hash, payload_rows
+from db_init import create_tables
+from db_pool import DB_SSLMODE
+from fetch_engine import FetchEngine
+from ingest import clean_payload
+from migrations import migrate
+from benchmarks.synthetic import company_ids, make_universe
+
+SCHEMA = "bench_suite"
+
+STAGES = ["fetch", "parse", "clean", "rows", "load", "reload", "render"]
+
+# route name -> URL template ({cid} filled per request)
+ROUTES = {
+    "company_page": "/company/{cid}",
+    "companies_page": "/companies",
+    "home": "/",
+    "statement_api": "/api/companies/{cid}/profitandloss?shape=columns",
+    "screen_api": "/api/screen?q=roe > 15 and debt_equity < 1&sort=-opm",
+}
+
+
+# =====================================================
+# SCHEMA
+# =====================================================
+
+def schema_dsn(dsn: str, schema: str) -> str:
+    """
+    DATABASE_URL with search_path pinned to schema (URI or key=value form),
+    so pools the app opens land in the benchmark schema.
+    """
+    option = f"-csearch_path={schema}"
+    if "://" in dsn:
+        sep = "&" if "?" in dsn else "?"
+        return f"{dsn}{sep}options={quote(option)}"
+    return f"{dsn} options='{option}'"
+
+
+def connect(schema: str = SCHEMA):
+    return psycopg2.connect(schema_dsn(os.environ["DATABASE_URL"], schema),
+                            sslmode=DB_SSLMODE)
+
+
+def fresh_schema(schema: str = SCHEMA) -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    conn = connect(schema)
+    cur = conn.cursor()
+    create_tables(cur)
+    conn.commit()
+    cur.close()
+    migrate(conn)
+    conn.close()
+
+
+def drop_schema(schema: str = SCHEMA) -> None:
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+# =====================================================
+# STAGES
+# =====================================================
+# Each stage walks the raw files itself so memory stays per-batch at
+# 10k companies; only the stage's own work is inside the timer.
+
+def write_raw(raw_dir: str, n: int) -> List[str]:
+    paths = []
+    for p in make_universe(n):
+        path = os.path.join(raw_dir, f"{p['company']['id']}.json")
+        with open(path, "w") as f:
+            json.dump(p, f, indent=4)
+        paths.append(path)
+    return paths
+
+
+def stage_fetch(n: int, concurrency: int = 8) -> float:
+    server = serve(latency_ms=0)
+    ids = company_ids(n)
+    try:
+        with FetchEngine(base_url=api_url(server), api_key="x", concurrency=concurrency,
+                         rate=0, verbose=False, cache=None) as engine:
+            t0 = time.perf_counter()
+            got = sum(1 for _ in engine.iter_fetch(ids))
+            took = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+    if got != n:
+        raise SystemExit(f"❌ fetch returned {got} of {n} companies")
+    return took
+
+
+def _read(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def stage_parse(paths: List[str]) -> float:
+    t0 = time.perf_counter()
+    for path in paths:
+        _read(path)
+    return time.perf_counter() - t0
+
+
+def stage_clean(paths: List[str]) -> float:
+    took = 0.0
+    for path in paths:
+        payload = _read(path)
+        t0 = time.perf_counter()
+        clean_payload(payload)
+        took += time.perf_counter() - t0
+    return took
+
+
+def stage_rows(paths: List[str]) -> float:
+    took = 0.0
+    for path in paths:
+        payload = clean_payload(_read(path))
+        t0 = time.perf_counter()
+        payload_rows(payload)
+        payload_hash(payload)
+        took += time.perf_counter() - t0
+    return took
+
+
+def stage_load(paths: List[str], changed_only: bool = False) -> float:
+    conn = connect()
+    stats = LoadStats()
+    took = 0.0
+    try:
+        for chunk in batched(paths, LOAD_BATCH_SIZE):
+            payloads = [clean_payload(_read(p)) for p in chunk]
+            t0 = time.perf_counter()
+            load_batch(conn, payloads, stats, verbose=False, changed_only=changed_only)
+            took += time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    if stats.failed:
+        raise SystemExit(f"❌ load failed for {len(stats.failed)} companies")
+    return took
+
+
+def percentile(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def stage_render(ids: List[str], requests: int) -> Dict[str, Dict[str, float]]:
+    """
+    p50 / p95 / mean ms per route, in-process against the bench schema.
+    """
+    from fastapi.testclient import TestClient
+    import app as web
+
+    dsn = os.environ["DATABASE_URL"]
+    os.environ["DATABASE_URL"] = schema_dsn(dsn, SCHEMA)
+    out = {}
+    try:
+        with TestClient(web.app) as client:
+            # measure rendering, not the page cache (bench_page_cache does that)
+            web.app.state.page_cache = None
+            rng = random.Random(42)
+
+            for name, template in ROUTES.items():
+                client.get(template.format(cid=ids[0]))   # warm-up (screener load, templates)
+                samples = []
+                for _ in range(requests):
+                    url = template.format(cid=rng.choice(ids))
+                    t0 = time.perf_counter()
+                    r = client.get(url)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    if r.status_code != 200:
+                        raise SystemExit(f"❌ {url}: HTTP {r.status_code}")
+                out[name] = {
+                    "p50_ms": percentile(samples, 0.5),
+                    "p95_ms": percentile(samples, 0.95),
+                    "mean_ms": statistics.fmean(samples),
+                }
+    finally:
+        os.environ["DATABASE_URL"] = dsn
+    return out
+
+
+def best_of(fn: Callable[[], float], rounds: int) -> float:
+    return min(fn() for _ in range(max(1, rounds)))
+
+
+# =====================================================
+# RUN
+# =====================================================
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(scales: List[int], stages: List[str], repeat: int, requests: int) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def record(name: str, value: float, unit: str, n: int, **extra: Any) -> None:
+        results[name] = {"value": round(value, 6), "unit": unit, "scale": n, **extra}
+        print(f"   {name:<34} {value:>12.3f} {unit}")
+
+    for n in scales:
+        print(f"== {n} companies")
+        with tempfile.TemporaryDirectory() as raw_dir:
+            paths = write_raw(raw_dir, n)
+
+            if "fetch" in stages:
+                took = best_of(lambda: stage_fetch(n), repeat)
+                record(f"fetch/{n}", took, "s", n,
+                       per_company_us=round(took / n * 1e6, 2))
+
+            for stage, fn in (("parse", stage_parse), ("clean", stage_clean),
+                              ("rows", stage_rows)):
+                if stage in stages:
+                    took = best_of(lambda: fn(paths), repeat)
+                    record(f"{stage}/{n}", took, "s", n,
+                           per_company_us=round(took / n * 1e6, 2))
+
+            if {"load", "reload", "render"} & set(stages):
+                fresh_schema()
+                # always loaded once: reload and render need the data
+                took = stage_load(paths)
+                if "load" in stages:
+                    record(f"load/{n}", took, "s", n,
+                           per_company_us=round(took / n * 1e6, 2))
+                if "reload" in stages:
+                    took = best_of(lambda: stage_load(paths, changed_only=True), repeat)
+                    record(f"reload/{n}", took, "s", n,
+                           per_company_us=round(took / n * 1e6, 2))
+                if "render" in stages:
+                    ids = [os.path.basename(p)[:-5] for p in paths]
+                    for route, stats in stage_render(ids, requests).items():
+                        record(f"render/{route}/{n}", stats["p50_ms"], "ms", n,
+                               p95_ms=round(stats["p95_ms"], 3),
+                               mean_ms=round(stats["mean_ms"], 3))
+
+    if {"load", "reload", "render"} & set(stages):
+        drop_schema()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "scales": scales,
+            "repeat": repeat,
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+# =====================================================
+# COMPARE
+# =====================================================
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Prints every shared result with its change; returns the names that
+    regressed by more than threshold (all values are lower-is-better).
+    """
+    regressions = []
+    old_r, new_r = old["results"], new["results"]
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']} "
+          f"(threshold {threshold:.0%})\n")
+    print(f"{'benchmark':<34}{'old':>12}{'new':>12}{'change':>9}")
+
+    for name in sorted(set(old_r) & set(new_r)):
+        a, b = old_r[name]["value"], new_r[name]["value"]
+        change = (b - a) / a if a else 0.0
+        mark = ""
+        if change > threshold:
+            mark = "  🔴 regression"
+            regressions.append(name)
+        elif change < -threshold:
+            mark = "  🟢 faster"
+        unit = new_r[name]["unit"]
+        print(f"{name:<34}{a:>10.3f}{unit:>2}{b:>10.3f}{unit:>2}{change:>+9.1%}{mark}")
+
+    for name in sorted(set(old_r) ^ set(new_r)):
+        print(f"{name:<34}  only in {'old' if name in old_r else 'new'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the suite and write results")
+    p_run.add_argument("--scales", type=int, nargs="+", default=[100, 1000])
+    p_run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    p_run.add_argument("--repeat", type=int, default=3)
+    p_run.add_argument("--requests", type=int, default=100)
+    p_run.add_argument("--out", default=None,
+                       help="results file (default bench-results/<time>-<commit>.json)")
+
+    p_cmp = sub.add_parser("compare", help="compare two result files")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.10,
+                       help="relative slowdown that counts as a regression")
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ no regressions")
+        return
+
+    report = run(args.scales, args.stages, args.repeat, args.requests)
+    out = args.out or os.path.join(
+        "bench-results",
+        f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{report['meta']['commit']}.json"
+    )
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
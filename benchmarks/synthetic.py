@@ -0,0 +1,167 @@
+import random
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# =====================================================
+# SYNTHETIC API PAYLOADS
+# =====================================================
+# Same shape as fetch.fetch_company() returns:
+#   {"company": {...}, "data": {"analysis": [...], "prosandcons": [...],
+#    "balancesheet": [...], "profitandloss": [...], "cashflow": [...],
+#    "documents": [{"Year": ..., "Annual_Report": ...}]}}
+
+FIRST_YEAR = 2013
+PERIODS = ["10 Years", "5 Years", "3 Years", "TTM"]
+
+
+def company_ids(n: int) -> List[str]:
+    return [f"SYN{i:05d}" for i in range(n)]
+
+
+def make_payload(
+    company_id: str,
+    years: int = 12,
+    rng: Optional[random.Random] = None,
+    decimals: bool = False
+) -> Dict[str, Any]:
+    """
+    decimals: eps / opm_percentage / face_value / book_value (INT columns)
+    come as floats like 234.56, as the API sends some of them.
+    """
+    rng = rng or random.Random(company_id)
+    num = (lambda v: round(v, 2)) if decimals else round
+
+    base_sales = rng.randint(500, 200_000)
+    growth = rng.uniform(-0.05, 0.25)
+
+    balancesheet = []
+    profitandloss = []
+    cashflow = []
+
+    for i in range(years):
+        year = f"Mar {FIRST_YEAR + i}"
+        sales = int(base_sales * (1 + growth) ** i)
+        expenses = int(sales * rng.uniform(0.6, 0.9))
+        operating_profit = sales - expenses
+        interest = int(sales * rng.uniform(0, 0.05))
+        depreciation = int(sales * rng.uniform(0.01, 0.06))
+        other_income = int(sales * rng.uniform(0, 0.03))
+        pbt = operating_profit + other_income - interest - depreciation
+        net_profit = int(pbt * 0.75)
+        reserves = int(sales * rng.uniform(0.3, 2.0))
+        borrowings = int(sales * rng.uniform(0, 1.0))
+        other_liabilities = int(sales * rng.uniform(0.1, 0.5))
+        equity = rng.randint(10, 2_000)
+        total = equity + reserves + borrowings + other_liabilities
+        fixed_assets = int(total * rng.uniform(0.2, 0.5))
+        cwip = int(total * rng.uniform(0, 0.05))
+        investments = int(total * rng.uniform(0, 0.2))
+
+        profitandloss.append({
+            "id": f"{company_id}_pl_{i}",
+            "company_id": company_id,
+            "year": year,
+            "sales": sales,
+            "expenses": expenses,
+            "operating_profit": operating_profit,
+            "opm_percentage": num(100 * operating_profit / sales) if sales else 0,
+            "other_income": other_income,
+            "interest": interest,
+            "depreciation": depreciation,
+            "profit_before_tax": pbt,
+            "tax_percentage": "25%",
+            "net_profit": net_profit,
+            "eps": num(net_profit / equity),
+            "dividend_payout": f"{rng.randint(0, 60)}%",
+        })
+
+        balancesheet.append({
+            "id": f"{company_id}_bs_{i}",
+            "company_id": company_id,
+            "year": year,
+            "equity_capital": str(equity),
+            "reserves": reserves,
+            "borrowings": borrowings,
+            "other_liabilities": other_liabilities,
+            "total_liabilities": total,
+            "fixed_assets": fixed_assets,
+            "cwip": cwip,
+            "investments": investments,
+            "other_asset": total - fixed_assets - cwip - investments,
+            "total_assets": total,
+        })
+
+        op = int(net_profit * rng.uniform(0.8, 1.4))
+        inv = -int(abs(op) * rng.uniform(0.2, 0.9))
+        fin = -int(abs(op) * rng.uniform(0, 0.5))
+        cashflow.append({
+            "id": f"{company_id}_cf_{i}",
+            "company_id": company_id,
+            "year": year,
+            "operating_activity": op,
+            "investing_activity": inv,
+            "financing_activity": fin,
+            "net_cash_flow": op + inv + fin,
+        })
+
+    analysis = [
+        {
+            "id": f"{company_id}_an_{p}",
+            "company_id": company_id,
+            "compounded_sales_growth": f"{p}: {rng.randint(-5, 30)}%",
+            "compounded_profit_growth": f"{p}: {rng.randint(-10, 40)}%",
+            "stock_price_cagr": f"{p}: {rng.randint(-10, 40)}%",
+            "roe": f"{p}: {rng.randint(0, 35)}%",
+        }
+        for p in PERIODS
+    ]
+
+    prosandcons = (
+        [{"company_id": company_id, "pros": f"Pro {k} for {company_id}", "cons": None}
+         for k in range(3)]
+        + [{"company_id": company_id, "pros": None, "cons": f"Con {k} for {company_id}"}
+           for k in range(3)]
+    )
+
+    documents = [
+        {
+            "Year": FIRST_YEAR + i,
+            "Annual_Report": f"https://example.com/{company_id}/ar{FIRST_YEAR + i}.pdf",
+        }
+        for i in range(years)
+    ]
+
+    face_value = rng.choice([1, 2, 5, 10])
+    book_value = rng.randint(10, 3_000)
+
+    return {
+        "company": {
+            "id": company_id,
+            "company_logo": f"https://example.com/{company_id}.png",
+            "company_name": f"Synthetic {company_id} Ltd",
+            "chart_link": f"https://example.com/{company_id}/chart",
+            "about_company": f"{company_id} is a synthetic benchmark company.",
+            "website": f"https://{company_id.lower()}.example.com",
+            "nse_profile": f"https://nse.example.com/{company_id}",
+            "bse_profile": f"https://bse.example.com/{company_id}",
+            "face_value": float(face_value) if decimals else face_value,
+            "book_value": book_value + 0.56 if decimals else book_value,
+            "roce_percentage": round(rng.uniform(0, 45), 2),
+            "roe_percentage": round(rng.uniform(0, 40), 2),
+        },
+        "data": {
+            "analysis": analysis,
+            "prosandcons": prosandcons,
+            "balancesheet": balancesheet,
+            "profitandloss": profitandloss,
+            "cashflow": cashflow,
+            "documents": documents,
+        },
+    }
+
+
+def make_universe(n: int, years: int = 12, seed: int = 0,
+                  decimals: bool = False) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for cid in company_ids(n):
+        yield make_payload(cid, years=years, rng=rng, decimals=decimals)
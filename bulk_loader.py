@@ -0,0 +1,590 @@
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from psycopg2.extras import execute_values
+
+from company_summary import refresh_summary
+from instrumentation import PipelineMetrics
+from metrics import refresh_metrics
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# copy   -> COPY ... FROM STDIN from an in-memory CSV buffer (fastest)
+# values -> one multi-row INSERT per table via execute_values
+LOAD_METHOD = os.getenv("LOAD_METHOD", "copy")
+
+# companies per transaction when loading many payloads
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "50"))
+
+# skip companies whose raw payload hash matches the last load
+LOAD_CHANGED_ONLY = os.getenv("LOAD_CHANGED_ONLY", "0") == "1"
+
+COPY_NULL = "\\N"
+
+
+# =====================================================
+# TABLE SPECS (shared by saver.py / run_pipeline.py)
+# =====================================================
+
+COMPANY_COLUMNS = [
+    "company_id", "company_logo", "company_name", "chart_link",
+    "about_company", "website", "nse_profile", "bse_profile",
+    "face_value", "book_value", "roce_percentage", "roe_percentage"
+]
+
+TABLE_COLUMNS: Dict[str, List[str]] = {
+    "analysis": [
+        "company_id", "compounded_sales_growth",
+        "compounded_profit_growth", "stock_price_cagr", "roe"
+    ],
+    "prosandcons": ["company_id", "pros", "cons"],
+    "balancesheet": [
+        "company_id", "year", "equity_capital", "reserves",
+        "borrowings", "other_liabilities", "total_liabilities",
+        "fixed_assets", "cwip", "investments",
+        "other_asset", "total_assets"
+    ],
+    "profitandloss": [
+        "company_id", "year", "sales", "expenses",
+        "operating_profit", "opm_percentage", "other_income",
+        "interest", "depreciation", "profit_before_tax",
+        "tax_percentage", "net_profit", "eps", "dividend_payout"
+    ],
+    "cashflow": [
+        "company_id", "year", "operating_activity",
+        "investing_activity", "financing_activity",
+        "net_cash_flow"
+    ],
+    "documents": ["company_id", "year", "annual_report"],
+}
+
+# BIGINT / INT columns of the yearly statements (see db_init); everything
+# else there is VARCHAR and loaded as the API sent it
+INTEGER_COLUMNS: Dict[str, List[str]] = {
+    "balancesheet": [
+        "reserves", "borrowings", "other_liabilities", "total_liabilities",
+        "fixed_assets", "cwip", "investments", "other_asset", "total_assets"
+    ],
+    "profitandloss": [
+        "sales", "expenses", "operating_profit", "opm_percentage",
+        "other_income", "interest", "depreciation", "profit_before_tax",
+        "net_profit", "eps"
+    ],
+    "cashflow": [
+        "operating_activity", "investing_activity", "financing_activity",
+        "net_cash_flow"
+    ],
+}
+
+# every INT / BIGINT column the loader writes: COPY rejects "234.56" for
+# them where an INSERT's assignment cast rounded, so upsert_table rounds
+# numeric values itself (the same way on every load method)
+LOADED_INTEGER_COLUMNS: Dict[str, List[str]] = {
+    **INTEGER_COLUMNS,
+    "companies": ["face_value", "book_value"],
+    "documents": ["year"],
+}
+
+# parents first so foreign keys are satisfied inside the transaction
+LOAD_ORDER = ["companies"] + list(TABLE_COLUMNS)
+
+# natural keys backed by unique indexes (migrations 1 and 5); tables
+# without one are replaced per company on every load
+NATURAL_KEYS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "companies": ("company_id",),
+    "analysis": None,
+    "prosandcons": None,
+    "balancesheet": ("company_id", "year"),
+    "profitandloss": ("company_id", "year"),
+    "cashflow": ("company_id", "year"),
+    "documents": ("company_id", "year", "annual_report"),
+}
+
+
+# =====================================================
+# PAYLOAD -> ROWS
+# =====================================================
+
+def company_row(company: Dict[str, Any]) -> Tuple:
+    return tuple(
+        company.get("id") if c == "company_id" else company.get(c)
+        for c in COMPANY_COLUMNS
+    )
+
+
+def document_rows(cid: str, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # API uses Year / Annual_Report keys for documents
+    return [
+        {
+            "company_id": cid,
+            "year": doc.get("Year"),
+            "annual_report": doc.get("Annual_Report")
+        }
+        for doc in docs
+    ]
+
+
+def payload_rows(payload: Dict[str, Any]) -> Dict[str, List[Tuple]]:
+    """
+    One API payload ({"company": ..., "data": ...}) as tuples per table,
+    in TABLE_COLUMNS / COMPANY_COLUMNS order.
+    """
+    company = payload["company"]
+    d = payload["data"]
+
+    sections = {t: d.get(t) or [] for t in TABLE_COLUMNS if t != "documents"}
+    sections["documents"] = document_rows(company.get("id"), d.get("documents") or [])
+
+    rows: Dict[str, List[Tuple]] = {"companies": [company_row(company)]}
+    for table, cols in TABLE_COLUMNS.items():
+        rows[table] = [tuple(r.get(c) for c in cols) for r in sections[table]]
+
+    return rows
+
+
+class RowPayload(NamedTuple):
+    """
+    A cleaned payload already in payload_rows() form (ingest's streaming
+    path), with the payload_hash of the payload it stands for. The loader
+    takes these anywhere it takes payload dicts.
+    """
+    company_id: str
+    rows: Dict[str, List[Tuple]]
+    content_hash: str
+
+
+Payload = Union[Dict[str, Any], RowPayload]
+
+
+def payload_id(payload: Payload) -> str:
+    if isinstance(payload, RowPayload):
+        return payload.company_id
+    return str(payload["company"].get("id"))
+
+
+def canonical_json(payload: Dict[str, Any]) -> bytes:
+    # key order and whitespace independent; what payload hashes are taken of
+    return json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def payload_hash(payload: Payload) -> str:
+    if isinstance(payload, RowPayload):
+        return payload.content_hash
+    return hashlib.sha256(canonical_json(payload)).hexdigest()
+
+
+def row_payload(payload: Dict[str, Any]) -> RowPayload:
+    return RowPayload(payload_id(payload), payload_rows(payload), payload_hash(payload))
+
+
+def collect_rows(payloads: Iterable[Payload]) -> Dict[str, List[Tuple]]:
+    rows: Dict[str, List[Tuple]] = {t: [] for t in LOAD_ORDER}
+    for p in payloads:
+        tables = p.rows if isinstance(p, RowPayload) else payload_rows(p)
+        for table, r in tables.items():
+            rows[table].extend(r)
+    return rows
+
+
+def columns_for(table: str) -> List[str]:
+    return COMPANY_COLUMNS if table == "companies" else TABLE_COLUMNS[table]
+
+
+def to_int(v: Any) -> Any:
+    """
+    Rounds floats and decimal strings ("234.56") for an INT / BIGINT
+    column, like clean_section does; anything else is left for the
+    database to accept or reject.
+    """
+    if v is None or type(v) is int:
+        return v
+    if isinstance(v, float):
+        return int(round(v)) if math.isfinite(v) else v
+    if isinstance(v, str):
+        try:
+            f = float(v)
+        except ValueError:
+            return v
+        return int(round(f)) if math.isfinite(f) else v
+    return v
+
+
+def integer_rows(table: str, cols: Sequence[str], rows: Sequence[Tuple]) -> Sequence[Tuple]:
+    """
+    rows with LOADED_INTEGER_COLUMNS values rounded to int; rows that
+    only hold ints / None come back as they were.
+    """
+    int_cols = set(LOADED_INTEGER_COLUMNS.get(table, ()))
+    idx = [i for i, c in enumerate(cols) if c in int_cols]
+    if not idx:
+        return rows
+
+    out = []
+    for r in rows:
+        if any(r[i] is not None and type(r[i]) is not int for i in idx):
+            r = list(r)
+            for i in idx:
+                r[i] = to_int(r[i])
+            r = tuple(r)
+        out.append(r)
+    return out
+
+
+# =====================================================
+# WRITERS
+# =====================================================
+
+class _CopyNull(float):
+    # a "number" to csv.QUOTE_NONNUMERIC, so it's written unquoted
+    def __str__(self) -> str:
+        return COPY_NULL
+
+
+_NULL = _CopyNull()
+
+
+def _csv_buffer(rows: Sequence[Tuple]) -> io.StringIO:
+    # every text value is quoted and COPY only treats an unquoted field as
+    # NULL, so a scraped "\N" (or "") stays text; None is the one unquoted
+    # COPY_NULL in the buffer
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n", quoting=csv.QUOTE_NONNUMERIC)
+    for r in rows:
+        writer.writerow([_NULL if v is None else v for v in r])
+    buf.seek(0)
+    return buf
+
+
+def copy_rows(cur, table: str, cols: Sequence[str], rows: Sequence[Tuple]) -> int:
+    if not rows:
+        return 0
+    cur.copy_expert(
+        f"COPY {table} ({','.join(cols)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        _csv_buffer(rows)
+    )
+    return len(rows)
+
+
+def values_rows(cur, table: str, cols: Sequence[str], rows: Sequence[Tuple],
+                suffix: str = "") -> int:
+    if not rows:
+        return 0
+    execute_values(
+        cur,
+        f"INSERT INTO {table} ({','.join(cols)}) VALUES %s {suffix}",
+        rows,
+        page_size=len(rows)   # single statement per table
+    )
+    return len(rows)
+
+
+def insert_rows(cur, table, rows, cols):
+    """
+    Drop-in for the old per-row helper: dict rows, one batched INSERT.
+    """
+    return values_rows(cur, table, cols, [tuple(r.get(c) for c in cols) for r in rows])
+
+
+# =====================================================
+# LOADER
+# =====================================================
+
+class LoadStats:
+    def __init__(self):
+        self.rows: Dict[str, int] = {t: 0 for t in LOAD_ORDER}
+        self.seconds: Dict[str, float] = {t: 0.0 for t in LOAD_ORDER}
+        self.companies = 0
+        self.skipped = 0
+        self.failed: List[str] = []
+
+    def add(self, table: str, rows: int, seconds: float) -> None:
+        self.rows[table] += rows
+        self.seconds[table] += seconds
+
+    def merge(self, other: "LoadStats") -> None:
+        for t in LOAD_ORDER:
+            self.add(t, other.rows[t], other.seconds[t])
+        self.companies += other.companies
+        self.skipped += other.skipped
+        self.failed.extend(other.failed)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def rows_per_second(self) -> float:
+        return self.total_rows / self.total_seconds if self.total_seconds else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"📦 {self.companies} companies, {self.total_rows} rows in "
+            f"{self.total_seconds:.2f}s ({self.rows_per_second():,.0f} rows/s)"
+        ]
+        if self.skipped:
+            lines.append(f"   ⏭️  {self.skipped} unchanged companies skipped")
+        for t in LOAD_ORDER:
+            if self.rows[t]:
+                rps = self.rows[t] / self.seconds[t] if self.seconds[t] else 0
+                lines.append(f"   {t:<14} {self.rows[t]:>8} rows  {rps:>12,.0f} rows/s")
+        if self.failed:
+            lines.append(f"   ❌ failed: {', '.join(self.failed)}")
+        return "\n".join(lines)
+
+
+def _stage(cur, table: str, cols: Sequence[str], rows: Sequence[Tuple],
+           method: str) -> str:
+    """
+    Loads rows (plus their payload order as _ord) into a temp table that
+    disappears at commit / rollback.
+    """
+    stage = f"_stage_{table}"
+    cur.execute(f"""
+        CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+            SELECT {','.join(cols)} FROM {table} WITH NO DATA;
+        ALTER TABLE {stage} ADD COLUMN _ord INT;
+    """)
+
+    staged = [r + (i,) for i, r in enumerate(rows)]
+    if method == "copy":
+        copy_rows(cur, stage, list(cols) + ["_ord"], staged)
+    else:
+        values_rows(cur, stage, list(cols) + ["_ord"], staged)
+    return stage
+
+
+def upsert_table(cur, table: str, rows: Sequence[Tuple], company_ids: List[str],
+                 method: str = LOAD_METHOD) -> int:
+    """
+    Makes `table` hold exactly `rows` for `company_ids`:
+      keyed tables   -> delete rows whose key vanished, then
+                        INSERT .. ON CONFLICT (key) DO UPDATE (changed rows only)
+      keyless tables -> delete the companies' rows, then insert
+    Re-running with the same payloads leaves the table unchanged.
+    """
+    cols = columns_for(table)
+    key = NATURAL_KEYS[table]
+    rows = integer_rows(table, cols, rows)
+
+    if key is None:
+        cur.execute(f"DELETE FROM {table} WHERE company_id = ANY(%s)", (company_ids,))
+        if method == "copy":
+            return copy_rows(cur, table, cols, rows)
+        return values_rows(cur, table, cols, rows)
+
+    if not rows and table != "companies":
+        cur.execute(f"DELETE FROM {table} WHERE company_id = ANY(%s)", (company_ids,))
+        return 0
+
+    stage = _stage(cur, table, cols, rows, method)
+    keys = ", ".join(key)
+    rest = [c for c in cols if c not in key]
+
+    if table != "companies":
+        match = " AND ".join(f"s.{k} = t.{k}" for k in key)
+        cur.execute(f"""
+            DELETE FROM {table} t
+            WHERE t.company_id = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE {match})
+        """, (company_ids,))
+
+    if rest:
+        on_conflict = (
+            f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in rest)} "
+            f"WHERE ({', '.join(f'{table}.{c}' for c in rest)}) "
+            f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in rest)})"
+        )
+    else:
+        on_conflict = "DO NOTHING"
+
+    # last occurrence wins when a payload repeats a key
+    cur.execute(f"""
+        INSERT INTO {table} ({','.join(cols)})
+        SELECT DISTINCT ON ({keys}) {','.join(cols)}
+        FROM {stage}
+        ORDER BY {keys}, _ord DESC
+        ON CONFLICT ({keys}) {on_conflict}
+    """)
+    return len(rows)
+
+
+def load_payloads(cur, payloads: Sequence[Payload],
+                  stats: Optional[LoadStats] = None,
+                  method: str = LOAD_METHOD,
+                  metrics: Optional[PipelineMetrics] = None) -> LoadStats:
+    """
+    Upserts every table for `payloads` with one bulk write per table.
+    Caller owns the transaction. Each table's write is one observation of
+    the metrics stage "insert.<table>".
+    """
+    stats = stats or LoadStats()
+
+    # one payload per company (the latest wins)
+    latest = {payload_id(p): p for p in payloads}
+    rows = collect_rows(latest.values())
+    company_ids = list(latest)
+
+    for table in LOAD_ORDER:
+        t0 = time.perf_counter()
+        n = upsert_table(cur, table, rows[table], company_ids, method)
+        took = time.perf_counter() - t0
+        stats.add(table, n, took)
+        if metrics is not None:
+            metrics.observe(f"insert.{table}", took)
+
+    return stats
+
+
+# =====================================================
+# CHANGE DETECTION
+# =====================================================
+
+def changed_payloads(cur, payloads: Sequence[Payload]
+                     ) -> Tuple[List[Payload], Dict[str, str]]:
+    """
+    Drops payloads whose content hash equals ingest_state.content_hash.
+    Returns (changed payloads, {company_id: new hash}).
+    """
+    by_id = {payload_id(p): (p, payload_hash(p)) for p in payloads}
+
+    cur.execute(
+        "SELECT company_id, content_hash FROM ingest_state WHERE company_id = ANY(%s)",
+        (list(by_id),)
+    )
+    stored = dict(cur.fetchall())
+
+    changed = {cid: ph for cid, ph in by_id.items() if stored.get(cid) != ph[1]}
+    return (
+        [p for p, _ in changed.values()],
+        {cid: h for cid, (_, h) in changed.items()},
+    )
+
+
+def record_hashes(cur, hashes: Dict[str, str]) -> List[str]:
+    """
+    Stores the new payload hashes. Returns the companies whose hash
+    actually changed (or that are new); loaded_at only moves for those.
+    """
+    if not hashes:
+        return []
+    rows = execute_values(cur, """
+        INSERT INTO ingest_state (company_id, content_hash) VALUES %s
+        ON CONFLICT (company_id) DO UPDATE
+            SET content_hash = EXCLUDED.content_hash, loaded_at = now()
+            WHERE ingest_state.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING company_id
+    """, list(hashes.items()), page_size=len(hashes), fetch=True)
+    return [r[0] for r in rows]
+
+
+def bump_versions(cur, company_ids: List[str]) -> None:
+    """
+    New content_versions entry for each company; app processes poll it to
+    drop their cached pages (see page_cache.VersionPoller).
+    """
+    if not company_ids:
+        return
+    cur.execute("""
+        INSERT INTO content_versions (company_id, version)
+        SELECT cid, nextval('content_version_seq')
+        FROM unnest(%s::text[]) AS cid
+        ON CONFLICT (company_id) DO UPDATE
+            SET version = EXCLUDED.version, changed_at = now()
+    """, (company_ids,))
+
+
+# =====================================================
+# BATCH DRIVER
+# =====================================================
+
+def load_batch(conn, payloads: Sequence[Payload],
+               stats: Optional[LoadStats] = None,
+               method: str = LOAD_METHOD,
+               verbose: bool = True,
+               changed_only: bool = LOAD_CHANGED_ONLY,
+               metrics: Optional[PipelineMetrics] = None) -> LoadStats:
+    """
+    One transaction for the whole batch. If it fails, retries company by
+    company so one bad payload doesn't take the batch down with it.
+    With changed_only, companies whose payload hash is unchanged since
+    their last load are skipped. Companies whose content changed get a new
+    content version (invalidating their cached pages), a refreshed
+    company_summary row and recomputed metrics rows.
+    With metrics, committed batches are observed as stage "load" (their
+    time split over the batch's companies) and batch retries are counted.
+    """
+    stats = stats or LoadStats()
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+
+    try:
+        # only committed work is counted
+        attempt = LoadStats()
+        todo = list(payloads)
+
+        if changed_only:
+            todo, hashes = changed_payloads(cur, todo)
+            attempt.skipped = len(payloads) - len(todo)
+        else:
+            hashes = {payload_id(p): payload_hash(p) for p in todo}
+
+        if todo:
+            load_payloads(cur, todo, attempt, method, metrics)
+            changed = record_hashes(cur, hashes)
+            bump_versions(cur, changed)
+            refresh_summary(cur, changed)
+            refresh_metrics(cur, changed)
+
+        conn.commit()
+        attempt.companies = len(todo)
+        stats.merge(attempt)
+        if metrics is not None:
+            took = time.perf_counter() - t0
+            metrics.observe("load", took)
+            metrics.charge("load", took, [payload_id(p) for p in payloads])
+        if verbose:
+            for p in todo:
+                print("✅ Saved", payload_id(p))
+
+    except Exception as batch_error:
+        conn.rollback()
+        if len(payloads) == 1:
+            cid = payload_id(payloads[0])
+            print("❌ Failed for", cid, batch_error)
+            stats.failed.append(cid)
+        else:
+            if metrics is not None:
+                metrics.incr("load_batch_retries")
+            for p in payloads:
+                load_batch(conn, [p], stats, method, verbose, changed_only, metrics)
+
+    finally:
+        cur.close()
+
+    return stats
+
+
+def batched(items: Iterable[Any], size: int = LOAD_BATCH_SIZE) -> Iterable[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,199 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from db_pool import DB_SSLMODE
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+COMPANIES_PAGE_SIZE = int(os.getenv("COMPANIES_PAGE_SIZE", "100"))
+COMPANIES_PAGE_MAX = 500
+
+HOME_EXAMPLES = 5
+
+
+# =====================================================
+# REFRESH (called by bulk_loader for the companies it touched)
+# =====================================================
+# company_summary (migration 7) holds one row per company with what the
+# home and list pages need: display name, logo, sort key and whether the
+# company has analysis + pros/cons ("has_data"). Rows are only rewritten
+# when something actually changed.
+
+REFRESH_SQL = """
+    INSERT INTO company_summary
+        (company_id, company_name, company_logo, sort_key, has_data)
+    SELECT
+        c.company_id,
+        c.company_name,
+        c.company_logo,
+        COALESCE(c.company_name, c.company_id),
+        EXISTS (
+            SELECT 1 FROM analysis a WHERE a.company_id = c.company_id
+        )
+        AND EXISTS (
+            SELECT 1 FROM prosandcons p
+            WHERE p.company_id = c.company_id
+              AND (p.pros IS NOT NULL OR p.cons IS NOT NULL)
+        )
+    FROM companies c
+    {where}
+    ON CONFLICT (company_id) DO UPDATE SET
+        company_name = EXCLUDED.company_name,
+        company_logo = EXCLUDED.company_logo,
+        sort_key = EXCLUDED.sort_key,
+        has_data = EXCLUDED.has_data,
+        refreshed_at = now()
+    WHERE (company_summary.company_name, company_summary.company_logo,
+           company_summary.sort_key, company_summary.has_data)
+          IS DISTINCT FROM
+          (EXCLUDED.company_name, EXCLUDED.company_logo,
+           EXCLUDED.sort_key, EXCLUDED.has_data)
+"""
+
+
+def refresh_summary(cur, company_ids: Optional[List[str]] = None) -> int:
+    """
+    Recomputes company_summary rows for company_ids (all companies when
+    None). Caller owns the transaction. Returns rows written.
+    """
+    if company_ids is None:
+        cur.execute(REFRESH_SQL.format(where=""))
+    elif company_ids:
+        cur.execute(
+            REFRESH_SQL.format(where="WHERE c.company_id = ANY(%s)"),
+            (list(company_ids),)
+        )
+    else:
+        return 0
+    return cur.rowcount
+
+
+# =====================================================
+# READS (app.py)
+# =====================================================
+
+# partial covering index company_summary_examples_idx -> index-only scan
+EXAMPLES_SQL = """
+    SELECT company_id, company_name
+    FROM company_summary
+    WHERE has_data
+    ORDER BY sort_key, company_id
+    LIMIT %s
+"""
+
+# covering index company_summary_sort_idx; keyset on (sort_key, company_id)
+PAGE_FIRST_SQL = """
+    SELECT company_id, company_name, company_logo, sort_key
+    FROM company_summary
+    ORDER BY sort_key, company_id
+    LIMIT %s
+"""
+
+PAGE_AFTER_SQL = """
+    SELECT company_id, company_name, company_logo, sort_key
+    FROM company_summary
+    WHERE (sort_key, company_id) > (%s, %s)
+    ORDER BY sort_key, company_id
+    LIMIT %s
+"""
+
+
+def fetch_examples(conn, limit: int = HOME_EXAMPLES) -> List[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute(EXAMPLES_SQL, (limit,))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def encode_cursor(sort_key: str, company_id: str) -> str:
+    raw = json.dumps([sort_key, company_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[str, str]]:
+    # a mangled token just means "first page"
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_key, company_id = json.loads(raw)
+        return str(sort_key), str(company_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _page_query(after: Optional[str], limit: int) -> Tuple[str, Tuple]:
+    # one extra row tells whether there is a next page
+    position = decode_cursor(after)
+    if position is None:
+        return PAGE_FIRST_SQL, (limit + 1,)
+    return PAGE_AFTER_SQL, (*position, limit + 1)
+
+
+def _page_result(rows: List[Dict[str, Any]], limit: int
+                 ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["sort_key"], rows[-1]["company_id"])
+
+
+def fetch_company_page(conn, after: Optional[str] = None,
+                       limit: int = COMPANIES_PAGE_SIZE
+                       ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of the company list in name order.
+    Returns (companies, cursor of the next page or None).
+    """
+    limit = max(1, min(limit, COMPANIES_PAGE_MAX))
+
+    cur = conn.cursor()
+    cur.execute(*_page_query(after, limit))
+    rows = cur.fetchall()
+    cur.close()
+
+    return _page_result(rows, limit)
+
+
+# ---------- psycopg 3 async twins (db_async) ----------
+async def afetch_examples(conn, limit: int = HOME_EXAMPLES) -> List[Dict[str, Any]]:
+    async with conn.cursor() as cur:
+        await cur.execute(EXAMPLES_SQL, (limit,))
+        return await cur.fetchall()
+
+
+async def afetch_company_page(conn, after: Optional[str] = None,
+                              limit: int = COMPANIES_PAGE_SIZE
+                              ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    limit = max(1, min(limit, COMPANIES_PAGE_MAX))
+
+    async with conn.cursor() as cur:
+        await cur.execute(*_page_query(after, limit))
+        rows = await cur.fetchall()
+
+    return _page_result(rows, limit)
+
+
+# =====================================================
+# CLI (full rebuild, e.g. after loading outside bulk_loader)
+# =====================================================
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    n = refresh_summary(cur)
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f"✅ company_summary refreshed ({n} rows changed)")
@@ -0,0 +1,82 @@
+import os
+from typing import Any, Dict, Optional
+
+from db_pool import (
+    DB_SSLMODE,
+    POOL_MAX_OVERFLOW,
+    POOL_RECYCLE,
+    POOL_SIZE,
+    POOL_TIMEOUT,
+)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# sync  -> psycopg2 ConnectionPool (db_pool), DB work runs in the threadpool
+# async -> psycopg 3 AsyncConnectionPool, DB work is awaited on the loop
+DB_DRIVER = os.getenv("DB_DRIVER", "sync")
+
+# idle connections above min_size are closed after this long
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+
+# =====================================================
+# FACTORY
+# =====================================================
+
+def create_async_pool(dsn: Optional[str] = None, cursor_factory: Any = None,
+                      **overrides: Any):
+    """
+    AsyncConnectionPool sized and configured like db_pool.create_pool():
+    autocommit, dict rows, same sslmode / timeouts. Not opened yet:
+    `await pool.open()` inside the running loop (app lifespan).
+    cursor_factory replaces psycopg's AsyncCursor (query tracing).
+    """
+    # psycopg 3 is only needed with DB_DRIVER=async
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    settings: Dict[str, Any] = {
+        "min_size": POOL_SIZE,
+        "max_size": POOL_SIZE + POOL_MAX_OVERFLOW,
+        "timeout": POOL_TIMEOUT,
+        "max_lifetime": POOL_RECYCLE,
+        "max_idle": POOL_MAX_IDLE,
+    }
+    settings.update(overrides)
+
+    kwargs: Dict[str, Any] = {
+        "autocommit": True,
+        "row_factory": dict_row,
+        "sslmode": DB_SSLMODE,
+        "connect_timeout": 5,
+    }
+    if cursor_factory is not None:
+        kwargs["cursor_factory"] = cursor_factory
+
+    return AsyncConnectionPool(
+        dsn or os.environ["DATABASE_URL"],
+        kwargs=kwargs,
+        open=False,
+        name="app",
+        **settings
+    )
+
+
+def async_pool_stats(pool) -> Dict[str, Any]:
+    stats = pool.get_stats()
+    return {
+        "driver": "async",
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "open": stats.get("pool_size", 0),
+        "idle": stats.get("pool_available", 0),
+        "waiting": stats.get("requests_waiting", 0),
+        "checkouts": stats.get("requests_num", 0),
+        "queued": stats.get("requests_queued", 0),
+        "timeouts": stats.get("requests_errors", 0),
+        "wait_seconds": stats.get("requests_wait_ms", 0) / 1000,
+        "connects": stats.get("connections_num", 0),
+    }
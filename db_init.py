@@ -4,11 +4,14 @@ load_dotenv()
 import os
 import psycopg2
 
+from db_pool import DB_SSLMODE
+from migrations import migrate
+
 
 def init_db(reset=False):
     conn = psycopg2.connect(
         os.environ["DATABASE_URL"],
-        sslmode="require"
+        sslmode=DB_SSLMODE
     )
     cur = conn.cursor()
 
@@ -16,6 +19,11 @@ def init_db(reset=False):
     if reset:
         print("⚠️ RESET MODE: DROPPING ALL TABLES")
         cur.execute("""
+            DROP TABLE IF EXISTS metrics;
+            DROP TABLE IF EXISTS company_summary;
+            DROP TABLE IF EXISTS content_versions;
+            DROP SEQUENCE IF EXISTS content_version_seq;
+            DROP TABLE IF EXISTS ingest_state;
             DROP TABLE IF EXISTS documents;
             DROP TABLE IF EXISTS cashflow;
             DROP TABLE IF EXISTS profitandloss;
@@ -23,9 +31,23 @@ def init_db(reset=False):
             DROP TABLE IF EXISTS prosandcons;
             DROP TABLE IF EXISTS analysis;
             DROP TABLE IF EXISTS companies;
+            DROP TABLE IF EXISTS schema_migrations;
         """)
 
-    # ✅ SAFE CREATE (NO DATA LOSS)
+    create_tables(cur)
+    conn.commit()
+    cur.close()
+
+    # ✅ indexes / keys / later schema changes (versioned, idempotent)
+    migrate(conn)
+    conn.close()
+
+    print("✅ DB schema ensured (no data loss)")
+
+
+def create_tables(cur):
+    # ✅ SAFE CREATE (NO DATA LOSS) — base tables only, everything
+    # added after this lives in migrations.py
     cur.execute("""
         CREATE TABLE IF NOT EXISTS companies (
             company_id VARCHAR(20) PRIMARY KEY,
@@ -110,12 +132,6 @@ def init_db(reset=False):
         );
     """)
 
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    print("✅ DB schema ensured (no data loss)")
-
 
 if __name__ == "__main__":
     # ⚠️ CHANGE THIS ONLY WHEN YOU WANT FULL RESET
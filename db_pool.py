@@ -0,0 +1,247 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+
+# =====================================================
+# CONFIG (env driven, Railway/Render safe defaults)
+# =====================================================
+
+DB_SSLMODE = os.getenv("DB_SSLMODE", "require")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# =====================================================
+# CONNECTION POOL
+# =====================================================
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool with overflow, recycle and health checks.
+
+    - pool_size connections are kept open between requests
+    - up to max_overflow extra connections are opened under burst load
+      and closed again as soon as they are returned
+    - connections older than recycle seconds are replaced
+    - connections idle longer than ping_after seconds are checked with
+      SELECT 1 before being handed out (no extra round trip when hot)
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        timeout: float = POOL_TIMEOUT,
+        recycle: float = POOL_RECYCLE,
+        ping_after: float = POOL_PING_AFTER,
+        **connect_kwargs: Any
+    ):
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.connect_kwargs = connect_kwargs
+
+        # idle entries: (conn, created_at, returned_at)
+        self._idle: Deque[Tuple[Any, float, float]] = deque()
+        self._created: Dict[int, float] = {}
+        self._open = 0
+        self._lock = threading.Condition()
+        self._closed = False
+
+        self._counters = {
+            "checkouts": 0,
+            "connects": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    # ---------- internals ----------
+    def _connect(self):
+        """
+        Opens a connection for a slot already reserved in self._open.
+        """
+        try:
+            conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+            conn.autocommit = True
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._counters["connects"] += 1
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _replace(self, conn):
+        """
+        Closes conn and opens a new one in the same slot.
+        """
+        with self._lock:
+            self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return self._connect()
+
+    def _alive(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            with self._lock:
+                self._counters["ping_failures"] += 1
+            return False
+
+    # ---------- public API ----------
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn = None
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("pool is closed")
+
+                if self._idle:
+                    conn, created, returned = self._idle.pop()
+                    break
+
+                if self._open < self.pool_size + self.max_overflow:
+                    self._open += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"no connection available within {self.timeout}s"
+                    )
+                self._lock.wait(remaining)
+
+            self._counters["wait_seconds"] += time.monotonic() - start
+
+        if conn is None:
+            conn = self._connect()
+        else:
+            now = time.monotonic()
+            if conn.closed or now - created > self.recycle:
+                with self._lock:
+                    self._counters["recycled"] += 1
+                conn = self._replace(conn)
+            elif now - returned > self.ping_after and not self._alive(conn):
+                conn = self._replace(conn)
+
+        # only connections actually handed out count (a failed connect raised above)
+        with self._lock:
+            self._counters["checkouts"] += 1
+        return conn
+
+    def putconn(self, conn) -> None:
+        try:
+            broken = (
+                conn.closed
+                or conn.get_transaction_status()
+                == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+            )
+            if not broken and not conn.autocommit:
+                conn.rollback()
+        except Exception:
+            broken = True
+
+        with self._lock:
+            created = self._created.get(id(conn), time.monotonic())
+
+            if broken or self._closed or len(self._idle) >= self.pool_size:
+                if broken:
+                    self._counters["discarded"] += 1
+                self._created.pop(id(conn), None)
+                self._open -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                self._idle.append((conn, created, time.monotonic()))
+
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._open
+            idle = len(self._idle)
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": total,
+                "idle": idle,
+                "in_use": total - idle,
+                "overflow": max(0, total - self.pool_size),
+                **self._counters,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._created.pop(id(conn), None)
+                self._open -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._lock.notify_all()
+
+
+# =====================================================
+# FACTORY
+# =====================================================
+
+def create_pool(dsn: Optional[str] = None, **overrides: Any) -> ConnectionPool:
+    """
+    Pool configured the same way the old per-request get_db() connected;
+    overrides replace pool settings or connect kwargs (e.g. cursor_factory).
+    """
+    settings: Dict[str, Any] = {
+        "sslmode": DB_SSLMODE,
+        "connect_timeout": 5,
+        "cursor_factory": RealDictCursor,
+    }
+    settings.update(overrides)
+    return ConnectionPool(dsn or os.environ["DATABASE_URL"], **settings)
@@ -12,6 +12,11 @@ conn = psycopg2.connect(
 cur = conn.cursor()
 
 cur.execute("""
+DROP TABLE IF EXISTS metrics;
+DROP TABLE IF EXISTS company_summary;
+DROP TABLE IF EXISTS content_versions;
+DROP SEQUENCE IF EXISTS content_version_seq;
+DROP TABLE IF EXISTS ingest_state;
 DROP TABLE IF EXISTS documents;
 DROP TABLE IF EXISTS cashflow;
 DROP TABLE IF EXISTS profitandloss;
@@ -19,6 +24,7 @@ DROP TABLE IF EXISTS balancesheet;
 DROP TABLE IF EXISTS prosandcons;
 DROP TABLE IF EXISTS analysis;
 DROP TABLE IF EXISTS companies;
+DROP TABLE IF EXISTS schema_migrations;
 """)
 
 conn.commit()
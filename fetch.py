@@ -1,20 +1,18 @@
-import pandas as pd
-import requests
-import time
 import json
 import os
 
-# ================= CONFIG =================
-API_KEY = os.getenv("API_KEY", "ghfkffu6378382826hhdjgk")
-BASE_URL = "https://bluemutualfund.in/server/api/company.php"
+from fetch_cache import create_cache
+from fetch_engine import FetchEngine
 
+# ================= CONFIG =================
 EXCEL_FILE = "data/Nifty100Companies.xlsx"
 RAW_DATA_DIR = "raw_data"
 
-os.makedirs(RAW_DATA_DIR, exist_ok=True)
-
 # ================= LOAD COMPANY IDS =================
 def get_company_ids():
+    # pandas + openpyxl only for the company list, not on every import
+    import pandas as pd
+
     df = pd.read_excel(EXCEL_FILE)
 
     print("Excel columns:", df.columns.tolist())
@@ -35,31 +33,14 @@ def get_company_ids():
 
 # ================= FETCH SINGLE COMPANY =================
 def fetch_company(company_id, retries=3):
-    url = f"{BASE_URL}?id={company_id}&api_key={API_KEY}"
-
-    for attempt in range(retries):
-        try:
-            r = requests.get(url, timeout=15)
-
-            if r.status_code != 200:
-                raise Exception(f"HTTP {r.status_code}")
-
-            data = r.json()
-
-            if "company" not in data or "data" not in data:
-                raise Exception("Missing 'company' or 'data' key")
-
-            return data
-
-        except Exception as e:
-            print(f"❌ {company_id} failed (attempt {attempt+1}/{retries}): {e}")
-            time.sleep(2)
-
-    print(f"🚨 {company_id} skipped after {retries} retries")
-    return None
+    # same retry / backoff / validation as the concurrent run()
+    with FetchEngine(retries=retries, concurrency=1) as engine:
+        return engine.fetch(company_id)
 
 # ================= SAVE RAW JSON =================
 def save_raw_json(company_id, data):
+    # archival mode only (RAW_JSON=1); runs are kept as snapshots
+    os.makedirs(RAW_DATA_DIR, exist_ok=True)
     path = os.path.join(RAW_DATA_DIR, f"{company_id}.json")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
@@ -67,26 +48,37 @@ def save_raw_json(company_id, data):
 
 # ================= MAIN (OPTIONAL STANDALONE RUN) =================
 def run():
+    # pyarrow only for a standalone fetch run, not on every import
+    from snapshots import RAW_JSON_ARCHIVE, SnapshotWriter
+
     company_ids = get_company_ids()
 
     success = 0
     failed = 0
 
-    for cid in company_ids:
-        print(f"\nFetching → {cid}")
-        data = fetch_company(cid)
+    # concurrent + token-bucket rate limited (FETCH_CONCURRENCY / FETCH_RATE);
+    # the run is stored as one columnar snapshot (snapshots.py); companies
+    # fetched within FETCH_CACHE_TTL come from the response cache
+    with FetchEngine(cache=create_cache()) as engine, SnapshotWriter() as snapshot:
+        for cid, data in engine.iter_fetch(company_ids):
+            print(f"\nFetched → {cid}")
 
-        if data:
-            save_raw_json(cid, data)
-            success += 1
-        else:
-            failed += 1
+            if data:
+                snapshot.add(data)
+                if RAW_JSON_ARCHIVE:
+                    save_raw_json(cid, data)
+                success += 1
+            else:
+                failed += 1
 
-        time.sleep(1)
+        stats = engine.stats
 
     print("\n==============================")
     print("Success:", success)
     print("Failed:", failed)
+    print("Requests:", stats["requests"], "| Retries:", stats["retries"])
+    if engine.cache is not None:
+        print(engine.cache_summary())
     print("==============================")
 
 if __name__ == "__main__":
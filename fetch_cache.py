@@ -0,0 +1,157 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE", "1") == "1"
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", os.path.join("cache", "fetch_cache.sqlite3"))
+
+# a company validated less than this long ago is served from the cache
+# without a request (fundamentals change quarterly); 0 = always revalidate
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", str(7 * 24 * 3600)))
+
+FETCH_CACHE_COMPRESS_LEVEL = int(os.getenv("FETCH_CACHE_COMPRESS_LEVEL", "6"))
+
+
+class CacheEntry(NamedTuple):
+    company_id: str
+    body: bytes              # response body as received
+    content_hash: str        # sha256 of body
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float        # body last downloaded
+    validated_at: float      # body last confirmed current (200 / 304)
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.validated_at
+
+    def validators(self) -> Dict[str, str]:
+        """
+        Conditional request headers for what the upstream sent with it.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+# =====================================================
+# RESPONSE CACHE
+# =====================================================
+
+class ResponseCache:
+    """
+    Last good API response per company, in one sqlite file.
+
+    FetchEngine looks an entry up before each request:
+      - younger than ttl          -> served as is, no request ("fresh")
+      - older, with validators    -> conditional GET; 304 keeps the body
+      - 200 with the same sha256  -> body unchanged, only re-timestamped
+    Shared by the fetch threads; every call takes the lock.
+    """
+
+    def __init__(self, path: str = FETCH_CACHE_PATH, ttl: float = FETCH_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                company_id TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, company_id: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute("""
+                SELECT body, content_hash, etag, last_modified, fetched_at, validated_at
+                FROM responses WHERE company_id = ?
+            """, (company_id,)).fetchone()
+        if row is None:
+            return None
+
+        try:
+            body = zlib.decompress(row[0])
+        except zlib.error:
+            return None   # unreadable entry: treated as a miss, overwritten
+        return CacheEntry(company_id, body, *row[1:])
+
+    def is_fresh(self, entry: CacheEntry, now: Optional[float] = None) -> bool:
+        return self.ttl > 0 and entry.age(now) < self.ttl
+
+    def put(self, company_id: str, body: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> CacheEntry:
+        now = time.time()
+        entry = CacheEntry(company_id, body, body_hash(body), etag, last_modified, now, now)
+        blob = zlib.compress(body, FETCH_CACHE_COMPRESS_LEVEL)
+        with self._lock:
+            self._db.execute("""
+                INSERT OR REPLACE INTO responses
+                    (company_id, body, size, content_hash, etag, last_modified,
+                     fetched_at, validated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (company_id, blob, len(body), entry.content_hash, etag,
+                  last_modified, now, now))
+        return entry
+
+    def touch(self, company_id: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> None:
+        """
+        Marks the stored body as confirmed current (304 / same hash),
+        keeping the old validators unless new ones came with the reply.
+        """
+        with self._lock:
+            self._db.execute("""
+                UPDATE responses
+                SET validated_at = ?,
+                    etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified)
+                WHERE company_id = ?
+            """, (time.time(), etag, last_modified, company_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, size, stored = self._db.execute(
+                "SELECT count(*), COALESCE(sum(size), 0), COALESCE(sum(length(body)), 0) "
+                "FROM responses"
+            ).fetchone()
+        return {"path": self.path, "ttl_s": self.ttl, "entries": n,
+                "bytes": size, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_cache(path: str = FETCH_CACHE_PATH, ttl: float = FETCH_CACHE_TTL
+                 ) -> Optional[ResponseCache]:
+    """
+    The fetch cache, or None when FETCH_CACHE=0.
+    """
+    return ResponseCache(path, ttl) if FETCH_CACHE_ENABLED else None
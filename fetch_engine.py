@@ -0,0 +1,320 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fetch_cache import ResponseCache, body_hash
+from instrumentation import CompanyProfiler, PipelineMetrics, timer
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+API_KEY = os.getenv("API_KEY", "ghfkffu6378382826hhdjgk")
+BASE_URL = os.getenv(
+    "COMPANY_API_URL",
+    "https://bluemutualfund.in/server/api/company.php"
+)
+
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+FETCH_RATE = float(os.getenv("FETCH_RATE", "5"))          # requests / second
+FETCH_BURST = int(os.getenv("FETCH_BURST", "5"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+FETCH_BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", "0.5"))
+FETCH_BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX", "20"))
+
+
+class FetchError(Exception):
+    pass
+
+
+# =====================================================
+# RATE LIMITER
+# =====================================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most
+    `capacity` saved up for bursts. rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a token is available. Returns seconds waited.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+def backoff_delay(attempt: int, base: float = FETCH_BACKOFF_BASE,
+                  cap: float = FETCH_BACKOFF_MAX) -> float:
+    """
+    Exponential backoff with full jitter (attempt starts at 0).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# =====================================================
+# FETCH ENGINE
+# =====================================================
+
+class FetchEngine:
+    """
+    Concurrent company fetcher.
+
+    - a thread pool of `concurrency` workers
+    - one keep-alive requests.Session per worker thread
+    - a shared token bucket instead of fixed sleeps
+    - retries with exponential backoff + jitter (honours Retry-After)
+    - optional ResponseCache: fresh entries skip the request, stale ones
+      are revalidated with ETag / Last-Modified, unchanged bodies are
+      recognised by content hash
+    - optional PipelineMetrics: "throttle", "fetch" (each HTTP attempt)
+      and "parse" (JSON decode) timed per company; optional
+      CompanyProfiler: each company's fetch() runs under cProfile, one at a time
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        api_key: str = API_KEY,
+        concurrency: int = FETCH_CONCURRENCY,
+        rate: float = FETCH_RATE,
+        burst: int = FETCH_BURST,
+        retries: int = FETCH_RETRIES,
+        timeout: float = FETCH_TIMEOUT,
+        verbose: bool = True,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        profiler: Optional[CompanyProfiler] = None
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.timeout = timeout
+        self.verbose = verbose
+        self.limiter = TokenBucket(rate, burst)
+        self.cache = cache
+        self.metrics = metrics
+        self.profiler = profiler
+
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "ok": 0,
+            "failed": 0,
+            "retries": 0,
+            "bytes": 0,
+            "throttle_wait_s": 0.0,
+            # cache outcomes, one per successful fetch when a cache is set
+            "cache_fresh": 0,        # served without a request
+            "cache_revalidated": 0,  # 304 Not Modified
+            "cache_unchanged": 0,    # 200, same body as cached
+            "cache_miss": 0,         # 200, new or changed body
+            "bytes_saved": 0,        # body bytes not downloaded
+        }
+
+    # ---------- sessions ----------
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _count(self, key: str, n: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _log(self, msg: str) -> None:
+        if self.verbose:
+            print(msg)
+
+    # ---------- cache ----------
+    def _cached(self, company_id: str):
+        """
+        (entry, data): data is set when the entry is fresh enough to use
+        without asking the API.
+        """
+        if self.cache is None:
+            return None, None
+        entry = self.cache.get(company_id)
+        if entry is None or not self.cache.is_fresh(entry):
+            return entry, None
+        try:
+            with timer(self.metrics, "parse", company_id):
+                return entry, json.loads(entry.body)
+        except ValueError:
+            return None, None
+
+    def _store(self, company_id: str, entry, r: requests.Response) -> None:
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+
+        if entry is not None and entry.content_hash == body_hash(r.content):
+            self.cache.touch(company_id, etag, last_modified)
+            self._count("cache_unchanged")
+        else:
+            self.cache.put(company_id, r.content, etag, last_modified)
+            self._count("cache_miss")
+
+    # ---------- single company ----------
+    def fetch(self, company_id: str) -> Optional[Dict[str, Any]]:
+        entry, data = self._cached(company_id)
+        if data is not None:
+            self._count("cache_fresh")
+            self._count("bytes_saved", len(entry.body))
+            self._count("ok")
+            return data
+
+        session = self._session()
+        params = {"id": company_id, "api_key": self.api_key}
+        headers = entry.validators() if entry is not None else {}
+
+        for attempt in range(self.retries):
+            retry_after = None
+            try:
+                with timer(self.metrics, "throttle", company_id):
+                    self._count("throttle_wait_s", self.limiter.acquire())
+                self._count("requests")
+
+                with timer(self.metrics, "fetch", company_id):
+                    r = session.get(self.base_url, params=params, headers=headers,
+                                    timeout=self.timeout)
+
+                if r.status_code == 304 and entry is not None:
+                    self.cache.touch(company_id, r.headers.get("ETag"),
+                                     r.headers.get("Last-Modified"))
+                    self._count("cache_revalidated")
+                    self._count("bytes_saved", len(entry.body))
+                    self._count("ok")
+                    with timer(self.metrics, "parse", company_id):
+                        return json.loads(entry.body)
+
+                if r.status_code != 200:
+                    if r.status_code in (429, 503):
+                        retry_after = r.headers.get("Retry-After")
+                    raise FetchError(f"HTTP {r.status_code}")
+
+                self._count("bytes", len(r.content))
+                with timer(self.metrics, "parse", company_id):
+                    data = r.json()
+
+                if "company" not in data or "data" not in data:
+                    raise FetchError("Missing 'company' or 'data' key")
+
+                if self.cache is not None:
+                    self._store(company_id, entry, r)
+
+                self._count("ok")
+                return data
+
+            except Exception as e:
+                self._log(f"❌ {company_id} failed (attempt {attempt+1}/{self.retries}): {e}")
+
+                if attempt + 1 < self.retries:
+                    self._count("retries")
+                    delay = backoff_delay(attempt)
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                    time.sleep(delay)
+
+        self._count("failed")
+        self._log(f"🚨 {company_id} skipped after {self.retries} retries")
+        return None
+
+    # ---------- many companies ----------
+    def iter_fetch(
+        self, company_ids: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Yields (company_id, data or None) in completion order. Callers
+        save / insert in their own thread while fetches keep running.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="fetch"
+        ) as pool:
+            if self.profiler is not None:
+                futures = {pool.submit(self.profiler.call, cid, self.fetch, cid): cid
+                           for cid in company_ids}
+            else:
+                futures = {pool.submit(self.fetch, cid): cid for cid in company_ids}
+            for fut in as_completed(futures):
+                yield futures[fut], fut.result()
+
+    def record_counts(self, metrics: PipelineMetrics) -> None:
+        """
+        Adds the request / retry / failure / cache counts to metrics
+        (as fetch_<stat>).
+        """
+        for key, n in self.stats.items():
+            metrics.incr(f"fetch_{key}", n)
+
+    def cache_summary(self) -> str:
+        s = self.stats
+        hits = s["cache_fresh"] + s["cache_revalidated"]
+        looked_up = hits + s["cache_unchanged"] + s["cache_miss"]
+        return (
+            f"🗃️ Cache: {hits}/{looked_up} hits "
+            f"({s['cache_fresh']} fresh, {s['cache_revalidated']} not modified), "
+            f"{s['cache_unchanged']} unchanged, {s['cache_miss']} new/changed, "
+            f"{s['bytes_saved'] / 2**20:,.1f} MiB not downloaded"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for s in self._sessions:
+                s.close()
+            self._sessions.clear()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,497 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import hashlib
+import json
+import os
+import sys
+import zlib
+from datetime import datetime, time as dtime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+from bulk_loader import batched, canonical_json
+from db_pool import DB_SSLMODE
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# record every snapshot run saver.py / run_pipeline.py load
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+
+HISTORY_COMPRESS_LEVEL = int(os.getenv("HISTORY_COMPRESS_LEVEL", "6"))
+
+# companies per round trip when recording / loading payloads
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "500"))
+
+# how rows of a section are matched between two versions of a payload;
+# sections not listed are matched by position
+ROW_KEYS: Dict[str, Tuple[str, ...]] = {
+    "profitandloss": ("year",),
+    "balancesheet": ("year",),
+    "cashflow": ("year",),
+    "documents": ("Year", "Annual_Report"),
+}
+
+RUN_ID_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+class HistoryError(ValueError):
+    """
+    Unknown run / bad timestamp (HTTP 400 or 404 at the route).
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _cursor(conn):
+    # tuple rows whatever cursor factory the connection uses
+    return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+
+# =====================================================
+# BLOBS (content-addressed payloads)
+# =====================================================
+
+def encode_payload(payload: Dict[str, Any]) -> Tuple[str, int, bytes]:
+    """
+    (sha256 of the canonical JSON, its size, zlib-compressed bytes).
+    Same hash as bulk_loader.payload_hash for the same payload.
+    """
+    raw = canonical_json(payload)
+    return (
+        hashlib.sha256(raw).hexdigest(),
+        len(raw),
+        zlib.compress(raw, HISTORY_COMPRESS_LEVEL),
+    )
+
+
+def decode_payload(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+def load_blobs(conn, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    wanted = sorted(set(hashes))
+    out: Dict[str, Dict[str, Any]] = {}
+    cur = _cursor(conn)
+    try:
+        for chunk in batched(wanted, HISTORY_BATCH_SIZE):
+            cur.execute(
+                "SELECT hash, payload FROM history_blobs WHERE hash = ANY(%s)",
+                (chunk,)
+            )
+            for h, blob in cur.fetchall():
+                out[h] = decode_payload(bytes(blob))
+    finally:
+        cur.close()
+    return out
+
+
+# =====================================================
+# TIMESTAMPS
+# =====================================================
+
+def run_time(run_id: str) -> Optional[datetime]:
+    # snapshot run ids are their UTC start time (plus a "-<hex>" suffix)
+    started = run_id.split("-", 1)[0]
+    try:
+        return datetime.strptime(started, RUN_ID_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def parse_when(text: str) -> datetime:
+    """
+    "2024-06-30" (end of that day, UTC), an ISO timestamp, or a run id.
+    """
+    text = (text or "").strip()
+    when = run_time(text)
+    if when is not None:
+        return when
+
+    try:
+        when = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise HistoryError(f"invalid timestamp '{text}' (ISO date or run id)") from None
+
+    if len(text) == 10:
+        when = datetime.combine(when.date(), dtime.max)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when
+
+
+# =====================================================
+# RECORDING
+# =====================================================
+# Appending a run writes:
+#   history_runs      one row
+#   history_blobs     one row per payload nobody stored before
+#   history_versions  one row per company whose payload differs from
+#                     its previous version (as of the run's fetch time)
+# An unchanged company costs nothing but the hash comparison.
+
+AS_OF_SQL = """
+    SELECT DISTINCT ON (company_id) company_id, valid_from, run_id, hash
+    FROM history_versions
+    WHERE valid_from <= %s {where}
+    ORDER BY company_id, valid_from DESC
+"""
+
+
+def record_run(conn, run_id: str, payloads: Iterable[Dict[str, Any]],
+               fetched_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Appends one fetch run, committing at the end. A run already recorded
+    is left as it is. Returns what was stored.
+    """
+    fetched_at = fetched_at or run_time(run_id) or datetime.now(timezone.utc)
+    stats = {"run_id": run_id, "companies": 0, "changed": 0,
+             "new_blobs": 0, "new_bytes": 0, "skipped": False}
+
+    cur = _cursor(conn)
+    try:
+        cur.execute("""
+            INSERT INTO history_runs (run_id, fetched_at) VALUES (%s, %s)
+            ON CONFLICT (run_id) DO NOTHING
+            RETURNING run_id
+        """, (run_id, fetched_at))
+        if cur.fetchone() is None:
+            conn.rollback()
+            stats["skipped"] = True
+            return stats
+
+        for batch in batched(payloads, HISTORY_BATCH_SIZE):
+            # a company fetched twice in one run keeps its last payload
+            entries = {
+                str(p["company"].get("id")): encode_payload(p)
+                for p in batch
+                if isinstance(p, dict) and isinstance(p.get("company"), dict)
+            }
+            if not entries:
+                continue
+            stats["companies"] += len(entries)
+
+            cur.execute(
+                AS_OF_SQL.format(where="AND company_id = ANY(%s)"),
+                (fetched_at, list(entries))
+            )
+            previous = {r[0]: r[3] for r in cur.fetchall()}
+
+            changed = {c: e for c, e in entries.items() if previous.get(c) != e[0]}
+            if not changed:
+                continue
+
+            blobs = {h: (h, size, psycopg2.Binary(data)) for h, size, data in changed.values()}
+            new = execute_values(cur, """
+                INSERT INTO history_blobs (hash, size, payload) VALUES %s
+                ON CONFLICT (hash) DO NOTHING
+                RETURNING hash, length(payload)
+            """, list(blobs.values()), page_size=len(blobs), fetch=True)
+            stats["new_blobs"] += len(new)
+            stats["new_bytes"] += sum(r[1] for r in new)
+
+            execute_values(cur, """
+                INSERT INTO history_versions (company_id, valid_from, run_id, hash)
+                VALUES %s
+                ON CONFLICT (company_id, valid_from) DO UPDATE
+                    SET run_id = EXCLUDED.run_id, hash = EXCLUDED.hash
+            """, [(c, fetched_at, run_id, e[0]) for c, e in changed.items()],
+                page_size=len(changed))
+            stats["changed"] += len(changed)
+
+        cur.execute("""
+            UPDATE history_runs
+            SET companies = %s, changed = %s, new_blobs = %s, new_bytes = %s
+            WHERE run_id = %s
+        """, (stats["companies"], stats["changed"], stats["new_blobs"],
+              stats["new_bytes"], run_id))
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return stats
+
+
+def record_snapshot(conn, run_id: str = "latest",
+                    root: Optional[str] = None) -> Dict[str, Any]:
+    # snapshots (pyarrow) only for backfills, not in the web process
+    from snapshots import SNAPSHOT_DIR, iter_payloads, resolve_run
+
+    root = root or SNAPSHOT_DIR
+    run = resolve_run(root, run_id)
+    if run is None:
+        raise FileNotFoundError(f"no snapshot run '{run_id}' in {root}")
+
+    stats = record_run(conn, run, iter_payloads(run, root))
+    if stats["skipped"]:
+        print(f"🕰️ History: run {run} already recorded")
+    else:
+        print(f"🕰️ History: run {run}, {stats['companies']} companies, "
+              f"{stats['changed']} changed, {stats['new_blobs']} new payloads "
+              f"({stats['new_bytes'] / 1024:,.0f} KiB)")
+    return stats
+
+
+# =====================================================
+# TIME TRAVEL
+# =====================================================
+
+def list_history_runs(conn) -> List[Dict[str, Any]]:
+    cur = _cursor(conn)
+    cur.execute("""
+        SELECT run_id, fetched_at, companies, changed, new_blobs, new_bytes
+        FROM history_runs
+        ORDER BY fetched_at, run_id
+    """)
+    cols = [d[0] for d in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    cur.close()
+    return rows
+
+
+def _run_fetched_at(cur, run_id: str) -> datetime:
+    cur.execute("SELECT fetched_at FROM history_runs WHERE run_id = %s", (run_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise HistoryError(f"run '{run_id}' is not in the history", status_code=404)
+    return row[0]
+
+
+def as_of(conn, when: datetime,
+          company_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    {company_id: {"valid_from", "run_id", "hash"}} of the version current
+    at `when`, for company_ids or every company the history knows.
+    """
+    where, params = "", (when,)
+    if company_ids is not None:
+        where, params = "AND company_id = ANY(%s)", (when, list(company_ids))
+
+    cur = _cursor(conn)
+    cur.execute(AS_OF_SQL.format(where=where), params)
+    out = {
+        r[0]: {"valid_from": r[1], "run_id": r[2], "hash": r[3]}
+        for r in cur.fetchall()
+    }
+    cur.close()
+    return out
+
+
+def payloads_as_of(conn, when: datetime, company_ids: Optional[List[str]] = None
+                   ) -> Iterator[Dict[str, Any]]:
+    """
+    The payloads as they were at `when`, in company id order; blobs are
+    fetched HISTORY_BATCH_SIZE companies at a time.
+    """
+    index = as_of(conn, when, company_ids)
+    for chunk in batched(sorted(index), HISTORY_BATCH_SIZE):
+        blobs = load_blobs(conn, (index[c]["hash"] for c in chunk))
+        for c in chunk:
+            yield blobs[index[c]["hash"]]
+
+
+def company_timeline(conn, company_id: str) -> List[Dict[str, Any]]:
+    """
+    Every stored version of one company, oldest first.
+    """
+    cur = _cursor(conn)
+    cur.execute("""
+        SELECT v.valid_from, v.run_id, v.hash, b.size
+        FROM history_versions v
+        JOIN history_blobs b ON b.hash = v.hash
+        WHERE v.company_id = %s
+        ORDER BY v.valid_from
+    """, (company_id,))
+    rows = [
+        {"valid_from": r[0], "run_id": r[1], "hash": r[2], "size": r[3]}
+        for r in cur.fetchall()
+    ]
+    cur.close()
+    return rows
+
+
+# =====================================================
+# DIFF
+# =====================================================
+
+def _row_key(section: str, row: Dict[str, Any], position: int) -> str:
+    keys = ROW_KEYS.get(section)
+    if not keys:
+        return f"#{position}"
+    return " / ".join(str(row.get(k)) for k in keys)
+
+
+def _keyed_rows(section: str, rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for i, row in enumerate(rows):
+        key = _row_key(section, row, i)
+        if key in out:
+            # repeated natural key: fall back to the position
+            key = f"{key} #{i}"
+        out[key] = row
+    return out
+
+
+def _is_rows(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(r, dict) for r in value)
+
+
+def _field_changes(section: str, key: Optional[str], old: Dict[str, Any],
+                   new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"section": section, "key": key, "field": f, "old": old.get(f), "new": new.get(f)}
+        for f in list(old) + [f for f in new if f not in old]
+        if old.get(f) != new.get(f)
+    ]
+
+
+def diff_payloads(old: Optional[Dict[str, Any]],
+                  new: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Field-level changes between two payloads:
+      {"section", "key", "field", "old", "new"}
+    section is "company" or a data section; key identifies the row (year,
+    document, or position); field None means the whole row was added or
+    removed (old / new hold the row).
+    """
+    old = old or {"company": {}, "data": {}}
+    new = new or {"company": {}, "data": {}}
+
+    changes = _field_changes("company", None, old.get("company") or {},
+                             new.get("company") or {})
+
+    old_data, new_data = old.get("data") or {}, new.get("data") or {}
+    for section in list(old_data) + [s for s in new_data if s not in old_data]:
+        a, b = old_data.get(section), new_data.get(section)
+        if a == b:
+            continue
+
+        if not (_is_rows(a or []) and _is_rows(b or [])):
+            changes.append({"section": section, "key": None, "field": None,
+                            "old": a, "new": b})
+            continue
+
+        a_rows, b_rows = _keyed_rows(section, a or []), _keyed_rows(section, b or [])
+        for key in list(a_rows) + [k for k in b_rows if k not in a_rows]:
+            ra, rb = a_rows.get(key), b_rows.get(key)
+            if ra is None or rb is None:
+                changes.append({"section": section, "key": key, "field": None,
+                                "old": ra, "new": rb})
+            elif ra != rb:
+                changes.extend(_field_changes(section, key, ra, rb))
+
+    return changes
+
+
+def changed_fields(changes: List[Dict[str, Any]]) -> List[str]:
+    """
+    "section.field" names touched by a diff ("section" for whole rows).
+    """
+    seen: Dict[str, None] = {}
+    for c in changes:
+        seen.setdefault(c["section"] if c["field"] is None
+                        else f"{c['section']}.{c['field']}", None)
+    return list(seen)
+
+
+def diff_runs(conn, from_run: str, to_run: str, fields: bool = True,
+              company_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Companies (and, with fields, the fields) whose payload differs between
+    the state as of from_run and as of to_run. Only companies with a
+    version recorded between the two runs are compared, so the cost
+    follows the number of changes, not the universe.
+    """
+    cur = _cursor(conn)
+    try:
+        t_from = _run_fetched_at(cur, from_run)
+        t_to = _run_fetched_at(cur, to_run)
+
+        where = "AND company_id = ANY(%s)" if company_ids is not None else ""
+        params: Tuple[Any, ...] = (min(t_from, t_to), max(t_from, t_to))
+        if company_ids is not None:
+            params += (list(company_ids),)
+        cur.execute(f"""
+            SELECT DISTINCT company_id FROM history_versions
+            WHERE valid_from > %s AND valid_from <= %s {where}
+        """, params)
+        candidates = sorted(r[0] for r in cur.fetchall())
+    finally:
+        cur.close()
+
+    before = as_of(conn, t_from, candidates)
+    after = as_of(conn, t_to, candidates)
+
+    touched = []
+    for c in candidates:
+        h_old = before.get(c, {}).get("hash")
+        h_new = after.get(c, {}).get("hash")
+        if h_old == h_new:
+            continue
+        status = "added" if h_old is None else "removed" if h_new is None else "changed"
+        touched.append({"company_id": c, "status": status,
+                        "from_hash": h_old, "to_hash": h_new})
+
+    if fields and touched:
+        blobs = load_blobs(conn, [h for t in touched
+                                  for h in (t["from_hash"], t["to_hash"]) if h])
+        for t in touched:
+            changes = diff_payloads(blobs.get(t["from_hash"]), blobs.get(t["to_hash"]))
+            t["fields"] = changed_fields(changes)
+            t["changes"] = changes
+
+    return {
+        "from": {"run_id": from_run, "fetched_at": t_from},
+        "to": {"run_id": to_run, "fetched_at": t_to},
+        "count": len(touched),
+        "companies": touched,
+    }
+
+
+# =====================================================
+# CLI
+# =====================================================
+#   python history.py record [RUN | --all]   append snapshot run(s)
+#   python history.py runs
+#   python history.py diff FROM_RUN TO_RUN
+
+def _print_runs(conn) -> None:
+    for r in list_history_runs(conn):
+        print(f"{r['run_id']}  {r['fetched_at']:%Y-%m-%d %H:%M}  "
+              f"{r['companies']:>6} companies  {r['changed']:>6} changed  "
+              f"{r['new_bytes'] / 1024:>10,.0f} KiB new")
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    args = sys.argv[1:] or ["runs"]
+
+    if args[0] == "record":
+        from snapshots import SNAPSHOT_DIR, list_runs
+
+        runs = list_runs(SNAPSHOT_DIR) if "--all" in args else [
+            args[1] if len(args) > 1 else "latest"
+        ]
+        for run in runs:
+            record_snapshot(conn, run)
+    elif args[0] == "diff" and len(args) == 3:
+        result = diff_runs(conn, args[1], args[2])
+        for t in result["companies"]:
+            print(f"{t['status']:>8}  {t['company_id']:<12} {', '.join(t['fields'])}")
+        print(f"✅ {result['count']} companies changed between {args[1]} and {args[2]}")
+    else:
+        _print_runs(conn)
+
+    conn.close()
@@ -0,0 +1,581 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import json
+import hashlib
+import time
+import queue
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2
+
+from bulk_loader import (
+    INTEGER_COLUMNS,
+    LOAD_BATCH_SIZE,
+    LOAD_CHANGED_ONLY,
+    TABLE_COLUMNS,
+    LoadStats,
+    RowPayload,
+    canonical_json,
+    company_row,
+    document_rows,
+    load_batch,
+    payload_id,
+    row_payload,
+)
+from db_pool import DB_SSLMODE
+from instrumentation import CompanyProfiler, PipelineMetrics, profile_call
+from json_stream import COMPANY, ROWS, SECTION, VALUE, iter_events
+from pandas_cleaner import clean_analysis, clean_financial_rows, validate_api_data
+from snapshots import SNAPSHOT_DIR, iter_payloads, resolve_run
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+RAW_DIR = "raw_data"
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_WRITERS = int(os.getenv("INGEST_WRITERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "200"))
+
+# raw files are streamed (json_stream) straight into row tuples instead of
+# being decoded into one dict tree per payload
+INGEST_STREAM = os.getenv("INGEST_STREAM", "1") == "1"
+
+# smaller files are decoded with one json.load (faster than the event
+# parser; their dict tree is small) and converted to row tuples the same way
+INGEST_STREAM_MIN_BYTES = int(os.getenv("INGEST_STREAM_MIN_BYTES", str(1024 * 1024)))
+
+_STOP = object()
+
+
+# ================= DB CONNECTION =================
+def get_conn():
+    return psycopg2.connect(
+        os.environ["DATABASE_URL"],
+        sslmode=DB_SSLMODE,
+        connect_timeout=5
+    )
+
+
+# =====================================================
+# PARSE + CLEAN (runs in worker processes)
+# =====================================================
+
+# sections clean_payload always returns (as [] when missing or null)
+CLEANED_SECTIONS = list(INTEGER_COLUMNS) + ["analysis"]
+
+
+def clean_section(table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Cleans the rows of one section. Row by row, so a chunk of a section
+    cleans exactly like the whole list.
+    """
+    if table in INTEGER_COLUMNS:
+        int_cols = INTEGER_COLUMNS[table]
+        fixed = []
+
+        for raw, parsed in zip(rows, clean_financial_rows(rows)):
+            row = dict(raw)
+            for c in int_cols:
+                if c in raw:
+                    v = parsed.get(c)
+                    row[c] = None if v is None else int(round(v))
+            fixed.append(row)
+
+        return fixed
+
+    if table == "analysis":
+        return [
+            raw for raw, parsed in zip(rows, clean_analysis(rows))
+            if parsed["period"] or any(
+                parsed[k] is not None
+                for k in ("sales_growth", "profit_growth", "roe", "stock_cagr")
+            )
+        ]
+
+    return rows
+
+
+def clean_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the pandas_cleaner parsers over one API payload.
+
+    - integer columns of the yearly statements are parsed with
+      clean_financial_rows ("1,234" -> 1234) and rounded for BIGINT / INT
+    - year labels and VARCHAR columns stay as the API sent them, so the
+      company page renders exactly what it did before
+    - analysis rows clean_analysis finds no period or numbers in are
+      dropped (empty rows)
+    """
+    d = dict(payload["data"])
+    for table in CLEANED_SECTIONS:
+        d[table] = clean_section(table, d.get(table) or [])
+
+    return {"company": payload["company"], "data": d}
+
+
+def prepare_payload(data: Any, source: str) -> Dict[str, Any]:
+    """
+    Validated + cleaned payload, or an error; source names it in messages.
+    """
+    if not isinstance(data, dict) or not data.get("company") or not data.get("data"):
+        return {"file": source, "error": "missing 'company' or 'data'"}
+
+    ok, err = validate_api_data(data)
+    if not ok:
+        return {"file": source, "error": err}
+
+    return {
+        "file": source,
+        "company_id": str(data["company"].get("id")),
+        "payload": clean_payload(data),
+    }
+
+
+def parse_file(path: str) -> Dict[str, Any]:
+    """
+    Worker entry point: one raw file -> cleaned payload or an error.
+    Must stay a top-level function (pickled into the process pool).
+    Results carry {"timings": {stage: seconds}} for the run metrics.
+    """
+    try:
+        t0 = time.perf_counter()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        parsed = time.perf_counter()
+
+        result = prepare_payload(data, path)
+        result["timings"] = {"parse": parsed - t0, "clean": time.perf_counter() - parsed}
+        return result
+
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}"}
+
+
+# =====================================================
+# STREAMING PARSE (raw file -> row tuples, no dict tree)
+# =====================================================
+
+def _cleaned_hash(company: Any, lists: Dict[str, bytearray],
+                  values: Dict[str, Any]) -> str:
+    """
+    payload_hash() of the cleaned payload, assembled from the canonical
+    JSON of each element: {"company":..,"data":{sections in key order}}.
+    """
+    h = hashlib.sha256()
+    h.update(b'{"company":' + canonical_json(company) + b',"data":{')
+    for i, name in enumerate(sorted(set(lists) | set(values))):
+        h.update((b"," if i else b"") + canonical_json(name) + b":")
+        if name in lists:
+            h.update(b"[" + lists[name] + b"]")
+        else:
+            h.update(canonical_json(values[name]))
+    h.update(b"}}")
+    return h.hexdigest()
+
+
+def stream_payload(source: Any, name: str) -> Dict[str, Any]:
+    """
+    prepare_payload() for a raw payload that is never decoded as a whole:
+    json_stream events are cleaned chunk by chunk into payload_rows()
+    tuples. Returns the same {"file", "company_id", "payload", "timings"}
+    (payload is a RowPayload with the same hash) or {"file", "error"}.
+    """
+    t0 = time.perf_counter()
+    cleaning = 0.0                       # clean + row building, inside the parse loop
+    company: Any = None
+    lists: Dict[str, bytearray] = {}    # section -> canonical JSON of its cleaned rows
+    values: Dict[str, Any] = {}          # non-list "data" entries
+    rows: Dict[str, List[Tuple]] = {t: [] for t in TABLE_COLUMNS}
+    docs: List[Dict[str, Any]] = []
+
+    for kind, value in iter_events(source):
+        if kind == COMPANY:
+            company = value
+
+        elif kind == SECTION:
+            # a repeated key replaces the earlier one, as in json.load
+            lists[value] = bytearray()
+            values.pop(value, None)
+            if value in rows:
+                rows[value] = []
+            if value == "documents":
+                docs = []
+
+        elif kind == ROWS:
+            section, chunk = value
+            c0 = time.perf_counter()
+            cleaned = clean_section(section, chunk)
+            buf = lists[section]
+            for r in cleaned:
+                if buf:
+                    buf += b","
+                buf += canonical_json(r)
+            if section == "documents":
+                # kept as rows until the company id is known
+                if company is None:
+                    docs.extend(cleaned)
+                else:
+                    rows[section].extend(
+                        tuple(r.get(c) for c in TABLE_COLUMNS[section])
+                        for r in document_rows(company.get("id"), cleaned)
+                    )
+            elif section in rows:
+                cols = TABLE_COLUMNS[section]
+                rows[section].extend(tuple(r.get(c) for c in cols) for r in cleaned)
+            cleaning += time.perf_counter() - c0
+
+        elif kind == VALUE:
+            section, v = value
+            lists.pop(section, None)
+            values[section] = v
+            if section in rows:
+                rows[section] = []
+            if section == "documents":
+                docs = []
+
+    if not company or not (lists or values):
+        return {"file": name, "error": "missing 'company' or 'data'"}
+
+    for section in INTEGER_COLUMNS:   # validate_api_data's required sections
+        if section in values:
+            return {"file": name, "error": f"'{section}' is not a list"}
+        if section not in lists:
+            return {"file": name, "error": f"Missing '{section}' section"}
+
+    # clean_payload turns missing / null cleaned sections into []
+    for section in CLEANED_SECTIONS:
+        if section in values and values.pop(section):
+            raise ValueError(f"'{section}' is not a list")
+        lists.setdefault(section, bytearray())
+
+    for section in TABLE_COLUMNS:
+        if values.get(section):
+            raise ValueError(f"'{section}' is not a list")
+
+    cid = str(company.get("id"))
+    rows["companies"] = [company_row(company)]
+    rows["documents"][:0] = [
+        tuple(r.get(c) for c in TABLE_COLUMNS["documents"])
+        for r in document_rows(company.get("id"), docs)
+    ]
+
+    payload = RowPayload(cid, rows, _cleaned_hash(company, lists, values))
+    took = time.perf_counter() - t0
+    return {
+        "file": name,
+        "company_id": cid,
+        "payload": payload,
+        "timings": {"parse": took - cleaning, "clean": cleaning},
+    }
+
+
+def stream_file(path: str) -> Dict[str, Any]:
+    """
+    parse_file() returning a RowPayload: large files are streamed, small
+    ones decoded in one go; also a process-pool entry point.
+    """
+    try:
+        if os.path.getsize(path) < INGEST_STREAM_MIN_BYTES:
+            result = parse_file(path)
+            if "payload" in result:
+                t0 = time.perf_counter()
+                result["payload"] = row_payload(result["payload"])
+                result["timings"]["rows"] = time.perf_counter() - t0
+            return result
+        return stream_payload(path, path)
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def parse_payload(item: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Worker entry point for already-decoded payloads (snapshots):
+    (source, payload) -> cleaned payload or an error.
+    """
+    source, data = item
+    try:
+        t0 = time.perf_counter()
+        result = prepare_payload(data, source)
+        result["timings"] = {"clean": time.perf_counter() - t0}
+        return result
+    except Exception as e:
+        return {"file": source, "error": f"{type(e).__name__}: {e}"}
+
+
+def profiled_parse(parse: Callable[[Any], Dict[str, Any]], item: Any) -> Dict[str, Any]:
+    """
+    parse(item) under cProfile (--profile); the stats ride back to the
+    parent in the result as {"profile": (seconds, marshalled stats)}.
+    """
+    result, took, stats = profile_call(parse, item)
+    result["profile"] = (took, stats)
+    return result
+
+
+def _parsed(items: Iterable[Any], workers: int,
+            parse: Callable[[Any], Dict[str, Any]] = parse_file) -> Iterator[Dict[str, Any]]:
+    """
+    parse over items (file paths or (source, payload) pairs), results in
+    input order, with at most workers * 4 items in flight.
+    """
+    if workers <= 1:
+        for item in items:
+            yield parse(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        it = iter(items)
+
+        for item in it:
+            window.append(pool.submit(parse, item))
+            if len(window) >= workers * 4:
+                break
+
+        while window:
+            result = window.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                window.append(pool.submit(parse, nxt))
+            yield result
+
+
+# =====================================================
+# DB WRITERS (threads, one connection each)
+# =====================================================
+
+class Writer(threading.Thread):
+    """
+    Drains its own bounded queue in batches of up to batch_size payloads.
+    Companies are routed to a fixed writer, so snapshots of one company
+    are always loaded in file order.
+    """
+
+    def __init__(self, idx: int, connect: Callable, queue_size: int,
+                 batch_size: int, changed_only: bool,
+                 metrics: Optional[PipelineMetrics] = None):
+        super().__init__(name=f"writer-{idx}", daemon=True)
+        self.inbox: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.connect = connect
+        self.batch_size = batch_size
+        self.changed_only = changed_only
+        self.metrics = metrics
+        self.stats = LoadStats()
+
+    def _next_batch(self) -> List[Any]:
+        batch = [self.inbox.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        conn = None
+        fatal: Optional[Exception] = None
+
+        try:
+            conn = self.connect()
+        except Exception as e:
+            fatal = e
+            print(f"❌ {self.name} could not connect: {e}")
+
+        while True:
+            batch = self._next_batch()
+            done = batch[-1] is _STOP
+            payloads = [p for p in batch if p is not _STOP]
+
+            if payloads:
+                if fatal is None:
+                    try:
+                        load_batch(conn, payloads, self.stats,
+                                   changed_only=self.changed_only,
+                                   metrics=self.metrics)
+                    except Exception as e:
+                        # connection-level failure: keep draining so the
+                        # producer never blocks on a dead writer
+                        fatal = e
+                        print(f"❌ {self.name} stopped loading: {e}")
+                if fatal is not None:
+                    self.stats.failed.extend(payload_id(p) for p in payloads)
+
+            if done:
+                break
+
+        if conn is not None:
+            conn.close()
+
+
+def _route(company_id: str, n: int) -> int:
+    return zlib.crc32(company_id.encode("utf-8")) % n
+
+
+# =====================================================
+# PIPELINE
+# =====================================================
+
+def _ingest(
+    items: Iterable[Any],
+    parse: Callable[[Any], Dict[str, Any]],
+    workers: int,
+    writers: int,
+    queue_size: int,
+    batch_size: int,
+    changed_only: bool,
+    connect: Callable,
+    metrics: Optional[PipelineMetrics] = None,
+    profiler: Optional[CompanyProfiler] = None
+) -> LoadStats:
+    writer_threads = [
+        Writer(i, connect, queue_size, batch_size, changed_only, metrics)
+        for i in range(max(1, writers))
+    ]
+    if profiler is not None:
+        parse = partial(profiled_parse, parse)
+    for w in writer_threads:
+        w.start()
+
+    total = 0
+    invalid = 0
+    t0 = time.perf_counter()
+
+    try:
+        for result in _parsed(items, workers, parse):
+            total += 1
+            cid = result.get("company_id") or result["file"]
+            timings = result.pop("timings", {})
+            if metrics is not None:
+                for stage, seconds in timings.items():
+                    metrics.observe(stage, seconds, cid)
+            if profiler is not None:
+                profiler.add(cid, *result.pop("profile"))
+
+            if "error" in result:
+                invalid += 1
+                print("❌ Invalid file:", result["file"], "-", result["error"])
+                continue
+
+            # put() blocks when that writer is behind (backpressure)
+            w = writer_threads[_route(result["company_id"], len(writer_threads))]
+            w.inbox.put(result["payload"])
+
+    finally:
+        for w in writer_threads:
+            w.inbox.put(_STOP)
+        for w in writer_threads:
+            w.join()
+
+    stats = LoadStats()
+    for w in writer_threads:
+        stats.merge(w.stats)
+
+    if metrics is not None:
+        metrics.incr("files", total)
+        metrics.incr("invalid_files", invalid)
+        metrics.add_load(stats)
+
+    took = time.perf_counter() - t0
+    print(f"\n🧵 {total} files, {invalid} invalid, {workers} parse workers, "
+          f"{len(writer_threads)} writers, {took:.2f}s wall "
+          f"({total / took if took else 0:,.0f} files/s)")
+    return stats
+
+
+def ingest_files(
+    paths: Iterable[str],
+    workers: int = INGEST_WORKERS,
+    writers: int = INGEST_WRITERS,
+    queue_size: int = INGEST_QUEUE_SIZE,
+    batch_size: int = LOAD_BATCH_SIZE,
+    changed_only: bool = LOAD_CHANGED_ONLY,
+    connect: Callable = get_conn,
+    stream: bool = INGEST_STREAM,
+    metrics: Optional[PipelineMetrics] = None,
+    profiler: Optional[CompanyProfiler] = None
+) -> LoadStats:
+    """
+    parse + clean in a process pool -> bounded per-writer queues ->
+    `writers` DB threads doing batched upserts. With stream, workers hand
+    back row tuples (stream_file) instead of cleaned payload dicts.
+    metrics gets per-company parse / clean / load timings, per-table
+    insert timings and counts; profiler keeps the cProfile stats of the
+    slowest parses.
+    """
+    parse = stream_file if stream else parse_file
+    return _ingest(list(paths), parse, workers, writers, queue_size,
+                   batch_size, changed_only, connect, metrics, profiler)
+
+
+def _timed(items: Iterable[Any], metrics: Optional[PipelineMetrics],
+           stage: str) -> Iterator[Any]:
+    # time spent producing each item (e.g. decoding a snapshot part)
+    if metrics is None:
+        yield from items
+        return
+    it = iter(items)
+    while True:
+        t0 = time.perf_counter()
+        item = next(it, _STOP)
+        if item is _STOP:
+            return
+        metrics.observe(stage, time.perf_counter() - t0)
+        yield item
+
+
+def ingest_payloads(
+    payloads: Iterable[Dict[str, Any]],
+    workers: int = INGEST_WORKERS,
+    writers: int = INGEST_WRITERS,
+    queue_size: int = INGEST_QUEUE_SIZE,
+    batch_size: int = LOAD_BATCH_SIZE,
+    changed_only: bool = LOAD_CHANGED_ONLY,
+    connect: Callable = get_conn,
+    source: str = "payload",
+    metrics: Optional[PipelineMetrics] = None,
+    profiler: Optional[CompanyProfiler] = None
+) -> LoadStats:
+    """
+    ingest_files() for payloads that are already decoded (e.g. from a
+    snapshot run); payloads are streamed, not collected first. Reading
+    them is timed as the stage "read".
+    """
+    items = ((f"{source}#{i}", p) for i, p in enumerate(_timed(payloads, metrics, "read")))
+    return _ingest(items, parse_payload, workers, writers, queue_size,
+                   batch_size, changed_only, connect, metrics, profiler)
+
+
+def ingest_snapshot(run_id: str = "latest", root: str = SNAPSHOT_DIR,
+                    **kwargs: Any) -> LoadStats:
+    run = resolve_run(root, run_id)
+    if run is None:
+        raise FileNotFoundError(f"no snapshot run '{run_id}' in {root}")
+    print("Snapshot run:", run)
+    return ingest_payloads(iter_payloads(run, root), source=run, **kwargs)
+
+
+def ingest_dir(raw_dir: str = RAW_DIR, **kwargs: Any) -> LoadStats:
+    files = sorted(
+        os.path.join(raw_dir, f) for f in os.listdir(raw_dir) if f.endswith(".json")
+    )
+    print("Total raw files:", len(files))
+    return ingest_files(files, **kwargs)
+
+
+if __name__ == "__main__":
+    stats = ingest_dir(
+        sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith("--") else RAW_DIR,
+        changed_only=LOAD_CHANGED_ONLY or "--changed-only" in sys.argv
+    )
+    print(stats.summary())
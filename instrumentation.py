@@ -0,0 +1,413 @@
+import bisect
+import cProfile
+import heapq
+import io
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# run summary (JSON), rewritten at the end of every pipeline / saver run
+PIPELINE_METRICS_PATH = os.getenv("PIPELINE_METRICS_PATH", os.path.join("logs", "pipeline_metrics.json"))
+
+# Prometheus textfile (node_exporter --collector.textfile.directory); off when empty
+PIPELINE_METRICS_TEXTFILE = os.getenv("PIPELINE_METRICS_TEXTFILE", "")
+
+# --profile: cProfile stats kept for this many of the slowest companies
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("logs", "profiles"))
+
+# seconds; Prometheus-style upper bounds, +Inf implied
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# slowest companies listed (with their stage breakdown) in the summary
+SLOWEST_COMPANIES = 10
+
+
+# =====================================================
+# HISTOGRAM
+# =====================================================
+
+class Histogram:
+    """
+    Bucketed durations (seconds). Not locked; PipelineMetrics holds its
+    lock around observe / merge.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate from the buckets (linear within one), clamped to the
+        observed min / max.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.max
+                est = lo + (hi - lo) * (rank - seen) / n
+                return min(max(est, self.min), self.max)
+            seen += n
+        return self.max
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        # (le, count) pairs as Prometheus exposes them
+        out, total = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            out.append(("+Inf" if bound == float("inf") else f"{bound:g}", total))
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "mean_s": round(self.sum / self.count, 6) if self.count else 0.0,
+            "min_s": round(self.min, 6) if self.count else 0.0,
+            "p50_s": round(self.quantile(0.5), 6),
+            "p95_s": round(self.quantile(0.95), 6),
+            "max_s": round(self.max, 6),
+            "buckets": dict(self.cumulative()),
+        }
+
+
+# =====================================================
+# PIPELINE METRICS
+# =====================================================
+
+class PipelineMetrics:
+    """
+    Timings and counters for one fetch / ingest run, shared by the fetch
+    threads, parse results and DB writers (every update takes the lock).
+
+      stages     one Histogram per stage ("fetch", "parse", "clean",
+                 "load", "insert.<table>", ...)
+      companies  seconds per company per stage; their totals make the
+                 per-company histogram and the slowest-companies list
+      counters   retries, failures, invalid files, ...
+      rows       rows written and insert seconds per table (rows/s)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.stages: Dict[str, Histogram] = {}
+        self.companies: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.rows: Dict[str, int] = {}
+        self.row_seconds: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float, company: Optional[str] = None) -> None:
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+            if company is not None:
+                per = self.companies.setdefault(company, {})
+                per[stage] = per.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage: str, company: Optional[str] = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, company)
+
+    def timed(self, stage: str) -> Callable:
+        """
+        Decorator: every call of the function is one observation of stage.
+        """
+        def decorate(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def incr(self, counter: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def charge(self, stage: str, seconds: float, companies: Sequence[str]) -> None:
+        """
+        Splits the time of one batched step (e.g. a bulk load) evenly over
+        its companies; stage histograms only see observe().
+        """
+        if not companies:
+            return
+        share = seconds / len(companies)
+        with self._lock:
+            for cid in companies:
+                per = self.companies.setdefault(cid, {})
+                per[stage] = per.get(stage, 0.0) + share
+
+    def add_load(self, stats: Any) -> None:
+        """
+        Rows / insert seconds per table and outcome counts from a
+        bulk_loader.LoadStats (committed work only).
+        """
+        with self._lock:
+            for table, n in stats.rows.items():
+                if n:
+                    self.rows[table] = self.rows.get(table, 0) + n
+                    self.row_seconds[table] = self.row_seconds.get(table, 0.0) + stats.seconds[table]
+            for name, n in (("companies_loaded", stats.companies),
+                            ("companies_skipped", stats.skipped),
+                            ("companies_failed", len(stats.failed))):
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    # ---------- report ----------
+    def company_histogram(self) -> Histogram:
+        hist = Histogram()
+        with self._lock:
+            for per in self.companies.values():
+                hist.observe(sum(per.values()))
+        return hist
+
+    def slowest(self, n: int = SLOWEST_COMPANIES) -> List[Tuple[str, float]]:
+        with self._lock:
+            totals = [(cid, sum(per.values())) for cid, per in self.companies.items()]
+        return heapq.nlargest(n, totals, key=lambda t: t[1])
+
+    def summary(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._t0
+        per_company = self.company_histogram()
+        slowest = self.slowest()
+
+        with self._lock:
+            total_rows = sum(self.rows.values())
+            insert_seconds = sum(self.row_seconds.values())
+            stages = {s: h.to_dict() for s, h in sorted(self.stages.items())}
+            counters = dict(sorted(self.counters.items()))
+            tables = {
+                t: {
+                    "rows": n,
+                    "seconds": round(self.row_seconds[t], 6),
+                    "rows_per_s": round(n / self.row_seconds[t], 1) if self.row_seconds[t] else 0.0,
+                }
+                for t, n in self.rows.items()
+            }
+            breakdown = {cid: dict(self.companies[cid]) for cid, _ in slowest}
+            companies = len(self.companies)
+
+        return {
+            "run": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "wall_s": round(wall, 3),
+            "companies": companies,
+            "rows": total_rows,
+            "rows_per_s": round(total_rows / insert_seconds, 1) if insert_seconds else 0.0,
+            "counters": counters,
+            "stages": stages,
+            "per_company": per_company.to_dict(),
+            "slowest_companies": [
+                {"company_id": cid, "seconds": round(total, 6),
+                 "stages": {s: round(v, 6) for s, v in breakdown[cid].items()}}
+                for cid, total in slowest
+            ],
+            "tables": tables,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [f"⏱️ {s['run']}: {s['companies']} companies in {s['wall_s']:.2f}s, "
+                 f"{s['rows']} rows ({s['rows_per_s']:,.0f} rows/s)"]
+        for stage, h in s["stages"].items():
+            lines.append(f"   {stage:<22} {h['count']:>7}x  p50 {h['p50_s'] * 1000:>8.1f}ms  "
+                         f"p95 {h['p95_s'] * 1000:>8.1f}ms  total {h['sum_s']:>8.2f}s")
+        if s["counters"]:
+            lines.append("   " + ", ".join(f"{k}={v:g}" for k, v in s["counters"].items()))
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """
+        Summary in the Prometheus text exposition format.
+        """
+        s = self.summary()
+        p = "stockpipe"
+        run = f'run="{self.name}"'
+        out = [
+            f"# TYPE {p}_run_wall_seconds gauge",
+            f"{p}_run_wall_seconds{{{run}}} {s['wall_s']}",
+            f"# TYPE {p}_run_last_timestamp_seconds gauge",
+            f"{p}_run_last_timestamp_seconds{{{run}}} {self.started_at:.0f}",
+            f"# TYPE {p}_companies gauge",
+            f"{p}_companies{{{run}}} {s['companies']}",
+        ]
+
+        out.append(f"# TYPE {p}_stage_seconds histogram")
+        with self._lock:
+            stages = sorted(self.stages.items())
+        for stage, h in stages + [("company_total", self.company_histogram())]:
+            labels = f'{run},stage="{stage}"'
+            for le, n in h.cumulative():
+                out.append(f'{p}_stage_seconds_bucket{{{labels},le="{le}"}} {n}')
+            out.append(f"{p}_stage_seconds_sum{{{labels}}} {h.sum:.6f}")
+            out.append(f"{p}_stage_seconds_count{{{labels}}} {h.count}")
+
+        out.append(f"# TYPE {p}_events_total counter")
+        for name, v in s["counters"].items():
+            out.append(f'{p}_events_total{{{run},event="{name}"}} {v:g}')
+
+        out.append(f"# TYPE {p}_rows_written_total counter")
+        for table, t in s["tables"].items():
+            out.append(f'{p}_rows_written_total{{{run},table="{table}"}} {t["rows"]}')
+        out.append(f"# TYPE {p}_rows_per_second gauge")
+        for table, t in s["tables"].items():
+            out.append(f'{p}_rows_per_second{{{run},table="{table}"}} {t["rows_per_s"]}')
+        return "\n".join(out) + "\n"
+
+    def write(self, path: str = PIPELINE_METRICS_PATH,
+              textfile: str = PIPELINE_METRICS_TEXTFILE) -> None:
+        """
+        Prints the report, writes the JSON summary and, if configured, the
+        Prometheus textfile (renamed into place so the collector never
+        reads half a file).
+        """
+        print("\n" + self.report())
+        if path:
+            _write_atomic(path, json.dumps(self.summary(), indent=2))
+            print(f"📊 metrics summary → {path}")
+        if textfile:
+            _write_atomic(textfile, self.prometheus())
+            print(f"📊 prometheus textfile → {textfile}")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def timer(metrics: Optional[PipelineMetrics], stage: str, company: Optional[str] = None):
+    """
+    metrics.timer(), or a no-op when the caller runs uninstrumented.
+    """
+    return nullcontext() if metrics is None else metrics.timer(stage, company)
+
+
+# =====================================================
+# PROFILING (--profile)
+# =====================================================
+
+# one active profiler per process: Python 3.12+ refuses to enable a
+# second one ("Another profiling tool is already active")
+_PROFILE_LOCK = threading.Lock()
+
+
+def profile_call(fn: Callable, *args: Any) -> Tuple[Any, float, bytes]:
+    """
+    (result, seconds, marshalled cProfile stats) of fn(*args). The stats
+    are the bytes of a .prof file, so worker processes can send them back.
+    cProfile only sees the calling thread. Profiled calls in one process
+    run one at a time (threads queue on a lock; the wait isn't timed).
+    """
+    prof = cProfile.Profile()
+    with _PROFILE_LOCK:
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            result = fn(*args)
+        finally:
+            prof.disable()
+        took = time.perf_counter() - t0
+    prof.create_stats()
+    return result, took, marshal.dumps(prof.stats)
+
+
+class CompanyProfiler:
+    """
+    Keeps the cProfile stats of the `top` slowest companies seen; dump()
+    writes them as <dir>/<company>.prof (snakeviz / pstats) and prints the
+    hottest functions of each.
+
+    call() goes through profile_call(), so with --profile the FetchEngine
+    worker threads fetch one company at a time (throughput numbers from a
+    profiled run aren't representative).
+    """
+
+    def __init__(self, top: int = PROFILE_TOP):
+        self.top = max(1, top)
+        self._heap: List[Tuple[float, str, bytes]] = []
+        self._lock = threading.Lock()
+
+    def add(self, company: str, seconds: float, stats: bytes) -> None:
+        with self._lock:
+            item = (seconds, company, stats)
+            if len(self._heap) < self.top:
+                heapq.heappush(self._heap, item)
+            elif seconds > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def call(self, company: str, fn: Callable, *args: Any) -> Any:
+        result, took, stats = profile_call(fn, *args)
+        self.add(company, took, stats)
+        return result
+
+    def dump(self, directory: str = PROFILE_DIR, lines: int = 8) -> List[str]:
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            slowest = sorted(self._heap, reverse=True)
+
+        paths = []
+        for seconds, company, stats in slowest:
+            path = os.path.join(directory, f"{company}.prof")
+            with open(path, "wb") as f:
+                f.write(stats)
+            paths.append(path)
+
+            out = io.StringIO()
+            pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(lines)
+            text = out.getvalue().splitlines()
+            start = next((i for i, l in enumerate(text) if "ncalls" in l), 0)
+            hot = [l for l in text[start:] if l.strip()]
+            print(f"\n🔬 {company}: {seconds * 1000:.1f}ms → {path}")
+            print("\n".join(hot))
+        return paths
@@ -0,0 +1,155 @@
+import io
+import json
+import os
+from typing import Any, BinaryIO, Iterator, List, Tuple, Union
+
+try:
+    import ijson
+except ImportError:  # optional: whole-document json.load fallback
+    ijson = None
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# section rows handed to the cleaner at a time
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "256"))
+
+# bytes read from the source per parser refill
+STREAM_BUFFER_BYTES = int(os.getenv("STREAM_BUFFER_BYTES", str(64 * 1024)))
+
+# events yielded by iter_events()
+COMPANY = "company"   # value: the company dict
+SECTION = "section"   # value: name of a list section in "data" (rows follow)
+ROWS = "rows"         # value: (section, up to chunk_rows elements)
+VALUE = "value"       # value: (name, value) for a "data" entry that isn't a list
+
+Source = Union[str, bytes, bytearray, BinaryIO]
+
+
+# =====================================================
+# EVENTS
+# =====================================================
+# An API payload {"company": {...}, "data": {"profitandloss": [...], ...}}
+# is walked with ijson's C backend: only the company dict and one chunk
+# of section rows exist as Python objects at a time, never the document.
+# Top-level keys other than company / data are skipped.
+
+def _open(source: Source) -> Tuple[BinaryIO, bool]:
+    # (binary file object, whether we opened it)
+    if isinstance(source, str):
+        return open(source, "rb", buffering=STREAM_BUFFER_BYTES), True
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), True
+    return source, False
+
+
+def _build(events: Iterator[Tuple[str, Any]], event: str, value: Any) -> Any:
+    """
+    The value starting with (event, value), consuming its events.
+    """
+    if event not in ("start_map", "start_array"):
+        return value
+
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for event, value in events:
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def _data_events(events: Iterator[Tuple[str, Any]], chunk_rows: int
+                 ) -> Iterator[Tuple[str, Any]]:
+    for event, name in events:
+        if event == "end_map":
+            return
+
+        event, value = next(events)
+        if event != "start_array":
+            yield VALUE, (name, _build(events, event, value))
+            continue
+
+        yield SECTION, name
+        chunk: List[Any] = []
+        for event, value in events:
+            if event == "end_array":
+                break
+            chunk.append(_build(events, event, value))
+            if len(chunk) >= chunk_rows:
+                yield ROWS, (name, chunk)
+                chunk = []
+        if chunk:
+            yield ROWS, (name, chunk)
+
+
+def _document_events(doc: Any, chunk_rows: int) -> Iterator[Tuple[str, Any]]:
+    # same events from an already decoded payload (no ijson)
+    if not isinstance(doc, dict):
+        raise ValueError("payload is not a JSON object")
+    if "company" in doc:
+        yield COMPANY, doc["company"]
+
+    data = doc.get("data")
+    if data is None:
+        return
+    if not isinstance(data, dict):
+        raise ValueError("'data' is not an object")
+
+    for name, value in data.items():
+        if not isinstance(value, list):
+            yield VALUE, (name, value)
+            continue
+        yield SECTION, name
+        for i in range(0, len(value), chunk_rows):
+            yield ROWS, (name, value[i:i + chunk_rows])
+
+
+def iter_events(source: Source, chunk_rows: int = STREAM_CHUNK_ROWS
+                ) -> Iterator[Tuple[str, Any]]:
+    """
+    (kind, value) events for one payload from a path, bytes or binary
+    file object, in document order:
+      (COMPANY, dict) (SECTION, name) (ROWS, (name, [row, ...])) ...
+      (VALUE, (name, value))
+    Raises ValueError on malformed JSON or a non-object payload.
+    """
+    fp, owned = _open(source)
+    try:
+        if ijson is None:
+            yield from _document_events(json.load(fp), chunk_rows)
+            return
+
+        events = ijson.basic_parse(fp, use_float=True, buf_size=STREAM_BUFFER_BYTES)
+        try:
+            first, _ = next(events)
+            if first != "start_map":
+                raise ValueError("payload is not a JSON object")
+
+            for event, key in events:
+                if event == "end_map":
+                    break
+                event, value = next(events)
+
+                if key == "company":
+                    yield COMPANY, _build(events, event, value)
+                elif key == "data":
+                    if event != "start_map":
+                        raise ValueError("'data' is not an object")
+                    yield from _data_events(events, chunk_rows)
+                else:
+                    _build(events, event, value)
+
+        except (ijson.JSONError, StopIteration) as e:
+            reason = str(e).strip().splitlines()[0] if str(e).strip() else "unexpected end of input"
+            raise ValueError(f"invalid JSON: {reason}") from None
+    finally:
+        if owned:
+            fp.close()
@@ -0,0 +1,200 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import csv
+import io
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+
+from db_pool import DB_SSLMODE
+from panel import Panel, build_panel, fetch_panel_rows
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+CAGR_WINDOWS = (3, 5, 10)
+
+# columns of the metrics table (migration 8), all DOUBLE PRECISION except
+# free_cash_flow (BIGINT, same unit as the statements)
+METRIC_COLUMNS = (
+    ["sales_growth", "profit_growth"]
+    + [f"sales_cagr_{n}y" for n in CAGR_WINDOWS]
+    + [f"profit_cagr_{n}y" for n in CAGR_WINDOWS]
+    + [
+        "opm", "npm", "roe", "roce", "debt_equity", "interest_coverage",
+        "asset_turnover", "free_cash_flow", "cfo_to_profit",
+    ]
+)
+
+INTEGER_METRICS = {"free_cash_flow"}
+
+COPY_NULL = "\\N"
+
+
+# =====================================================
+# YEARLY METRICS (vectorized over the whole panel)
+# =====================================================
+# Every array is company x year, same axes as the panel. A window that
+# reaches before the first year, or divides by zero / a missing value,
+# gives NaN. Percentages are in percent.
+
+def safe_div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a / b
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def _pct(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return safe_div(a, b) * 100
+
+
+def _shift(a: np.ndarray, years: int) -> np.ndarray:
+    # value `years` columns earlier (the axis is contiguous fiscal years)
+    out = np.full(a.shape, np.nan)
+    if years < a.shape[1]:
+        out[:, years:] = a[:, :-years]
+    return out
+
+
+def _cagr(a: np.ndarray, years: int) -> np.ndarray:
+    start = _shift(a, years)
+    ok = (a > 0) & (start > 0)
+    out = np.full(a.shape, np.nan)
+    out[ok] = ((a[ok] / start[ok]) ** (1.0 / years) - 1) * 100
+    return out
+
+
+def _growth(a: np.ndarray) -> np.ndarray:
+    prev = _shift(a, 1)
+    return _pct(a - prev, np.abs(prev))
+
+
+def _sum(*arrays: np.ndarray) -> np.ndarray:
+    # NaN only when every part is missing
+    out = np.sum([np.nan_to_num(a) for a in arrays], axis=0)
+    out[np.all([np.isnan(a) for a in arrays], axis=0)] = np.nan
+    return out
+
+
+def yearly_metrics(panel: Panel) -> Dict[str, np.ndarray]:
+    v = panel.values
+
+    sales = v["sales"]
+    net_profit = v["net_profit"]
+    interest = v["interest"]
+    equity = _sum(v["equity_capital"], v["reserves"])
+    ebit = v["profit_before_tax"] + interest
+    cfo = v["operating_activity"]
+
+    # computed margin, the reported (rounded) one where it can't be
+    opm = _pct(v["operating_profit"], sales)
+    opm = np.where(np.isnan(opm), v["opm_percentage"], opm)
+
+    out = {
+        "sales_growth": _growth(sales),
+        "profit_growth": _growth(net_profit),
+        "opm": opm,
+        "npm": _pct(net_profit, sales),
+        "roe": _pct(net_profit, equity),
+        "roce": _pct(ebit, equity + np.nan_to_num(v["borrowings"])),
+        "debt_equity": safe_div(v["borrowings"], equity),
+        "interest_coverage": safe_div(ebit, interest),
+        "asset_turnover": safe_div(sales, v["total_assets"]),
+        # no capex line in the cashflow statement: CFO + CFI is the proxy
+        "free_cash_flow": cfo + v["investing_activity"],
+        "cfo_to_profit": safe_div(cfo, net_profit),
+    }
+    for n in CAGR_WINDOWS:
+        out[f"sales_cagr_{n}y"] = _cagr(sales, n)
+        out[f"profit_cagr_{n}y"] = _cagr(net_profit, n)
+
+    return out
+
+
+def metric_rows(panel: Panel, metrics: Optional[Dict[str, np.ndarray]] = None
+                ) -> List[Tuple[Any, ...]]:
+    """
+    (company_id, year, *METRIC_COLUMNS) for every company-year with any
+    statement data; NaN -> NULL.
+    """
+    metrics = metrics or yearly_metrics(panel)
+    v = panel.values
+
+    present = ~(np.isnan(v["sales"]) & np.isnan(v["total_assets"])
+                & np.isnan(v["operating_activity"]))
+    ci, yi = np.nonzero(present)
+
+    columns = []
+    for col in METRIC_COLUMNS:
+        vals = metrics[col][ci, yi]
+        if col not in INTEGER_METRICS:
+            vals = vals.round(6)
+        cast = int if col in INTEGER_METRICS else float
+        columns.append([None if x != x else cast(x) for x in vals.tolist()])
+
+    ids = [panel.ids[i] for i in ci.tolist()]
+    years = panel.years[yi].tolist()
+    return list(zip(ids, years, *columns))
+
+
+# =====================================================
+# REFRESH (called by bulk_loader for the companies it touched)
+# =====================================================
+
+def refresh_metrics(cur, company_ids: Optional[List[str]] = None) -> int:
+    """
+    Recomputes the metrics rows of company_ids (all companies when None)
+    from the statements as they are in the caller's transaction.
+    Returns rows written.
+    """
+    if company_ids is not None and not company_ids:
+        return 0
+
+    # tuple rows whatever cursor factory the connection uses
+    pcur = cur.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        panel = build_panel(*fetch_panel_rows(pcur, company_ids))
+        rows = metric_rows(panel)
+
+        if company_ids is None:
+            pcur.execute("DELETE FROM metrics")
+        else:
+            pcur.execute("DELETE FROM metrics WHERE company_id = ANY(%s)",
+                         (list(company_ids),))
+
+        if rows:
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            for r in rows:
+                writer.writerow([COPY_NULL if v is None else v for v in r])
+            buf.seek(0)
+            pcur.copy_expert(
+                f"COPY metrics (company_id, year, {', '.join(METRIC_COLUMNS)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buf
+            )
+    finally:
+        pcur.close()
+
+    return len(rows)
+
+
+# =====================================================
+# CLI (full rebuild, e.g. right after migration 8)
+# =====================================================
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+    cur = conn.cursor()
+    n = refresh_metrics(cur)
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f"✅ metrics rebuilt ({n} company-years)")
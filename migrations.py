@@ -0,0 +1,450 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from db_pool import DB_SSLMODE
+
+
+# =====================================================
+# MIGRATIONS
+# =====================================================
+# Append-only list of (version, name, sql). Never edit a shipped entry;
+# add a new version instead. Every statement must be safe to re-run
+# (IF NOT EXISTS / guarded DO blocks) so a half-applied migration can be
+# retried after a crash.
+
+CHILD_TABLES = [
+    "analysis",
+    "prosandcons",
+    "balancesheet",
+    "profitandloss",
+    "cashflow",
+    "documents",
+]
+
+YEARLY_TABLES = ["balancesheet", "profitandloss", "cashflow"]
+
+
+def _dedupe_yearly_sql(table: str) -> str:
+    # keep the most recently inserted row per (company_id, year)
+    return f"""
+        DELETE FROM {table} a
+        USING {table} b
+        WHERE a.company_id = b.company_id
+          AND a.year = b.year
+          AND a.id < b.id;
+    """
+
+
+def _foreign_key_sql(table: str) -> str:
+    # NOT VALID so existing orphans don't block the deploy; new rows are
+    # checked immediately and validate_foreign_keys() upgrades it later
+    name = f"{table}_company_id_fkey"
+    return f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = '{name}'
+                  AND conrelid = '{table}'::regclass
+            ) THEN
+                ALTER TABLE {table}
+                    ADD CONSTRAINT {name}
+                    FOREIGN KEY (company_id)
+                    REFERENCES companies (company_id)
+                    ON DELETE CASCADE
+                    NOT VALID;
+            END IF;
+        END $$;
+    """
+
+
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (
+        1,
+        "unique (company_id, year) on yearly statements",
+        "\n".join(
+            _dedupe_yearly_sql(t)
+            + f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS {t}_company_year_key
+                ON {t} (company_id, year);
+            """
+            for t in YEARLY_TABLES
+        ),
+    ),
+    (
+        2,
+        "company_id indexes on remaining child tables",
+        """
+        CREATE INDEX IF NOT EXISTS analysis_company_idx
+            ON analysis (company_id, id);
+        CREATE INDEX IF NOT EXISTS prosandcons_company_idx
+            ON prosandcons (company_id, id);
+        CREATE INDEX IF NOT EXISTS documents_company_year_idx
+            ON documents (company_id, year DESC);
+        """,
+    ),
+    (
+        3,
+        "foreign keys to companies",
+        "\n".join(_foreign_key_sql(t) for t in CHILD_TABLES),
+    ),
+    (
+        4,
+        "pg_trgm indexes for company search (skipped if unavailable)",
+        """
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE NOTICE 'pg_trgm unavailable (%), search uses memory index', SQLERRM;
+        END $$;
+
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                CREATE INDEX IF NOT EXISTS companies_id_trgm_idx
+                    ON companies USING gin (lower(company_id) gin_trgm_ops);
+                CREATE INDEX IF NOT EXISTS companies_name_trgm_idx
+                    ON companies USING gin (lower(company_name) gin_trgm_ops);
+            END IF;
+        END $$;
+        """,
+    ),
+    (
+        5,
+        "natural keys for documents, dedupe keyless tables, ingest_state",
+        """
+        DELETE FROM documents a
+        USING documents b
+        WHERE a.company_id = b.company_id
+          AND a.year = b.year
+          AND a.annual_report = b.annual_report
+          AND a.id < b.id;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS documents_company_year_report_key
+            ON documents (company_id, year, annual_report);
+
+        DELETE FROM analysis a
+        USING analysis b
+        WHERE a.company_id = b.company_id
+          AND a.compounded_sales_growth IS NOT DISTINCT FROM b.compounded_sales_growth
+          AND a.compounded_profit_growth IS NOT DISTINCT FROM b.compounded_profit_growth
+          AND a.stock_price_cagr IS NOT DISTINCT FROM b.stock_price_cagr
+          AND a.roe IS NOT DISTINCT FROM b.roe
+          AND a.id < b.id;
+
+        DELETE FROM prosandcons a
+        USING prosandcons b
+        WHERE a.company_id = b.company_id
+          AND a.pros IS NOT DISTINCT FROM b.pros
+          AND a.cons IS NOT DISTINCT FROM b.cons
+          AND a.id < b.id;
+
+        CREATE TABLE IF NOT EXISTS ingest_state (
+            company_id VARCHAR(20) PRIMARY KEY
+                REFERENCES companies (company_id) ON DELETE CASCADE,
+            content_hash CHAR(64) NOT NULL,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """,
+    ),
+    (
+        6,
+        "content_versions for page cache invalidation",
+        """
+        CREATE SEQUENCE IF NOT EXISTS content_version_seq;
+
+        CREATE TABLE IF NOT EXISTS content_versions (
+            company_id VARCHAR(20) PRIMARY KEY,
+            version BIGINT NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        CREATE INDEX IF NOT EXISTS content_versions_changed_idx
+            ON content_versions (changed_at);
+        """,
+    ),
+    (
+        7,
+        "company_summary for the home and list pages",
+        """
+        CREATE TABLE IF NOT EXISTS company_summary (
+            company_id VARCHAR(20) PRIMARY KEY
+                REFERENCES companies (company_id) ON DELETE CASCADE,
+            company_name VARCHAR(255),
+            company_logo VARCHAR(255),
+            sort_key VARCHAR(255) NOT NULL,
+            has_data BOOLEAN NOT NULL,
+            refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        INSERT INTO company_summary
+            (company_id, company_name, company_logo, sort_key, has_data)
+        SELECT
+            c.company_id,
+            c.company_name,
+            c.company_logo,
+            COALESCE(c.company_name, c.company_id),
+            EXISTS (SELECT 1 FROM analysis a WHERE a.company_id = c.company_id)
+            AND EXISTS (
+                SELECT 1 FROM prosandcons p
+                WHERE p.company_id = c.company_id
+                  AND (p.pros IS NOT NULL OR p.cons IS NOT NULL)
+            )
+        FROM companies c
+        ON CONFLICT (company_id) DO NOTHING;
+
+        CREATE INDEX IF NOT EXISTS company_summary_sort_idx
+            ON company_summary (sort_key, company_id)
+            INCLUDE (company_name, company_logo);
+
+        CREATE INDEX IF NOT EXISTS company_summary_examples_idx
+            ON company_summary (sort_key, company_id)
+            INCLUDE (company_name)
+            WHERE has_data;
+        """,
+    ),
+    (
+        8,
+        "metrics: typed per company-year ratios (filled by metrics.py)",
+        """
+        CREATE TABLE IF NOT EXISTS metrics (
+            company_id VARCHAR(20) NOT NULL
+                REFERENCES companies (company_id) ON DELETE CASCADE,
+            year INT NOT NULL,
+            sales_growth DOUBLE PRECISION,
+            profit_growth DOUBLE PRECISION,
+            sales_cagr_3y DOUBLE PRECISION,
+            sales_cagr_5y DOUBLE PRECISION,
+            sales_cagr_10y DOUBLE PRECISION,
+            profit_cagr_3y DOUBLE PRECISION,
+            profit_cagr_5y DOUBLE PRECISION,
+            profit_cagr_10y DOUBLE PRECISION,
+            opm DOUBLE PRECISION,
+            npm DOUBLE PRECISION,
+            roe DOUBLE PRECISION,
+            roce DOUBLE PRECISION,
+            debt_equity DOUBLE PRECISION,
+            interest_coverage DOUBLE PRECISION,
+            asset_turnover DOUBLE PRECISION,
+            free_cash_flow BIGINT,
+            cfo_to_profit DOUBLE PRECISION,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (company_id, year)
+        );
+        """,
+    ),
+    (
+        9,
+        "history: content-addressed store of fetch runs (filled by history.py)",
+        """
+        CREATE TABLE IF NOT EXISTS history_runs (
+            run_id TEXT PRIMARY KEY,
+            fetched_at TIMESTAMPTZ NOT NULL,
+            companies INT NOT NULL DEFAULT 0,
+            changed INT NOT NULL DEFAULT 0,
+            new_blobs INT NOT NULL DEFAULT 0,
+            new_bytes BIGINT NOT NULL DEFAULT 0,
+            recorded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        CREATE INDEX IF NOT EXISTS history_runs_fetched_idx
+            ON history_runs (fetched_at);
+
+        -- one row per distinct payload: zlib(canonical JSON), keyed by sha256
+        CREATE TABLE IF NOT EXISTS history_blobs (
+            hash CHAR(64) PRIMARY KEY,
+            size INT NOT NULL,
+            payload BYTEA NOT NULL
+        );
+
+        -- already compressed: store out of line without TOAST compression
+        ALTER TABLE history_blobs ALTER COLUMN payload SET STORAGE EXTERNAL;
+
+        -- a row only when a company's payload differs from its previous one;
+        -- no FK to companies so history outlives deletes and resets
+        CREATE TABLE IF NOT EXISTS history_versions (
+            company_id VARCHAR(20) NOT NULL,
+            valid_from TIMESTAMPTZ NOT NULL,
+            run_id TEXT NOT NULL REFERENCES history_runs (run_id),
+            hash CHAR(64) NOT NULL REFERENCES history_blobs (hash),
+            PRIMARY KEY (company_id, valid_from)
+        );
+
+        CREATE INDEX IF NOT EXISTS history_versions_valid_from_idx
+            ON history_versions (valid_from);
+        """,
+    ),
+    (
+        10,
+        "pipeline_runs / pipeline_jobs: leased per-company work queue (work_queue.py)",
+        """
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            run_id TEXT PRIMARY KEY,
+            companies INT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at TIMESTAMPTZ
+        );
+
+        -- pending -> fetched -> loaded; errors go back to pending with a
+        -- later next_attempt_at until max attempts, then failed
+        CREATE TABLE IF NOT EXISTS pipeline_jobs (
+            run_id TEXT NOT NULL REFERENCES pipeline_runs (run_id) ON DELETE CASCADE,
+            company_id VARCHAR(20) NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending'
+                CHECK (state IN ('pending', 'fetched', 'loaded', 'failed')),
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            lease_owner TEXT,
+            lease_expires TIMESTAMPTZ,
+            last_error TEXT,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (run_id, company_id)
+        );
+
+        -- claim scan: open jobs of a run by due time
+        CREATE INDEX IF NOT EXISTS pipeline_jobs_claim_idx
+            ON pipeline_jobs (run_id, next_attempt_at)
+            WHERE state IN ('pending', 'fetched');
+        """,
+    ),
+]
+
+
+# =====================================================
+# RUNNER
+# =====================================================
+
+# arbitrary constant: serialises concurrent deploys running migrate()
+MIGRATION_LOCK_ID = 7_385_001
+
+
+def _plain_cursor(conn):
+    # tuple rows even on RealDictCursor connections handed out by db_pool
+    return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+
+def ensure_migrations_table(cur) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def applied_versions(cur) -> List[int]:
+    ensure_migrations_table(cur)
+    cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+    return [r[0] for r in cur.fetchall()]
+
+
+def migrate(conn, target: Optional[int] = None) -> List[int]:
+    """
+    Applies pending migrations in order, one transaction each.
+    Returns the versions applied by this call.
+    """
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    cur = _plain_cursor(conn)
+    applied: List[int] = []
+
+    try:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        done = set(applied_versions(cur))
+        conn.commit()
+
+        for version, name, sql in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+
+            print(f"⬆️  migration {version}: {name}")
+            try:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            applied.append(version)
+
+        validate_foreign_keys(conn)
+
+    finally:
+        try:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+        cur.close()
+        conn.autocommit = autocommit
+
+    return applied
+
+
+def validate_foreign_keys(conn) -> None:
+    """
+    Tries to VALIDATE every NOT VALID company_id foreign key.
+    Orphan rows leave the constraint NOT VALID (still enforced for new
+    rows) and are reported instead of failing the deploy.
+    """
+    cur = _plain_cursor(conn)
+    cur.execute("""
+        SELECT conrelid::regclass::text, conname
+        FROM pg_constraint
+        WHERE contype = 'f'
+          AND NOT convalidated
+          AND connamespace = current_schema()::regnamespace
+          AND conname LIKE '%_company_id_fkey'
+    """)
+    pending = cur.fetchall()
+
+    for table, name in pending:
+        try:
+            cur.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            reason = (e.pgerror or str(e)).strip().splitlines()[0]
+            print(f"⚠️ {table}: {name} left NOT VALID ({reason})")
+
+    cur.close()
+
+
+def status(conn) -> None:
+    cur = _plain_cursor(conn)
+    done = set(applied_versions(cur))
+    conn.commit()
+    cur.close()
+
+    for version, name, _ in MIGRATIONS:
+        mark = "✅" if version in done else "⏳"
+        print(f"{mark} {version:>3}  {name}")
+
+
+# =====================================================
+# CLI
+# =====================================================
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], sslmode=DB_SSLMODE)
+
+    if "--status" in sys.argv:
+        status(conn)
+    else:
+        versions = migrate(conn)
+        print("✅ Applied:", versions if versions else "nothing (up to date)")
+
+    conn.close()
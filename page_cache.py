@@ -0,0 +1,258 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# rendered company pages kept in memory (LRU, bounded by body bytes)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# hard expiry even if no invalidation arrives (0 = never expires)
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# how often each process polls content_versions for changed companies
+PAGE_CACHE_POLL = float(os.getenv("PAGE_CACHE_POLL", "5"))
+
+# browser / CDN freshness; after that they revalidate with If-None-Match
+PAGE_MAX_AGE = int(os.getenv("PAGE_MAX_AGE", "60"))
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") == "1"
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 asks for GET).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PAGE_MAX_AGE}",
+    }
+
+
+# =====================================================
+# PAGE CACHE
+# =====================================================
+
+class PageCache:
+    """
+    Thread-safe LRU of rendered pages keyed by company id.
+
+    - bounded by total body bytes (least recently used evicted first)
+    - entries expire after ttl seconds
+    - invalidate() is driven by content_versions (see VersionPoller);
+      put() refuses a page rendered before an invalidation that landed
+      while it was being rendered, so a slow miss can't cache stale data
+    """
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES,
+                 ttl: float = PAGE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # cid -> (body, etag, stored_at)
+        self._entries: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        # cid -> last content version seen by the poller
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, cid: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(cid)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            body, etag, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._drop(cid)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(cid)
+            self.hits += 1
+            return body, etag
+
+    def version(self, cid: str) -> int:
+        # read before querying the DB, pass the result to put()
+        return self._versions.get(cid, 0)
+
+    def put(self, cid: str, body: bytes, version: int) -> str:
+        etag = make_etag(body)
+
+        if len(body) > self.max_bytes:
+            return etag
+
+        with self._lock:
+            if self._versions.get(cid, 0) != version:
+                return etag
+
+            if cid in self._entries:
+                self._drop(cid)
+
+            self._entries[cid] = (body, etag, time.monotonic())
+            self._bytes += len(body)
+
+            while self._bytes > self.max_bytes:
+                old, _ = next(iter(self._entries.items()))
+                self._drop(old)
+                self.evictions += 1
+
+        return etag
+
+    def invalidate(self, versions: Dict[str, int]) -> int:
+        """
+        versions: {company_id: new content version}.
+        Returns how many cached pages were dropped.
+        """
+        dropped = 0
+        with self._lock:
+            for cid, v in versions.items():
+                if self._versions.get(cid) == v:
+                    continue
+                self._versions[cid] = v
+                if cid in self._entries:
+                    self._drop(cid)
+                    dropped += 1
+            self.invalidations += dropped
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, cid: str) -> None:
+        body, _, _ = self._entries.pop(cid)
+        self._bytes -= len(body)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# =====================================================
+# INVALIDATION (content_versions polling)
+# =====================================================
+# bulk_loader.bump_versions() gives every company whose data changed a new
+# version in the load transaction (changed_at = that transaction's start).
+# Each app process asks for rows changed since its last poll minus
+# PAGE_CACHE_LAG, so a load that commits a while after it started is
+# still seen; versions it already knows are ignored.
+
+PAGE_CACHE_LAG = float(os.getenv("PAGE_CACHE_LAG", "300"))
+
+POLL_SQL = """
+    SELECT company_id, version
+    FROM content_versions
+    WHERE changed_at >= %s::timestamptz - make_interval(secs => %s)
+"""
+
+
+class VersionPoller(threading.Thread):
+    """
+    Feeds changed {company_id: version} to the page cache (may be None)
+    and to every listener (e.g. Screener.on_versions).
+    """
+
+    def __init__(self, pool, cache: Optional[PageCache], interval: float = PAGE_CACHE_POLL,
+                 lag: float = PAGE_CACHE_LAG,
+                 listeners: Optional[List[Callable[[Dict[str, int]], Any]]] = None):
+        super().__init__(name="content-version-poller", daemon=True)
+        self.pool = pool
+        self.cache = cache
+        self.listeners = list(listeners or [])
+        self.interval = interval
+        self.lag = lag
+        self.since: Any = None
+        self.polls = 0
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def poll(self) -> int:
+        """
+        One poll; returns how many cached pages were dropped.
+        """
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT now() AS now")
+            now = cur.fetchone()["now"]
+            cur.execute(POLL_SQL, (self.since or now, self.lag))
+            rows = cur.fetchall()
+            cur.close()
+
+        self.since = now
+        self.polls += 1
+        if not rows:
+            return 0
+
+        versions = {r["company_id"]: r["version"] for r in rows}
+        dropped = self.cache.invalidate(versions) if self.cache is not None else 0
+        for listener in self.listeners:
+            listener(versions)
+        return dropped
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                # DB away or migration 6 not applied yet: pages still
+                # expire by TTL, keep trying
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"⚠️ content version poller: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "lag": self.lag,
+            "since": self.since.isoformat() if self.since else None,
+            "polls": self.polls,
+            "errors": self.errors,
+        }
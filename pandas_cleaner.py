@@ -1,8 +1,19 @@
+from __future__ import annotations
+
+import os
 import re
 import json
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# pandas is imported by the vectorized cleaner only, so the per-row
+# parsers (panel, screener, the web app) don't pay its import time
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # =====================================================
@@ -21,11 +32,64 @@ NON_NUMERIC_KEYS = {
     "period"
 }
 
+NULL_MARKERS = {"NULL", "NA", "N/A", ""}
+
+# per-parser LRU size for string inputs ("Mar 2015", "10 Years: 11%",
+# "NA" repeat across every company); 0 disables the caches
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "65536"))
+
+NUMBER_PATTERN = re.compile(r"-?\d+\.?\d*")
+YEAR_PATTERN = re.compile(r"\b((?:19|20)\d{2})\b")
+
+# vectorized cleaner patterns (run as Arrow / RE2 kernels, hence strings)
+ASCII_TEXT_PATTERN = r"[\t\n\x0b\x0c\r\x20-\x7e]*"
+
+# whole-string rewrites to one match: str.replace runs as an Arrow
+# kernel where str.extract / str.findall would not.
+# LAST_NUMBER only matches when the last number can't be the tail of a
+# longer findall match: it follows start-of-text or a char no match can
+# contain
+LAST_NUMBER_PATTERN = r"(?s:^(?:.*[^\d.\-])?(" + NUMBER_PATTERN.pattern + r")\D*$)"
+FIRST_YEAR_PATTERN = r"(?s)^.*?" + YEAR_PATTERN.pattern + r".*$"
+YEAR_ANY_PATTERN = r"\b(?:19|20)\d{2}\b"
+
 
 # =====================================================
 # BASIC HELPERS
 # =====================================================
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _text_float(text: str) -> Optional[float]:
+    text = text.strip().replace(",", "")
+
+    if text.upper() in NULL_MARKERS:
+        return None
+
+    nums = NUMBER_PATTERN.findall(text)
+    if not nums:
+        return None
+
+    return float(nums[-1])
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _text_year(text: str) -> Optional[int]:
+    m = YEAR_PATTERN.search(text)
+    return int(m.group()) if m else None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _text_period(text: str) -> str:
+    return text.split(":")[0].strip()
+
+
+PARSE_CACHES = {
+    "to_float": _text_float,
+    "extract_year": _text_year,
+    "extract_period": _text_period,
+}
+
+
 def to_float(val: Any) -> Optional[float]:
     """
     Convert messy API values into float.
@@ -41,6 +105,7 @@ def to_float(val: Any) -> Optional[float]:
     Rule:
       - Extract all numbers
       - Return LAST number (finance data convention)
+    Strings are parsed once and memoized (PARSE_CACHE_SIZE).
     """
     if val is None:
         return None
@@ -51,16 +116,7 @@ def to_float(val: Any) -> Optional[float]:
     if not isinstance(val, str):
         return None
 
-    val = val.strip().replace(",", "")
-
-    if val.upper() in {"NULL", "NA", "N/A", ""}:
-        return None
-
-    nums = re.findall(r"-?\d+\.?\d*", val)
-    if not nums:
-        return None
-
-    return float(nums[-1])
+    return _text_float(val)
 
 
 def extract_year(val: Any) -> Optional[int]:
@@ -78,9 +134,7 @@ def extract_year(val: Any) -> Optional[int]:
         return val
 
     if isinstance(val, str):
-        m = re.search(r"\b(19|20)\d{2}\b", val)
-        if m:
-            return int(m.group())
+        return _text_year(val)
 
     return None
 
@@ -92,7 +146,32 @@ def extract_period(text: Any) -> Optional[str]:
     if not isinstance(text, str):
         return None
 
-    return text.split(":")[0].strip()
+    return _text_period(text)
+
+
+def parse_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Hit / miss counters of the parser caches, e.g.
+      {"to_float": {"hits": 9120, "misses": 880, "hit_rate": 0.912,
+                    "size": 880, "maxsize": 65536}, ...}
+    """
+    stats = {}
+    for name, fn in PARSE_CACHES.items():
+        info = fn.cache_info()
+        calls = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / calls, 4) if calls else 0.0,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return stats
+
+
+def clear_parse_caches() -> None:
+    for fn in PARSE_CACHES.values():
+        fn.cache_clear()
 
 
 # =====================================================
@@ -164,6 +243,179 @@ def clean_analysis(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return output
 
 
+# =====================================================
+# VECTORIZED CLEANER (DataFrame in, typed columns out)
+# =====================================================
+# Same rules as to_float / extract_year / clean_financial_rows, applied a
+# column at a time, for batch consumers that want typed columns (many
+# companies at once). For one company's 12-row statement, or when dicts
+# are wanted back, the per-row functions above are cheaper.
+
+def _last_number(text: str) -> Optional[float]:
+    nums = NUMBER_PATTERN.findall(text)
+    return float(nums[-1]) if nums else None
+
+
+def _split_ascii(texts: np.ndarray) -> Tuple[pd.Series, np.ndarray]:
+    """
+    texts: object array of str.
+    Returns the printable-ASCII ones as a "str" Series (Arrow-backed when
+    pyarrow is installed, so .str ops run as compiled kernels) plus a mask
+    of the rest (unicode digits / spaces, control chars), which callers
+    send through the per-cell functions so results stay identical.
+    """
+    import pandas as pd
+
+    txt = pd.Series(texts, dtype="str")
+    ascii_ = txt.str.fullmatch(ASCII_TEXT_PATTERN).to_numpy(dtype=bool)
+    return txt[ascii_], ~ascii_
+
+
+def _text_to_float(texts: np.ndarray) -> np.ndarray:
+    """to_float() over an object array of str -> float64, NaN for None."""
+    out = np.full(len(texts), np.nan)
+
+    txt, other = _split_ascii(texts)
+    if other.any():
+        out[other] = np.array([to_float(v) for v in texts[other]], dtype="float64")
+
+    pos = np.flatnonzero(~other)
+    txt = txt.str.strip().str.replace(",", "", regex=False)
+    keep = ~txt.str.upper().isin(list(NULL_MARKERS)).to_numpy(dtype=bool)
+    txt, pos = txt[keep], pos[keep]
+
+    # "1234" / "-12.5" parse directly; "12%", "10 Years: 11%" are rewritten
+    # to their last number in one regex pass; the rare cells where the
+    # last number is ambiguous ("12.5.3", "1-2") go through findall()
+    plain = txt.str.fullmatch(NUMBER_PATTERN.pattern).to_numpy(dtype=bool)
+    out[pos[plain]] = txt[plain].astype("float64").to_numpy()
+
+    txt, pos = txt[~plain], pos[~plain]
+    if len(txt):
+        last = txt.str.fullmatch(LAST_NUMBER_PATTERN).to_numpy(dtype=bool)
+        out[pos[last]] = txt[last].str.replace(
+            LAST_NUMBER_PATTERN, r"\1", regex=True
+        ).astype("float64").to_numpy()
+
+        rest = txt[~last].to_numpy(dtype=object)
+        if len(rest):
+            out[pos[~last]] = np.array([_last_number(v) for v in rest], dtype="float64")
+
+    return out
+
+
+def _text_to_year(texts: np.ndarray) -> np.ndarray:
+    """extract_year() over an object array of str -> float64, NaN for None."""
+    out = np.full(len(texts), np.nan)
+
+    txt, other = _split_ascii(texts)
+    if other.any():
+        out[other] = np.array([extract_year(v) for v in texts[other]], dtype="float64")
+
+    pos = np.flatnonzero(~other)
+    found = txt.str.contains(YEAR_ANY_PATTERN, regex=True).to_numpy(dtype=bool)
+    out[pos[found]] = txt[found].str.replace(
+        FIRST_YEAR_PATTERN, r"\1", regex=True
+    ).astype("float64").to_numpy()
+
+    return out
+
+
+def _column_kinds(s: pd.Series) -> Tuple[str, np.ndarray]:
+    import pandas as pd
+
+    values = s.to_numpy(dtype=object)
+    return pd.api.types.infer_dtype(values, skipna=True), values
+
+
+def to_float_series(values: pd.Series) -> pd.Series:
+    """
+    Column-wise to_float(). Returns float64, NaN where to_float gives None.
+    """
+    import pandas as pd
+
+    s = pd.Series(values, dtype=object)
+    inferred, arr = _column_kinds(s)
+
+    # all-number columns (the common case): one C-level cast, None -> NaN
+    if inferred in ("integer", "floating", "mixed-integer-float", "boolean", "empty"):
+        return s.astype("float64")
+
+    out = np.full(len(arr), np.nan)
+
+    if inferred == "string":
+        strings = s.notna().to_numpy(dtype=bool)
+    else:
+        kinds = s.map(type).to_numpy(dtype=object)
+        numeric = (kinds == int) | (kinds == float) | (kinds == bool)
+        out[numeric] = arr[numeric].astype("float64")
+        strings = kinds == str
+
+    if strings.any():
+        out[strings] = _text_to_float(arr[strings])
+
+    return pd.Series(out, index=s.index)
+
+
+def extract_year_series(values: pd.Series) -> pd.Series:
+    """
+    Column-wise extract_year(). Returns nullable Int64.
+    """
+    import pandas as pd
+
+    s = pd.Series(values, dtype=object)
+    inferred, arr = _column_kinds(s)
+
+    if inferred in ("integer", "empty"):
+        return s.astype("Int64")
+
+    out = np.full(len(arr), np.nan)
+
+    if inferred == "string":
+        strings = s.notna().to_numpy(dtype=bool)
+    else:
+        kinds = s.map(type).to_numpy(dtype=object)
+        ints = (kinds == int) | (kinds == bool)
+        out[ints] = arr[ints].astype("float64")
+        strings = kinds == str
+
+    if strings.any():
+        out[strings] = _text_to_year(arr[strings])
+
+    return pd.Series(out, index=s.index).astype("Int64")
+
+
+def clean_financial_frame(rows: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Vectorized clean_financial_rows(): one DataFrame, one pass per column.
+    Takes the raw rows, or a DataFrame of them as read.
+      year column        -> Int64
+      NON_NUMERIC_KEYS   -> untouched (object)
+      everything else    -> float64 (NaN = missing / unparseable)
+    """
+    import pandas as pd
+
+    if isinstance(rows, pd.DataFrame):
+        raw = rows
+    else:
+        # dtype=object keeps ints as ints (no float upcast from missing cells)
+        raw = pd.DataFrame(rows, dtype=object) if rows else pd.DataFrame()
+    out = {}
+
+    for col in raw.columns:
+        key = str(col).lower()
+        # keys missing from a row come through as NaN, which both
+        # column cleaners already map to missing
+        if key == "year":
+            out[col] = extract_year_series(raw[col])
+        elif key in NON_NUMERIC_KEYS:
+            out[col] = raw[col]
+        else:
+            out[col] = to_float_series(raw[col])
+
+    return pd.DataFrame(out, index=raw.index)
+
+
 # =====================================================
 # API RESPONSE VALIDATION
 # =====================================================
@@ -0,0 +1,190 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pandas_cleaner import extract_year, to_float
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# statement columns loaded into the panel (VARCHAR ones parsed with to_float)
+PANEL_COLUMNS: Dict[str, List[str]] = {
+    "profitandloss": [
+        "sales", "expenses", "operating_profit", "opm_percentage",
+        "other_income", "interest", "depreciation", "profit_before_tax",
+        "net_profit", "eps", "dividend_payout"
+    ],
+    "balancesheet": [
+        "equity_capital", "reserves", "borrowings", "other_liabilities",
+        "total_liabilities", "fixed_assets", "cwip", "investments",
+        "other_asset", "total_assets"
+    ],
+    "cashflow": [
+        "operating_activity", "investing_activity", "financing_activity",
+        "net_cash_flow"
+    ],
+}
+
+TEXT_COLUMNS = {"equity_capital", "dividend_payout"}
+
+COMPANY_COLUMNS = ["roe_percentage", "roce_percentage", "book_value", "face_value"]
+
+
+# =====================================================
+# PANEL (company x year)
+# =====================================================
+
+class Panel:
+    """
+    Columnar snapshot of the statements: one float64 matrix per column,
+    rows = companies (sorted by id), columns = fiscal years (ascending).
+    Missing values are NaN. Never mutated after build; refreshes build a
+    new panel and swap it in.
+    """
+
+    def __init__(self, ids: List[str], names: List[str], years: np.ndarray,
+                 values: Dict[str, np.ndarray], info: Dict[str, np.ndarray]):
+        self.ids = ids
+        self.names = names
+        self.years = years
+        self.values = values
+        self.info = info
+        self.index = {cid: i for i, cid in enumerate(ids)}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.ids), len(self.years)
+
+
+def _number(v: Any) -> float:
+    if v is None:
+        return np.nan
+    if isinstance(v, str):
+        f = to_float(v)
+        return np.nan if f is None else f
+    return float(v)
+
+
+def build_panel(companies: List[Dict[str, Any]],
+                statements: Dict[str, List[Dict[str, Any]]],
+                base: Optional[Panel] = None,
+                replace: Iterable[str] = ()) -> Panel:
+    """
+    companies: rows of `companies` (company_id, company_name, COMPANY_COLUMNS)
+    statements: {table: rows with company_id, year and PANEL_COLUMNS[table]}
+
+    With base, returns base with the companies in `replace` swapped for
+    the given rows; companies in `replace` missing from `companies` are
+    dropped (deleted upstream).
+    """
+    replace = set(replace)
+    keep = [] if base is None else [c for c in base.ids if c not in replace]
+
+    fresh = {str(c["company_id"]): c for c in companies}
+    ids = sorted(set(keep) | set(fresh))
+    index = {cid: i for i, cid in enumerate(ids)}
+
+    # fiscal years of the new rows, merged into the base axis
+    parsed: Dict[str, Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]]]] = {}
+    year_set = set() if base is None else set(base.years.tolist())
+
+    for table, rows in statements.items():
+        rows = [r for r in rows if str(r["company_id"]) in index]
+        fy = [extract_year(r.get("year")) for r in rows]
+        rows = [r for r, y in zip(rows, fy) if y is not None]
+        fy = [y for y in fy if y is not None]
+        year_set.update(fy)
+        parsed[table] = (
+            np.fromiter((index[str(r["company_id"])] for r in rows), dtype=np.intp, count=len(rows)),
+            np.asarray(fy, dtype=np.int64),
+            rows,
+        )
+
+    # contiguous axis, so "n years back" is always "n columns back"
+    years = np.arange(min(year_set), max(year_set) + 1, dtype=np.int64) \
+        if year_set else np.zeros(0, dtype=np.int64)
+    n, y = len(ids), len(years)
+
+    values = {
+        col: np.full((n, y), np.nan)
+        for cols in PANEL_COLUMNS.values() for col in cols
+    }
+    info = {col: np.full(n, np.nan) for col in COMPANY_COLUMNS}
+    names = [""] * n
+
+    # carry over untouched companies from the base panel in one copy
+    if base is not None and keep:
+        old_rows = np.fromiter((base.index[c] for c in keep), dtype=np.intp, count=len(keep))
+        new_rows = np.fromiter((index[c] for c in keep), dtype=np.intp, count=len(keep))
+        old_cols = np.searchsorted(years, base.years)
+        for col, arr in values.items():
+            arr[np.ix_(new_rows, old_cols)] = base.values[col][old_rows]
+        for col, arr in info.items():
+            arr[new_rows] = base.info[col][old_rows]
+        for cid in keep:
+            names[index[cid]] = base.names[base.index[cid]]
+
+    for cid, c in fresh.items():
+        i = index[cid]
+        names[i] = c.get("company_name") or cid
+        for col in COMPANY_COLUMNS:
+            info[col][i] = _number(c.get(col))
+
+    for table, (row_idx, fy, rows) in parsed.items():
+        col_idx = np.searchsorted(years, fy)
+        for col in PANEL_COLUMNS[table]:
+            if col in TEXT_COLUMNS:
+                data = [_number(r.get(col)) for r in rows]
+            else:
+                data = [np.nan if r.get(col) is None else r.get(col) for r in rows]
+            values[col][row_idx, col_idx] = np.asarray(data, dtype=np.float64)
+
+    return Panel(ids, names, years, values, info)
+
+
+# =====================================================
+# LOADING
+# =====================================================
+
+COMPANIES_SQL = """
+    SELECT company_id, company_name, {columns}
+    FROM companies
+    {where}
+"""
+
+STATEMENT_SQL = "SELECT company_id, year, {columns} FROM {table} {where}"
+
+
+def _dict_rows(cur) -> List[Dict[str, Any]]:
+    # works on plain and RealDictCursor cursors alike
+    rows = cur.fetchall()
+    if rows and isinstance(rows[0], dict):
+        return rows
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, r)) for r in rows]
+
+
+def fetch_panel_rows(cur, company_ids: Optional[List[str]] = None
+                     ) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """
+    (companies, statements) rows for build_panel(); every company when
+    company_ids is None.
+    """
+    where = "" if company_ids is None else "WHERE company_id = ANY(%s)"
+    params = () if company_ids is None else (list(company_ids),)
+
+    cur.execute(COMPANIES_SQL.format(
+        columns=", ".join(COMPANY_COLUMNS), where=where
+    ), params)
+    companies = _dict_rows(cur)
+
+    statements = {}
+    for table, cols in PANEL_COLUMNS.items():
+        cur.execute(STATEMENT_SQL.format(
+            columns=", ".join(cols), table=table, where=where
+        ), params)
+        statements[table] = _dict_rows(cur)
+
+    return companies, statements
@@ -0,0 +1,104 @@
+from typing import Any, Dict, Optional
+
+
+# =====================================================
+# COMPANY PAGE (ONE ROUND TRIP)
+# =====================================================
+
+# Each child table is folded into a JSON array next to the company row, so
+# the whole page is a single statement instead of eight. prosandcons is
+# scanned once and split into pros / cons with FILTER.
+COMPANY_BUNDLE_SQL = """
+    SELECT
+        c.*,
+        COALESCE((
+            SELECT json_agg(a ORDER BY a.id)
+            FROM analysis a
+            WHERE a.company_id = c.company_id
+        ), '[]'::json) AS _analysis,
+        COALESCE(pc.pros, '[]'::json) AS _pros,
+        COALESCE(pc.cons, '[]'::json) AS _cons,
+        COALESCE((
+            SELECT json_agg(b ORDER BY b.year)
+            FROM balancesheet b
+            WHERE b.company_id = c.company_id
+        ), '[]'::json) AS _balancesheet,
+        COALESCE((
+            SELECT json_agg(pl ORDER BY pl.year)
+            FROM profitandloss pl
+            WHERE pl.company_id = c.company_id
+        ), '[]'::json) AS _profitandloss,
+        COALESCE((
+            SELECT json_agg(cf ORDER BY cf.year)
+            FROM cashflow cf
+            WHERE cf.company_id = c.company_id
+        ), '[]'::json) AS _cashflow,
+        COALESCE((
+            SELECT json_agg(d ORDER BY d.year DESC)
+            FROM documents d
+            WHERE d.company_id = c.company_id
+        ), '[]'::json) AS _documents
+    FROM companies c
+    LEFT JOIN LATERAL (
+        SELECT
+            json_agg(json_build_object('pros', p.pros) ORDER BY p.id)
+                FILTER (WHERE p.pros IS NOT NULL) AS pros,
+            json_agg(json_build_object('cons', p.cons) ORDER BY p.id)
+                FILTER (WHERE p.cons IS NOT NULL) AS cons
+        FROM prosandcons p
+        WHERE p.company_id = c.company_id
+    ) pc ON TRUE
+    WHERE c.company_id = %s
+"""
+
+BUNDLE_SECTIONS = (
+    "analysis",
+    "pros",
+    "cons",
+    "balancesheet",
+    "profitandloss",
+    "cashflow",
+    "documents",
+)
+
+
+def split_company_bundle(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Turns one COMPANY_BUNDLE_SQL row into the company.html context
+    (without 'request'). Returns None when the company does not exist.
+    """
+    if not row:
+        return None
+
+    company = dict(row)
+    context: Dict[str, Any] = {}
+
+    for section in BUNDLE_SECTIONS:
+        context[section] = company.pop(f"_{section}") or []
+
+    context["company"] = company
+    return context
+
+
+def fetch_company_bundle(conn, cid: str) -> Optional[Dict[str, Any]]:
+    """
+    Company row plus every child table in a single query.
+    Expects a RealDictCursor connection (as handed out by db_pool).
+    """
+    cur = conn.cursor()
+    cur.execute(COMPANY_BUNDLE_SQL, (cid,))
+    row = cur.fetchone()
+    cur.close()
+
+    return split_company_bundle(row)
+
+
+async def afetch_company_bundle(conn, cid: str) -> Optional[Dict[str, Any]]:
+    """
+    fetch_company_bundle() for a psycopg 3 async connection (db_async).
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(COMPANY_BUNDLE_SQL, (cid,))
+        row = await cur.fetchone()
+
+    return split_company_bundle(row)
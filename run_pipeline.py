@@ -2,127 +2,198 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import time
+import sys
 import psycopg2
-from fetch import get_company_ids, fetch_company, save_raw_json
+from bulk_loader import LOAD_CHANGED_ONLY, LoadStats, load_batch
+from db_pool import DB_SSLMODE
+from fetch import get_company_ids, save_raw_json
+from fetch_cache import create_cache
+from fetch_engine import FetchEngine
+from history import HISTORY_ENABLED, record_snapshot
+from ingest import prepare_payload
+from instrumentation import CompanyProfiler, PipelineMetrics
+from snapshots import RAW_JSON_ARCHIVE, SnapshotWriter
+from work_queue import (
+    FETCHED,
+    LOADED,
+    WorkQueue,
+    claim_rounds,
+    create_run,
+    get_conn as queue_conn,
+    join_or_create_run,
+    run_exists,
+)
 
 
 def get_conn():
     return psycopg2.connect(
         os.environ["DATABASE_URL"],
-        sslmode="require",
+        sslmode=DB_SSLMODE,
         connect_timeout=5
     )
 
 
-def insert_rows(cur, table, rows, cols):
-    if not rows:
-        return
-
-    for r in rows:
-        values = [r.get(c) for c in cols]
-        cur.execute(
-            f"""
-            INSERT INTO {table} ({','.join(cols)})
-            VALUES ({','.join(['%s'] * len(cols))})
-            """,
-            values
-        )
-
-
-def main():
-    company_ids = get_company_ids()
-    print("Total companies:", len(company_ids))
-
-    for cid in company_ids:
-        print(f"\nFetching → {cid}")
+def clean_fetched(cid, data):
+    """
+    The fetched payload validated and cleaned exactly as ingest / saver.py
+    clean a raw file, so both store the same values and record the same
+    content hash (payload_hash of the cleaned payload) for --changed-only.
+    Returns (payload, None) or (None, error).
+    """
+    try:
+        result = prepare_payload(data, cid)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    if "error" in result:
+        return None, result["error"]
+    return result["payload"], None
+
+
+def fetched_payloads(engine, company_ids, snapshot, metrics, queue):
+    # fetches run concurrently; cleaned payloads are yielded as (requested
+    # id, payload) as they complete, failures go back to the queue
+    for cid, data in engine.iter_fetch(company_ids):
+        print(f"\nFetched → {cid}")
 
-        data = fetch_company(cid)
         if not data:
+            queue.fail(cid, "fetch failed")
             continue
 
-        save_raw_json(cid, data)
-
-        company = data.get("company")
-        d = data.get("data")
-        if not company or not d:
+        with metrics.timer("snapshot", cid):
+            snapshot.add(data)
+            if RAW_JSON_ARCHIVE:
+                save_raw_json(cid, data)
+
+        # the snapshot keeps the raw payload; the database gets it cleaned
+        with metrics.timer("clean", cid):
+            payload, error = clean_fetched(cid, data)
+        if error:
+            print("❌ Invalid payload for", cid, error)
+            metrics.incr("invalid_payloads")
+            queue.fail(cid, error)
             continue
 
-        conn = get_conn()
-        cur = conn.cursor()
-
-        try:
-            # ---------- companies ----------
-            cur.execute("""
-                INSERT INTO companies (
-                    company_id, company_logo, company_name, chart_link,
-                    about_company, website, nse_profile, bse_profile,
-                    face_value, book_value, roce_percentage, roe_percentage
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (company_id) DO NOTHING
-            """, (
-                company.get("id"),
-                company.get("company_logo"),
-                company.get("company_name"),
-                company.get("chart_link"),
-                company.get("about_company"),
-                company.get("website"),
-                company.get("nse_profile"),
-                company.get("bse_profile"),
-                company.get("face_value"),
-                company.get("book_value"),
-                company.get("roce_percentage"),
-                company.get("roe_percentage")
-            ))
-
-            insert_rows(cur, "analysis", d.get("analysis", []),
-                        ["company_id","compounded_sales_growth",
-                         "compounded_profit_growth","stock_price_cagr","roe"])
-
-            insert_rows(cur, "prosandcons", d.get("prosandcons", []),
-                        ["company_id","pros","cons"])
-
-            insert_rows(cur, "balancesheet", d.get("balancesheet", []),
-                        ["company_id","year","equity_capital","reserves",
-                         "borrowings","other_liabilities","total_liabilities",
-                         "fixed_assets","cwip","investments",
-                         "other_asset","total_assets"])
-
-            insert_rows(cur, "profitandloss", d.get("profitandloss", []),
-                        ["company_id","year","sales","expenses",
-                         "operating_profit","opm_percentage","other_income",
-                         "interest","depreciation","profit_before_tax",
-                         "tax_percentage","net_profit","eps","dividend_payout"])
-
-            insert_rows(cur, "cashflow", d.get("cashflow", []),
-                        ["company_id","year","operating_activity",
-                         "investing_activity","financing_activity",
-                         "net_cash_flow"])
-
-            docs = [{
-                "company_id": cid,
-                "year": doc.get("Year"),
-                "annual_report": doc.get("Annual_Report")
-            } for doc in d.get("documents", [])]
-
-            insert_rows(cur, "documents", docs,
-                        ["company_id","year","annual_report"])
-
-            conn.commit()
-            print("✅ Saved", cid)
-
-        except Exception as e:
-            conn.rollback()
-            print("❌ Failed", cid, e)
-
-        finally:
-            cur.close()
-            conn.close()
-
-        time.sleep(1)
+        yield cid, payload
+
 
+def all_company_ids():
+    company_ids = get_company_ids()
+    print("Total companies:", len(company_ids))
+    return company_ids
+
+
+def open_run(conn, resume=False):
+    """
+    The queue run to work on. Without resume a new run over
+    get_company_ids(); with resume=RUN that run; with resume=True the
+    latest unfinished run, or a new one if there is none (so workers
+    started together with --resume all share one run).
+    """
+    if not resume:
+        return create_run(conn, all_company_ids())
+
+    if isinstance(resume, str):
+        if run_exists(conn, resume):
+            print("Resuming run:", resume)
+            return resume
+        raise SystemExit(f"❌ no pipeline run '{resume}'")
+
+    run_id, created = join_or_create_run(conn, all_company_ids)
+    if not created:
+        print("Resuming run:", run_id)
+    return run_id
+
+
+def process_round(engine, conn, queue, company_ids, snapshot, stats, metrics, changed_only):
+    """
+    Fetch + load one claimed batch, recording each company's state.
+    """
+    fetched = list(fetched_payloads(engine, company_ids, snapshot, metrics, queue))
+    queue.mark([cid for cid, _ in fetched], FETCHED)
+    if not fetched:
+        return
+
+    already_failed = len(stats.failed)
+    load_batch(conn, [data for _, data in fetched], stats,
+               changed_only=changed_only, metrics=metrics)
+
+    # load failures are reported by payload id
+    failed = set(stats.failed[already_failed:])
+    loaded = []
+    for cid, data in fetched:
+        if str(data["company"].get("id")) in failed:
+            queue.fail(cid, "load failed")
+        else:
+            loaded.append(cid)
+    queue.mark(loaded, LOADED)
+
+
+def main(changed_only=LOAD_CHANGED_ONLY, profile=False, resume=False):
+    # companies are claimed from a Postgres work queue (work_queue.py) in
+    # leased batches, so any number of these processes can share a run.
+    #   python run_pipeline.py                 new full run
+    #   python run_pipeline.py --resume        join / continue the latest
+    #                                          unfinished run (extra workers,
+    #                                          crashed runs)
+    #   python run_pipeline.py --resume RUN    that run
+    # Companies fetched but not loaded are fetched again (served by the
+    # fetch cache).
+    # Stage timings go to PIPELINE_METRICS_PATH; --profile keeps cProfile
+    # stats of the slowest companies' fetch (request + decode)
+    qconn = queue_conn()
+    queue = WorkQueue(qconn, open_run(qconn, resume))
+    if resume:
+        reclaimed = queue.reclaim_local()
+        if reclaimed:
+            print(f"🔓 {reclaimed} companies leased by dead local workers reclaimed")
+
+    metrics = PipelineMetrics("pipeline")
+    profiler = CompanyProfiler() if profile else None
+    engine = FetchEngine(cache=create_cache(), metrics=metrics, profiler=profiler)
+    conn = get_conn()
+    stats = LoadStats()
+
+    try:
+        with SnapshotWriter() as snapshot:
+            for company_ids in claim_rounds(queue):
+                metrics.incr("claimed", len(company_ids))
+                process_round(engine, conn, queue, company_ids, snapshot,
+                              stats, metrics, changed_only)
+
+        if HISTORY_ENABLED and snapshot.companies:
+            with metrics.timer("history"):
+                record_snapshot(conn, snapshot.run_id, snapshot.root)
+
+        if queue.finish_if_done():
+            print(f"🏁 Run {queue.run_id} finished")
+    finally:
+        # leases of companies claimed but not processed go back now
+        queue.release()
+        print(queue.summary())
+        qconn.close()
+        conn.close()
+        engine.close()
+
+    engine.record_counts(metrics)
+    metrics.add_load(stats)
+
+    print("\n" + stats.summary())
+    if engine.cache is not None:
+        print(engine.cache_summary())
+    metrics.write()
+    if profiler is not None:
+        profiler.dump()
     print("\nALL COMPANIES PROCESSED")
 
 
 if __name__ == "__main__":
-    main()
+    resume = "--resume" in sys.argv
+    i = sys.argv.index("--resume") + 1 if resume else 0
+    if resume and i < len(sys.argv) and not sys.argv[i].startswith("--"):
+        resume = sys.argv[i]
+
+    main(
+        changed_only=LOAD_CHANGED_ONLY or "--changed-only" in sys.argv,
+        profile="--profile" in sys.argv,
+        resume=resume
+    )
@@ -0,0 +1,380 @@
+import ast
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import METRIC_COLUMNS, safe_div, yearly_metrics
+from panel import Panel, build_panel, fetch_panel_rows
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+SCREEN_LIMIT = 50
+SCREEN_LIMIT_MAX = 500
+
+# longer filters are rejected before parsing (deeply nested expressions
+# would otherwise hit the recursion limit in ast.parse / _validate)
+SCREEN_MAX_FILTER_CHARS = int(os.getenv("SCREEN_MAX_FILTER_CHARS", "500"))
+
+# shown for every result next to whatever the filter / sort mention
+DEFAULT_COLUMNS = ["sales", "net_profit", "opm", "roe", "debt_equity", "sales_cagr_5y"]
+
+
+class ScreenError(ValueError):
+    """
+    Bad filter / sort expression (HTTP 400 at the route).
+    """
+
+
+# =====================================================
+# METRICS (latest year of metrics.yearly_metrics)
+# =====================================================
+
+def latest_index(panel: Panel) -> np.ndarray:
+    """
+    Column of each company's latest year with sales reported, -1 if none.
+    """
+    n, y = panel.shape
+    latest = np.full(n, -1)
+    if y:
+        has = ~np.isnan(panel.values["sales"])
+        found = has.any(axis=1)
+        latest[found] = y - 1 - np.argmax(has[found, ::-1], axis=1)
+    return latest
+
+
+def compute_metrics(panel: Panel) -> Dict[str, np.ndarray]:
+    """
+    One value per company from its latest year (CAGRs and growth look
+    back from that year); same definitions as the metrics table.
+    """
+    n, _ = panel.shape
+    latest = latest_index(panel)
+    ok = latest >= 0
+    rows = np.flatnonzero(ok)
+
+    def at(a: np.ndarray) -> np.ndarray:
+        out = np.full(n, np.nan)
+        out[ok] = a[rows, latest[ok]]
+        return out
+
+    out = {"year": at(np.broadcast_to(panel.years.astype(np.float64), panel.shape))}
+    for col in ("sales", "net_profit", "operating_profit", "eps", "dividend_payout"):
+        out[col] = at(panel.values[col])
+    out["cfo"] = at(panel.values["operating_activity"])
+    for col, arr in yearly_metrics(panel).items():
+        out[col] = at(arr)
+
+    out["roe_reported"] = panel.info["roe_percentage"]
+    out["roce_reported"] = panel.info["roce_percentage"]
+    out["book_value"] = panel.info["book_value"]
+    out["face_value"] = panel.info["face_value"]
+    return out
+
+
+METRICS = (
+    "year", "sales", "net_profit", "operating_profit", "eps", "cfo",
+    "dividend_payout", *METRIC_COLUMNS,
+    "roe_reported", "roce_reported", "book_value", "face_value",
+)
+
+
+# =====================================================
+# EXPRESSIONS
+# =====================================================
+# Filters are Python-style boolean expressions over metric names, e.g.
+#   "roe > 20 and sales_cagr_5y > 15% and debt_equity < 0.5"
+# Commas mean "and", "15%" means 15, names are case-insensitive. Only
+# comparisons, and/or/not, + - * / and numbers are allowed; the tree is
+# evaluated on whole metric arrays, never with eval().
+
+_PERCENT_RE = re.compile(r"(\d)\s*%")
+
+_COMPARE = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_ARITH = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: safe_div,
+}
+
+
+@lru_cache(maxsize=256)
+def compile_filter(text: str) -> Optional[ast.AST]:
+    if len(text) > SCREEN_MAX_FILTER_CHARS:
+        raise ScreenError(f"filter is longer than {SCREEN_MAX_FILTER_CHARS} characters")
+
+    text = _PERCENT_RE.sub(r"\1", text.strip().lower())
+    if not text:
+        return None
+
+    try:
+        node = ast.parse(text, mode="eval").body
+        _validate(node)
+    except SyntaxError as e:
+        raise ScreenError(f"invalid filter: {e.msg}") from None
+    except (RecursionError, MemoryError):
+        raise ScreenError("filter is nested too deeply") from None
+    return node
+
+
+def _validate(node: ast.AST) -> None:
+    if isinstance(node, ast.Tuple):
+        for n in node.elts:
+            _validate(n)
+    elif isinstance(node, ast.BoolOp):
+        for n in node.values:
+            _validate(n)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub, ast.UAdd)):
+        _validate(node.operand)
+    elif isinstance(node, ast.Compare):
+        if not all(type(op) in _COMPARE for op in node.ops):
+            raise ScreenError("only < <= > >= == != comparisons are allowed")
+        for n in [node.left, *node.comparators]:
+            _validate(n)
+    elif isinstance(node, ast.BinOp):
+        if type(node.op) not in _ARITH:
+            raise ScreenError("only + - * / are allowed")
+        _validate(node.left)
+        _validate(node.right)
+    elif isinstance(node, ast.Name):
+        if node.id not in METRICS:
+            raise ScreenError(f"unknown metric '{node.id}'")
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ScreenError(f"unsupported value {node.value!r}")
+    else:
+        raise ScreenError(f"unsupported syntax: {type(node).__name__}")
+
+
+def _evaluate(node: ast.AST, metrics: Dict[str, np.ndarray], n: int) -> np.ndarray:
+    if isinstance(node, ast.Tuple):
+        return np.logical_and.reduce([_truth(e, metrics, n) for e in node.elts])
+    if isinstance(node, ast.BoolOp):
+        parts = [_truth(e, metrics, n) for e in node.values]
+        if isinstance(node.op, ast.And):
+            return np.logical_and.reduce(parts)
+        return np.logical_or.reduce(parts)
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            return ~_truth(node.operand, metrics, n)
+        val = _evaluate(node.operand, metrics, n)
+        return -val if isinstance(node.op, ast.USub) else val
+    if isinstance(node, ast.Compare):
+        out = np.ones(n, dtype=bool)
+        left = _evaluate(node.left, metrics, n)
+        for op, comp in zip(node.ops, node.comparators):
+            right = _evaluate(comp, metrics, n)
+            # NaN compares False, so companies missing a metric drop out
+            out &= _COMPARE[type(op)](left, right)
+            left = right
+        return out
+    if isinstance(node, ast.BinOp):
+        return _ARITH[type(node.op)](
+            _evaluate(node.left, metrics, n), _evaluate(node.right, metrics, n)
+        )
+    if isinstance(node, ast.Name):
+        return metrics[node.id]
+    return np.full(n, float(node.value))
+
+
+def _truth(node: ast.AST, metrics: Dict[str, np.ndarray], n: int) -> np.ndarray:
+    val = _evaluate(node, metrics, n)
+    return val if val.dtype == bool else (val != 0) & ~np.isnan(val)
+
+
+def parse_sort(text: str) -> List[Tuple[str, bool]]:
+    """
+    "-opm, roe" -> [("opm", descending), ("roe", ascending)]
+    """
+    keys = []
+    for part in (text or "").lower().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        desc = part.startswith("-")
+        name = part.lstrip("+-").strip()
+        if name not in METRICS:
+            raise ScreenError(f"unknown sort metric '{name}'")
+        keys.append((name, desc))
+    return keys
+
+
+def _names(node: Optional[ast.AST]) -> List[str]:
+    if node is None:
+        return []
+    seen = []
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name) and n.id not in seen:
+            seen.append(n.id)
+    return seen
+
+
+# =====================================================
+# SCREENER (what app.py holds)
+# =====================================================
+
+VERSIONS_SQL = "SELECT company_id, version FROM content_versions {where}"
+
+
+class Screener:
+    """
+    Panel + metrics for the whole universe, loaded on first use and then
+    kept current from content_versions: on_versions() is registered with
+    page_cache.VersionPoller and reloads only the companies that changed.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._state: Optional[Tuple[Panel, Dict[str, np.ndarray]]] = None
+        self._versions: Dict[str, int] = {}
+        self.loaded_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.refreshes = 0
+        self.refreshed_companies = 0
+
+    # ---------- loading ----------
+    def _fetch(self, ids: Optional[List[str]] = None):
+        where = "" if ids is None else "WHERE company_id = ANY(%s)"
+        params = () if ids is None else (ids,)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            companies, statements = fetch_panel_rows(cur, ids)
+            cur.execute(VERSIONS_SQL.format(where=where), params)
+            versions = {r["company_id"]: r["version"] for r in cur.fetchall()}
+            cur.close()
+
+        return companies, statements, versions
+
+    def load(self, companies: List[Dict[str, Any]],
+             statements: Dict[str, List[Dict[str, Any]]],
+             base: Optional[Panel] = None, replace: Iterable[str] = ()) -> None:
+        t0 = time.perf_counter()
+        panel = build_panel(companies, statements, base=base, replace=replace)
+        metrics = compute_metrics(panel)
+        # swap in one go so concurrent screens never see a half panel
+        self._state = (panel, metrics)
+        self.build_seconds = time.perf_counter() - t0
+        self.loaded_at = time.time()
+
+    def _ensure_loaded(self) -> Tuple[Panel, Dict[str, np.ndarray]]:
+        state = self._state
+        if state is not None or self.pool is None:
+            return state
+
+        with self._lock:
+            if self._state is None:
+                companies, statements, versions = self._fetch()
+                self.load(companies, statements)
+                self._versions.update(versions)
+        return self._state
+
+    def refresh(self, company_ids: Iterable[str]) -> int:
+        """
+        Reloads just these companies from the DB. Returns how many.
+        """
+        ids = sorted(set(company_ids))
+        if not ids or self._state is None:
+            return 0
+
+        with self._lock:
+            companies, statements, versions = self._fetch(ids)
+            self.load(companies, statements, base=self._state[0], replace=ids)
+            self._versions.update(versions)
+            self.refreshes += 1
+            self.refreshed_companies += len(ids)
+        return len(ids)
+
+    def on_versions(self, versions: Dict[str, int]) -> int:
+        """
+        VersionPoller listener: {company_id: content version}.
+        """
+        if self._state is None:
+            return 0
+        changed = [c for c, v in versions.items() if self._versions.get(c) != v]
+        return self.refresh(changed)
+
+    # ---------- screening ----------
+    def screen(self, where: str = "", sort: str = "", limit: int = SCREEN_LIMIT,
+               columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        state = self._ensure_loaded()
+        if state is None:
+            return {"count": 0, "columns": [], "results": [], "took_ms": 0.0}
+
+        panel, metrics = state
+        n = len(panel.ids)
+        limit = max(1, min(limit, SCREEN_LIMIT_MAX))
+
+        node = compile_filter(where or "")
+        keys = parse_sort(sort)
+
+        mask = _truth(node, metrics, n) if node is not None else np.ones(n, dtype=bool)
+        hits = np.flatnonzero(mask)
+
+        if keys:
+            # lexsort: last key is primary; NaN sorts last either way
+            order = np.lexsort([
+                -metrics[k][hits] if desc else metrics[k][hits]
+                for k, desc in reversed(keys)
+            ])
+            hits = hits[order]
+
+        if columns is None:
+            columns = []
+            for c in _names(node) + [k for k, _ in keys] + DEFAULT_COLUMNS:
+                if c not in columns:
+                    columns.append(c)
+        else:
+            for c in columns:
+                if c not in METRICS:
+                    raise ScreenError(f"unknown metric '{c}'")
+        columns = ["year"] + [c for c in columns if c != "year"]
+
+        top = hits[:limit]
+        results = []
+        for i in top.tolist():
+            row = {"company_id": panel.ids[i], "company_name": panel.names[i]}
+            for c in columns:
+                val = metrics[c][i]
+                row[c] = None if np.isnan(val) else round(float(val), 2)
+            if row["year"] is not None:
+                row["year"] = int(row["year"])
+            results.append(row)
+
+        return {
+            "count": int(hits.size),
+            "universe": n,
+            "columns": columns,
+            "results": results,
+            "took_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {
+            "loaded": state is not None,
+            "companies": state[0].shape[0] if state else 0,
+            "years": state[0].shape[1] if state else 0,
+            "build_seconds": round(self.build_seconds, 4),
+            "loaded_at": self.loaded_at,
+            "refreshes": self.refreshes,
+            "refreshed_companies": self.refreshed_companies,
+        }
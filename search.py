@@ -0,0 +1,409 @@
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# auto | pg_trgm | memory
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+
+# pg_trgm's default similarity threshold
+MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.3"))
+
+# how long the in-memory index may serve before reloading companies
+MEMORY_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# =====================================================
+# PG_TRGM BACKEND
+# =====================================================
+
+# Ranking (both backends): exact symbol > prefix > substring > similarity.
+# The LIKE / % / <% predicates are all served by the GIN trigram indexes
+# created in migration 4.
+PG_SEARCH_SQL = r"""
+    SELECT
+        c.company_id,
+        c.company_name,
+        GREATEST(
+            similarity(lower(c.company_id), %(q)s),
+            similarity(lower(c.company_name), %(q)s),
+            word_similarity(%(q)s, lower(c.company_name))
+        ) AS score,
+        lower(c.company_id) = %(q)s AS exact,
+        (lower(c.company_id) LIKE %(prefix)s
+            OR lower(c.company_name) LIKE %(prefix)s) AS prefix,
+        (lower(c.company_id) LIKE %(contains)s
+            OR lower(c.company_name) LIKE %(contains)s) AS contains
+    FROM companies c
+    WHERE lower(c.company_id) = %(q)s
+       OR lower(c.company_id) LIKE %(contains)s
+       OR lower(c.company_name) LIKE %(contains)s
+       OR lower(c.company_name) %% %(q)s
+       OR %(q)s <%% lower(c.company_name)
+    ORDER BY exact DESC, prefix DESC, contains DESC, score DESC, c.company_name
+    LIMIT %(limit)s
+"""
+
+
+# SET LOCAL: sent in one query string with the search, the statements
+# run as one implicit transaction, so the thresholds end with it instead
+# of staying on the pooled connection for its next user
+PG_THRESHOLD_SQL = (
+    f"SET LOCAL pg_trgm.similarity_threshold = {MIN_SIMILARITY:.3f};"
+    f"SET LOCAL pg_trgm.word_similarity_threshold = {MIN_SIMILARITY:.3f};"
+)
+
+
+class PgTrgmSearch:
+    backend = "pg_trgm"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        q = q.strip().lower()
+        if not q:
+            return []
+
+        like = escape_like(q)
+        params = {
+            "q": q,
+            "prefix": f"{like}%",
+            "contains": f"%{like}%",
+            "limit": limit,
+        }
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            # thresholds ride along in the same round trip
+            cur.execute(PG_THRESHOLD_SQL + PG_SEARCH_SQL, params)
+            rows = cur.fetchall()
+            cur.close()
+
+        return [
+            {
+                "company_id": r["company_id"],
+                "company_name": r["company_name"],
+                "score": round(1.0 if r["exact"] else float(r["score"] or 0), 3),
+            }
+            for r in rows
+        ]
+
+    def on_versions(self, versions: Dict[str, int]) -> int:
+        # queries the table directly, nothing to invalidate
+        return 0
+
+
+# =====================================================
+# IN-MEMORY FALLBACK (no extension available)
+# =====================================================
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Same trigram rules as pg_trgm: lowercase alphanumeric words,
+    padded with two leading spaces and one trailing space.
+    """
+    out: Set[str] = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            out.add(padded[i:i + 3])
+    return out
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class MemorySearch:
+    """
+    Pure-Python index over companies, rebuilt (by one request at a time)
+    every MEMORY_INDEX_TTL seconds or after invalidate(); on_versions()
+    is registered with page_cache.VersionPoller. Candidates come from an
+    exact-symbol dict, a sorted prefix list, one str.find pass over a
+    joined haystack and the rarest query trigrams, so a lookup never
+    scores the whole universe.
+    """
+    backend = "memory"
+
+    # bounded candidate sets keep typeahead latency flat at 10k+ companies
+    MAX_PREFIX = 100
+    MAX_SUBSTRING = 100
+    MAX_FUZZY = 100
+
+    def __init__(self, pool=None, ttl: float = MEMORY_INDEX_TTL):
+        self.pool = pool
+        self.ttl = ttl
+        self._loaded_at = 0.0
+        self._index: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._generation = 0     # bumped by invalidate()
+
+    # ---------- index ----------
+    def build(self, companies: List[Dict[str, Any]]) -> None:
+        docs = []
+        by_id: Dict[str, int] = {}
+        prefix_keys = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        hay_parts = []
+        starts = []
+        offset = 0
+
+        for i, c in enumerate(companies):
+            cid = str(c["company_id"])
+            name = c.get("company_name") or ""
+            id_lower, name_lower = cid.lower(), name.lower()
+            words = _WORD_RE.findall(name_lower)
+
+            docs.append({
+                "company_id": cid,
+                "company_name": name,
+                "id_lower": id_lower,
+                "name_lower": name_lower,
+                "id_grams": trigrams(cid),
+                "name_grams": trigrams(name),
+                "word_grams": [trigrams(w) for w in words],
+            })
+            by_id.setdefault(id_lower, i)
+
+            # symbol, full name and every word start inside the name
+            prefix_keys.append((id_lower, i))
+            prefix_keys.append((name_lower, i))
+            for m in _WORD_RE.finditer(name_lower):
+                if m.start():
+                    prefix_keys.append((name_lower[m.start():], i))
+
+            for g in docs[-1]["id_grams"] | docs[-1]["name_grams"]:
+                postings[g].append(i)
+
+            part = f"{id_lower}\x01{name_lower}\x00"
+            starts.append(offset)
+            hay_parts.append(part)
+            offset += len(part)
+
+        prefix_keys.sort()
+
+        # swap in one go so concurrent searches never see a half index
+        self._index = {
+            "docs": docs,
+            "by_id": by_id,
+            "prefix_keys": prefix_keys,
+            "postings": dict(postings),
+            "haystack": "".join(hay_parts),
+            "starts": starts,
+        }
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._loaded_at = 0.0
+
+    def on_versions(self, versions: Dict[str, int]) -> int:
+        """
+        VersionPoller listener: companies were (re)loaded, rebuild on the
+        next search.
+        """
+        self.invalidate()
+        return len(versions)
+
+    def _fresh(self) -> bool:
+        return bool(self._index) and time.monotonic() - self._loaded_at < self.ttl
+
+    def _ensure_loaded(self) -> None:
+        if self.pool is None or self._fresh():
+            return
+
+        # one rebuild at a time; meanwhile the others keep serving the
+        # stale index (or wait for the first one)
+        if not self._lock.acquire(blocking=not self._index):
+            return
+        try:
+            if self._fresh():
+                return
+
+            generation = self._generation
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT company_id, company_name FROM companies")
+                rows = cur.fetchall()
+                cur.close()
+
+            self.build(rows)
+            # invalidated while loading: those rows may be older
+            if self._generation != generation:
+                self._loaded_at = 0.0
+        finally:
+            self._lock.release()
+
+    # ---------- candidates ----------
+    def _candidates(
+        self, ix: Dict[str, Any], q: str, q_grams: Set[str], limit: int
+    ) -> Set[int]:
+        found: Set[int] = set()
+
+        if q in ix["by_id"]:
+            found.add(ix["by_id"][q])
+
+        keys = ix["prefix_keys"]
+        i = bisect_left(keys, (q,))
+        end = min(len(keys), i + self.MAX_PREFIX)
+        while i < end and keys[i][0].startswith(q):
+            found.add(keys[i][1])
+            i += 1
+
+        hay, starts = ix["haystack"], ix["starts"]
+        pos = hay.find(q)
+        hits = 0
+        while pos != -1 and hits < self.MAX_SUBSTRING:
+            doc = bisect_right(starts, pos) - 1
+            found.add(doc)
+            hits += 1
+            nxt = doc + 1
+            if nxt >= len(starts):
+                break
+            pos = hay.find(q, starts[nxt])
+
+        # exact / prefix / substring hits always outrank fuzzy-only ones,
+        # so trigram candidates only matter when those can't fill the page
+        if len(found) >= limit:
+            return found
+
+        # a doc reaching MIN_SIMILARITY must share at least one of the
+        # (n - need + 1) rarest query trigrams (pigeonhole); keep the
+        # docs sharing the most trigrams
+        postings = ix["postings"]
+        grams = sorted(q_grams, key=lambda g: len(postings.get(g, ())))
+        need = max(1, int(MIN_SIMILARITY * len(grams) + 0.999))
+        shared: Counter = Counter()
+        for g in grams[:len(grams) - need + 1]:
+            shared.update(postings.get(g, ()))
+        found.update(i for i, _ in shared.most_common(self.MAX_FUZZY))
+
+        return found
+
+    # ---------- query ----------
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        q = q.strip().lower()
+        if not q:
+            return []
+
+        self._ensure_loaded()
+        ix = self._index
+        if not ix:
+            return []
+
+        docs = ix["docs"]
+        q_grams = trigrams(q)
+
+        ranked = []
+        for i in self._candidates(ix, q, q_grams, limit):
+            d = docs[i]
+            exact = d["id_lower"] == q
+            prefix = d["id_lower"].startswith(q) or d["name_lower"].startswith(q)
+            contains = q in d["id_lower"] or q in d["name_lower"]
+
+            # word_similarity analogue: the name words touching the query
+            extent = set()
+            for wg in d["word_grams"]:
+                if wg & q_grams:
+                    extent |= wg
+
+            score = max(
+                similarity(q_grams, d["id_grams"]),
+                similarity(q_grams, d["name_grams"]),
+                similarity(q_grams, extent),
+            )
+            if not (exact or contains or score >= MIN_SIMILARITY):
+                continue
+            ranked.append((
+                (not exact, not prefix, not contains, -score, d["company_name"]),
+                exact,
+                score,
+                d,
+            ))
+
+        return [
+            {
+                "company_id": d["company_id"],
+                "company_name": d["company_name"],
+                "score": round(1.0 if exact else score, 3),
+            }
+            for _, exact, score, d in heapq.nsmallest(limit, ranked, key=lambda t: t[0])
+        ]
+
+
+# =====================================================
+# FACTORY
+# =====================================================
+
+def has_pg_trgm(pool) -> bool:
+    # connection errors propagate: "DB down" is not "no extension"
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        found = cur.fetchone() is not None
+        cur.close()
+    return found
+
+
+class AutoSearch:
+    """
+    SEARCH_BACKEND=auto: picks pg_trgm or the in-memory index on the first
+    search that reaches the database, so a DB that is down at boot doesn't
+    pin the process to the fallback. Until then backend is "auto" and
+    searches raise like any other query would.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> str:
+        return self._engine.backend if self._engine is not None else "auto"
+
+    def _resolve(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    found = has_pg_trgm(self.pool)
+                    self._engine = PgTrgmSearch(self.pool) if found else MemorySearch(self.pool)
+        return self._engine
+
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._resolve().search(q, limit)
+
+    def on_versions(self, versions: Dict[str, int]) -> int:
+        # nothing built yet before the first search
+        if self._engine is None:
+            return 0
+        return self._engine.on_versions(versions)
+
+
+def create_search_engine(pool, backend: Optional[str] = None):
+    backend = backend or SEARCH_BACKEND
+
+    if backend == "pg_trgm":
+        return PgTrgmSearch(pool)
+    if backend == "memory":
+        return MemorySearch(pool)
+    return AutoSearch(pool)
@@ -0,0 +1,407 @@
+import glob
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+# parquet (smallest on disk) | feather (Arrow IPC, fastest to read back)
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "parquet")
+
+# zstd | lz4 | snappy (parquet) | uncompressed; uncompressed feather
+# files are read zero-copy straight from the memory map
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+
+# companies per part file (bounds writer and reader memory)
+SNAPSHOT_PART_SIZE = int(os.getenv("SNAPSHOT_PART_SIZE", "500"))
+
+# also keep the indent-4 raw_data/<id>.json files (archival mode)
+RAW_JSON_ARCHIVE = os.getenv("RAW_JSON", "0") == "1"
+
+EXTENSIONS = {"parquet": ".parquet", "feather": ".arrow"}
+
+COMPANIES = "companies"
+
+# added to every row: the id of the payload it came from
+KEY = "_company"
+
+# companies-table columns that make the payload round trip exact
+SECTIONS_COL = "_sections"   # list sections present in payload["data"], in order
+EXTRA_COL = "_extra"         # anything in payload["data"] that isn't a list of dicts
+
+# per row, when its table has keys the row itself didn't: those keys (JSON
+# list), so readers drop them again instead of returning them as None
+MISSING_COL = "_missing"
+
+# schema metadata: columns whose values were JSON-encoded (mixed types)
+JSON_COLUMNS_META = b"snapshot.json_columns"
+
+
+# =====================================================
+# LAYOUT
+# =====================================================
+# <root>/section=<name>/run_date=<YYYY-MM-DD>/<run_id>-<part>.<ext>
+#
+# One table per payload section (companies, profitandloss, ...), one part
+# file per SNAPSHOT_PART_SIZE companies. run_id is the UTC start time of
+# the fetch run plus a random suffix (the work_queue.new_run_id scheme),
+# so lexical order is chronological and workers started in the same
+# second write separate runs. Older runs have no suffix.
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+
+
+def _run_date(run_id: str) -> str:
+    return f"{run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}"
+
+
+def _part_path(root: str, section: str, run_id: str, part: int, fmt: str) -> str:
+    return os.path.join(
+        root, f"section={section}", f"run_date={_run_date(run_id)}",
+        f"{run_id}-{part:05d}{EXTENSIONS[fmt]}"
+    )
+
+
+def _part_glob(run_id: str) -> str:
+    # "<run_id>-<part>.*" only: an old run id is a prefix of newer ones
+    return f"{run_id}-{'[0-9]' * 5}.*"
+
+
+def list_runs(root: str = SNAPSHOT_DIR) -> List[str]:
+    paths = glob.glob(os.path.join(root, f"section={COMPANIES}", "run_date=*", "*-00000.*"))
+    return sorted({os.path.basename(p).rsplit("-", 1)[0] for p in paths})
+
+
+def resolve_run(root: str = SNAPSHOT_DIR, run_id: str = "latest") -> Optional[str]:
+    runs = list_runs(root)
+    if not runs:
+        return None
+    if run_id == "latest":
+        return runs[-1]
+    return run_id if run_id in runs else None
+
+
+def list_sections(root: str, run_id: str) -> List[str]:
+    pattern = os.path.join(root, "section=*", f"run_date={_run_date(run_id)}", _part_glob(run_id))
+    return sorted({
+        os.path.basename(os.path.dirname(os.path.dirname(p))).split("=", 1)[1]
+        for p in glob.glob(pattern)
+    })
+
+
+def part_files(root: str, run_id: str, section: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(
+        root, f"section={section}", f"run_date={_run_date(run_id)}", _part_glob(run_id)
+    )))
+
+
+# =====================================================
+# ROWS <-> ARROW
+# =====================================================
+
+_NATIVE = (bool, int, float, str)
+
+
+def _column(values: List[Any]) -> Tuple[pa.Array, bool]:
+    """
+    Native Arrow array when every non-null value has the same Python type
+    (so 1 stays int and "1,234" stays str), JSON-encoded strings otherwise.
+    Returns (array, json_encoded).
+    """
+    types = {type(v) for v in values if v is not None}
+    if not types:
+        return pa.nulls(len(values)), False
+    if len(types) == 1 and next(iter(types)) in _NATIVE:
+        try:
+            return pa.array(values), False
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            pass  # e.g. ints beyond int64
+    return pa.array([None if v is None else json.dumps(v) for v in values], pa.string()), True
+
+
+def rows_to_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    names: "OrderedDict[str, None]" = OrderedDict()
+    for r in rows:
+        for k in r:
+            names.setdefault(k, None)
+
+    arrays, json_cols = [], []
+    for name in names:
+        arr, encoded = _column([r.get(name) for r in rows])
+        arrays.append(arr)
+        if encoded:
+            json_cols.append(name)
+
+    table = pa.table(arrays, names=list(names))
+    return table.replace_schema_metadata({JSON_COLUMNS_META: json.dumps(json_cols).encode()})
+
+
+def mark_missing(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Sets MISSING_COL on the rows that lack some of the keys other rows
+    have (no column at all when every row has every key).
+    """
+    names: "OrderedDict[str, None]" = OrderedDict()
+    for r in rows:
+        for k in r:
+            names.setdefault(k, None)
+
+    sparse = [(r, [k for k in names if k not in r]) for r in rows]
+    if any(missing for _, missing in sparse):
+        for r, missing in sparse:
+            r[MISSING_COL] = json.dumps(missing) if missing else None
+    return rows
+
+
+def drop_missing(row: Dict[str, Any]) -> Dict[str, Any]:
+    # snapshots written before MISSING_COL read back with every key
+    missing = row.pop(MISSING_COL, None)
+    if missing:
+        for k in json.loads(missing):
+            row.pop(k, None)
+    return row
+
+
+def table_to_rows(table: pa.Table) -> List[Dict[str, Any]]:
+    meta = table.schema.metadata or {}
+    json_cols = set(json.loads(meta.get(JSON_COLUMNS_META, b"[]")))
+
+    rows = table.to_pylist()
+    if json_cols:
+        for r in rows:
+            for c in json_cols:
+                if r.get(c) is not None:
+                    r[c] = json.loads(r[c])
+    return rows
+
+
+def read_part(path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """
+    One part file, memory-mapped; only `columns` (those present) are read.
+    """
+    if path.endswith(EXTENSIONS["feather"]):
+        if columns is not None:
+            with pa.memory_map(path) as source:
+                names = pa.ipc.open_file(source).schema.names
+            columns = [c for c in columns if c in names]
+        return feather.read_table(path, columns=columns, memory_map=True)
+
+    if columns is not None:
+        names = pq.read_schema(path, memory_map=True).names
+        columns = [c for c in columns if c in names]
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+# =====================================================
+# WRITER
+# =====================================================
+
+class SnapshotWriter:
+    """
+    Collects fetched payloads and writes them as one snapshot run.
+
+        with SnapshotWriter() as snap:
+            for cid, data in engine.iter_fetch(ids):
+                snap.add(data)
+
+    Payloads without a "company" / "data" dict are skipped (the loaders
+    would reject them anyway).
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR, run_id: Optional[str] = None,
+                 fmt: str = SNAPSHOT_FORMAT, compression: str = SNAPSHOT_COMPRESSION,
+                 part_size: int = SNAPSHOT_PART_SIZE):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"unknown snapshot format '{fmt}' (parquet or feather)")
+        self.root = root
+        self.run_id = run_id or new_run_id()
+        self.fmt = fmt
+        self.compression = compression
+        self.part_size = max(1, part_size)
+
+        self.part = 0
+        self.companies = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_ids: Set[Any] = set()
+
+    def add(self, payload: Dict[str, Any]) -> bool:
+        if not isinstance(payload, dict) \
+                or not isinstance(payload.get("company"), dict) \
+                or not isinstance(payload.get("data"), dict):
+            self.skipped += 1
+            return False
+
+        # rows are grouped back by company id, so a part holds each once
+        cid = payload["company"].get("id")
+        if cid in self._pending_ids:
+            self.flush()
+
+        self._pending.append(payload)
+        self._pending_ids.add(cid)
+        if len(self._pending) >= self.part_size:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+
+        tables: Dict[str, List[Dict[str, Any]]] = {COMPANIES: []}
+
+        for p in self._pending:
+            cid = p["company"].get("id")
+            sections, extra = [], {}
+
+            for name, value in p["data"].items():
+                if isinstance(value, list) and all(isinstance(r, dict) for r in value):
+                    sections.append(name)
+                    rows = tables.setdefault(name, [])
+                    rows.extend({KEY: cid, **r} for r in value)
+                else:
+                    extra[name] = value
+
+            tables[COMPANIES].append({
+                KEY: cid,
+                **p["company"],
+                SECTIONS_COL: json.dumps(sections),
+                EXTRA_COL: json.dumps(extra) if extra else None,
+            })
+
+        for section, rows in tables.items():
+            self._write(section, rows_to_table(mark_missing(rows)))
+
+        self.companies += len(self._pending)
+        self.part += 1
+        self._pending = []
+        self._pending_ids = set()
+
+    def _write(self, section: str, table: pa.Table) -> None:
+        path = _part_path(self.root, section, self.run_id, self.part, self.fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+
+        if self.fmt == "feather":
+            feather.write_feather(table, tmp, compression=self.compression)
+        else:
+            pq.write_table(table, tmp, compression=self.compression)
+
+        # readers never see a half-written part
+        os.replace(tmp, path)
+        self.bytes_written += os.path.getsize(path)
+
+    def close(self) -> Dict[str, Any]:
+        self.flush()
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "format": self.fmt,
+            "compression": self.compression,
+            "companies": self.companies,
+            "skipped": self.skipped,
+            "parts": self.part,
+            "bytes": self.bytes_written,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        print(f"🗄️ Snapshot {self.run_id}: {self.companies} companies, "
+              f"{self.part} part(s), {self.bytes_written / 1024:,.0f} KiB ({self.fmt})")
+
+
+# =====================================================
+# READERS
+# =====================================================
+
+def read_section(section: str, columns: Optional[List[str]] = None,
+                 run_id: str = "latest", root: str = SNAPSHOT_DIR) -> pa.Table:
+    """
+    One section of a run as a single Arrow table, reading only `columns`
+    (plus nothing else) from each part. JSON-encoded columns stay strings.
+    """
+    run = resolve_run(root, run_id)
+    if run is None:
+        raise FileNotFoundError(f"no snapshot run '{run_id}' in {root}")
+
+    tables = [read_part(p, columns) for p in part_files(root, run, section)]
+    if not tables:
+        return pa.table({})
+
+    # a column typed differently across parts (int in one, mixed -> JSON
+    # string in another) is read back as string everywhere
+    types: Dict[str, set] = {}
+    for t in tables:
+        for field in t.schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, set()).add(field.type)
+    mixed = [name for name, ts in types.items() if len(ts) > 1]
+
+    if mixed:
+        for i, t in enumerate(tables):
+            for name in mixed:
+                if name in t.column_names:
+                    idx = t.column_names.index(name)
+                    t = t.set_column(idx, name, t.column(name).cast(pa.string()))
+            tables[i] = t
+
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def iter_payloads(run_id: str = "latest", root: str = SNAPSHOT_DIR
+                  ) -> Iterator[Dict[str, Any]]:
+    """
+    Rebuilds the fetched payloads of a run, in fetch order, one part at
+    a time. Rows come back with the keys they were fetched with (a key
+    the API left out of one row stays out); key order within a row may
+    differ.
+    """
+    run = resolve_run(root, run_id)
+    if run is None:
+        raise FileNotFoundError(f"no snapshot run '{run_id}' in {root}")
+
+    sections = [s for s in list_sections(root, run) if s != COMPANIES]
+
+    for part_path in part_files(root, run, COMPANIES):
+        name = os.path.basename(part_path)
+        companies = table_to_rows(read_part(part_path))
+
+        # section -> company id -> rows (a part holds each company once)
+        grouped: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {}
+        for section in sections:
+            path = os.path.join(root, f"section={section}", f"run_date={_run_date(run)}", name)
+            by_company: Dict[Any, List[Dict[str, Any]]] = {}
+            if os.path.exists(path):
+                for r in table_to_rows(read_part(path)):
+                    by_company.setdefault(r.pop(KEY), []).append(drop_missing(r))
+            grouped[section] = by_company
+
+        for c in companies:
+            drop_missing(c)
+            cid = c.pop(KEY)
+            names = json.loads(c.pop(SECTIONS_COL))
+            extra = c.pop(EXTRA_COL)
+
+            data = {name: grouped.get(name, {}).get(cid, []) for name in names}
+            if extra:
+                data.update(json.loads(extra))
+
+            yield {"company": c, "data": data}
@@ -0,0 +1,215 @@
+import gzip
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+from bulk_loader import TABLE_COLUMNS
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+STATEMENTS = ("profitandloss", "balancesheet", "cashflow")
+
+# every column of the statement except the key; "year" is always returned
+STATEMENT_FIELDS: Dict[str, List[str]] = {
+    s: [c for c in TABLE_COLUMNS[s] if c != "company_id"] for s in STATEMENTS
+}
+
+SHAPES = ("rows", "columns")
+
+# responses smaller than this are sent uncompressed
+API_COMPRESS_MIN_BYTES = int(os.getenv("API_COMPRESS_MIN_BYTES", "1024"))
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+API_BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "5"))
+
+
+class StatementError(ValueError):
+    """
+    Bad statement / field / year arguments (HTTP 400 or 404 at the route).
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# =====================================================
+# ARGUMENTS
+# =====================================================
+
+def parse_fields(statement: str, fields: Optional[str]) -> List[str]:
+    """
+    "sales,net_profit" -> ["year", "sales", "net_profit"] (validated,
+    de-duplicated, request order kept). None / "" -> every column.
+    """
+    if statement not in STATEMENT_FIELDS:
+        raise StatementError(
+            f"unknown statement '{statement}' "
+            f"(expected one of: {', '.join(STATEMENTS)})",
+            status_code=404
+        )
+
+    allowed = STATEMENT_FIELDS[statement]
+    if not fields:
+        return list(allowed)
+
+    picked = ["year"]
+    for f in fields.split(","):
+        f = f.strip()
+        if not f or f in picked:
+            continue
+        if f not in allowed:
+            raise StatementError(f"unknown field '{f}' for {statement}")
+        picked.append(f)
+
+    return picked
+
+
+# =====================================================
+# QUERY
+# =====================================================
+# Statement years are labels like "Mar 2024"; the range filter and the
+# ordering use the 4-digit year inside them. The column list is only ever
+# built from STATEMENT_FIELDS, never from user input.
+
+STATEMENT_SQL = """
+    SELECT {columns}
+    FROM (
+        SELECT s.*, substring(s.year from '\\d{{4}}')::int AS _fy
+        FROM {table} s
+        WHERE s.company_id = %(cid)s
+    ) s
+    WHERE (%(from_year)s::int IS NULL OR s._fy >= %(from_year)s)
+      AND (%(to_year)s::int IS NULL OR s._fy <= %(to_year)s)
+    ORDER BY s._fy NULLS LAST, s.year, s.id
+"""
+
+COMPANY_EXISTS_SQL = "SELECT 1 FROM companies WHERE company_id = %s"
+
+
+def _statement_query(cid: str, statement: str, fields: List[str],
+                     from_year: Optional[int], to_year: Optional[int]
+                     ) -> Tuple[str, Dict[str, Any]]:
+    sql = STATEMENT_SQL.format(
+        columns=", ".join(f"s.{f}" for f in fields),
+        table=statement
+    )
+    return sql, {"cid": cid, "from_year": from_year, "to_year": to_year}
+
+
+def fetch_statement(conn, cid: str, statement: str, fields: List[str],
+                    from_year: Optional[int] = None,
+                    to_year: Optional[int] = None
+                    ) -> Optional[List[Dict[str, Any]]]:
+    """
+    Rows of one statement for one company, oldest year first.
+    Returns None when the company does not exist.
+    """
+    cur = conn.cursor()
+    cur.execute(*_statement_query(cid, statement, fields, from_year, to_year))
+    rows = cur.fetchall()
+
+    if not rows:
+        cur.execute(COMPANY_EXISTS_SQL, (cid,))
+        if cur.fetchone() is None:
+            rows = None
+
+    cur.close()
+    return rows
+
+
+async def afetch_statement(conn, cid: str, statement: str, fields: List[str],
+                           from_year: Optional[int] = None,
+                           to_year: Optional[int] = None
+                           ) -> Optional[List[Dict[str, Any]]]:
+    async with conn.cursor() as cur:
+        await cur.execute(*_statement_query(cid, statement, fields, from_year, to_year))
+        rows = await cur.fetchall()
+
+        if not rows:
+            await cur.execute(COMPANY_EXISTS_SQL, (cid,))
+            if await cur.fetchone() is None:
+                return None
+
+    return rows
+
+
+# =====================================================
+# RESPONSE
+# =====================================================
+
+def to_columns(rows: List[Dict[str, Any]], fields: List[str]) -> Dict[str, List[Any]]:
+    """
+    [{"year": .., "sales": ..}, ...] -> {"year": [...], "sales": [...]}
+    """
+    return {f: [r[f] for r in rows] for f in fields}
+
+
+def statement_payload(cid: str, statement: str, fields: List[str],
+                      rows: List[Dict[str, Any]], shape: str = "rows"
+                      ) -> Dict[str, Any]:
+    if shape not in SHAPES:
+        raise StatementError(f"unknown shape '{shape}' (expected rows or columns)")
+
+    return {
+        "company_id": cid,
+        "statement": statement,
+        "fields": fields,
+        "count": len(rows),
+        "data": to_columns(rows, fields) if shape == "columns" else rows,
+    }
+
+
+def pick_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    "br" if the client takes it and brotli is installed, else "gzip",
+    else None. Honours q=0.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def encode_body(payload: Any, accept_encoding: Optional[str] = None,
+                min_bytes: int = API_COMPRESS_MIN_BYTES
+                ) -> Tuple[bytes, Optional[str]]:
+    """
+    orjson-serialised payload, compressed when it is at least min_bytes
+    and the client accepts br / gzip. Returns (body, content-encoding).
+    """
+    body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+    if len(body) < min_bytes:
+        return body, None
+
+    encoding = pick_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(body, quality=API_BROTLI_QUALITY), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=API_GZIP_LEVEL, mtime=0), encoding
+    return body, None
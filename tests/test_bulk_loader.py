@@ -0,0 +1,56 @@
+from bulk_loader import (
+    COMPANY_COLUMNS,
+    TABLE_COLUMNS,
+    _csv_buffer,
+    integer_rows,
+    payload_rows,
+    to_int,
+)
+from benchmarks.synthetic import make_payload
+
+
+def test_to_int_rounds_numbers_and_decimal_text():
+    assert to_int(234.56) == 235
+    assert to_int("234.56") == 235
+    assert to_int(" 12 ") == 12
+    assert to_int(7) == 7
+    assert to_int(None) is None
+    # not a number: left for the database to reject
+    assert to_int("1,234") == "1,234"
+
+
+def test_integer_rows_only_touches_integer_columns():
+    payload = make_payload("X1", years=2, decimals=True)
+    rows = payload_rows(payload)
+
+    company = integer_rows("companies", COMPANY_COLUMNS, rows["companies"])[0]
+    by_col = dict(zip(COMPANY_COLUMNS, company))
+    assert type(by_col["face_value"]) is int
+    assert type(by_col["book_value"]) is int
+    # DECIMAL(10,2) columns keep their fractions
+    assert by_col["roe_percentage"] == payload["company"]["roe_percentage"]
+
+    cols = TABLE_COLUMNS["profitandloss"]
+    for r in integer_rows("profitandloss", cols, rows["profitandloss"]):
+        r = dict(zip(cols, r))
+        assert type(r["eps"]) is int and type(r["opm_percentage"]) is int
+        assert r["tax_percentage"] == "25%"
+
+
+def test_integer_rows_csv_has_no_decimals_for_int_columns():
+    rows = payload_rows(make_payload("X1", years=1, decimals=True))
+    text = _csv_buffer(integer_rows("companies", COMPANY_COLUMNS, rows["companies"])).read()
+    fields = dict(zip(COMPANY_COLUMNS, text.rstrip("\n").split(",")))
+    assert "." not in fields["face_value"] and "." not in fields["book_value"]
+
+
+def test_integer_rows_returns_clean_rows_unchanged():
+    rows = payload_rows(make_payload("X1", years=2))["balancesheet"]
+    assert integer_rows("balancesheet", TABLE_COLUMNS["balancesheet"], rows) == rows
+
+
+def test_csv_only_leaves_nulls_unquoted():
+    # COPY ... NULL '\N' matches unquoted fields only: text that reads
+    # "\N" (or is empty) must come through quoted
+    text = _csv_buffer([(None, "\\N", "", "a,b", 12, 2.5)]).read()
+    assert text == '\\N,"\\N","","a,b",12,2.5\n'
@@ -0,0 +1,35 @@
+import json
+
+from bulk_loader import payload_hash
+from ingest import prepare_payload, stream_payload
+from run_pipeline import clean_fetched
+from benchmarks.synthetic import make_payload
+
+
+def messy_payload():
+    p = make_payload("X1", years=3, decimals=True)
+    p["data"]["profitandloss"][0]["sales"] = "1,234"
+    p["data"]["balancesheet"][1]["reserves"] = "NA"
+    return p
+
+
+def test_pipeline_and_ingest_store_the_same_cleaned_payload():
+    raw = messy_payload()
+    cleaned, error = clean_fetched("X1", raw)
+    assert error is None
+    assert cleaned == prepare_payload(raw, "X1.json")["payload"]
+    assert cleaned["data"]["profitandloss"][0]["sales"] == 1234
+    assert cleaned["data"]["profitandloss"][0]["eps"] == round(raw["data"]["profitandloss"][0]["eps"])
+
+
+def test_pipeline_hash_matches_streamed_ingest_hash():
+    raw = messy_payload()
+    cleaned, _ = clean_fetched("X1", raw)
+    streamed = stream_payload(json.dumps(raw).encode(), "X1.json")["payload"]
+    assert payload_hash(cleaned) == streamed.content_hash
+    assert payload_hash(cleaned) != payload_hash(raw)
+
+
+def test_invalid_payload_is_an_error():
+    payload, error = clean_fetched("X1", {"company": {"id": "X1"}, "data": {"cashflow": []}})
+    assert payload is None and "Missing" in error
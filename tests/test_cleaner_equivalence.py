@@ -0,0 +1,209 @@
+"""
+The per-row cleaner (precompiled patterns, memoized string parsing) and
+the vectorized clean_financial_frame must give exactly what the original
+per-cell regex rules gave, on an edge-case corpus and on messy synthetic
+statements, with cold and warm caches.
+"""
+import copy
+import math
+import random
+import re
+
+import pandas as pd
+import pytest
+
+from pandas_cleaner import (
+    NON_NUMERIC_KEYS,
+    clean_financial_frame,
+    clean_financial_rows,
+    clear_parse_caches,
+    extract_period,
+    extract_year,
+    extract_year_series,
+    to_float,
+    to_float_series,
+)
+from benchmarks.synthetic import make_universe
+
+
+# ---------- the original rules, uncached ----------
+
+def ref_to_float(val):
+    if val is None:
+        return None
+    if isinstance(val, (int, float)):
+        return float(val)
+    if not isinstance(val, str):
+        return None
+    val = val.strip().replace(",", "")
+    if val.upper() in {"NULL", "NA", "N/A", ""}:
+        return None
+    nums = re.findall(r"-?\d+\.?\d*", val)
+    return float(nums[-1]) if nums else None
+
+
+def ref_extract_year(val):
+    if val is None:
+        return None
+    if isinstance(val, int):
+        return val
+    if isinstance(val, str):
+        m = re.search(r"\b(19|20)\d{2}\b", val)
+        if m:
+            return int(m.group())
+    return None
+
+
+def ref_extract_period(text):
+    return text.split(":")[0].strip() if isinstance(text, str) else None
+
+
+def ref_clean_financial_rows(rows):
+    out = []
+    for r in rows:
+        row = {}
+        for k, v in r.items():
+            key = k.lower()
+            if key == "year":
+                row[k] = ref_extract_year(v)
+            elif key in NON_NUMERIC_KEYS:
+                row[k] = v
+            else:
+                row[k] = ref_to_float(v)
+        out.append(row)
+    return out
+
+
+# ---------- corpus ----------
+
+# values the API has been seen to send (plus some it hopefully won't)
+EDGE_VALUES = [
+    None, 0, 1, -7, 1234, 12.5, -0.25, 10**15, True, False,
+    "", "   ", "NULL", "null", " NA ", "n/a", "N/A", "-", "--", "abc",
+    "1,234", "-1,234.50", "12%", "12.", ".5", "-.5", "+3", "1e5", "1E-3",
+    "10 Years: 11%", "TTM: -4%", "12.5.3", "1-2", "10--20", "3 - 4", "x 1.5",
+    "Rs. 1,00,000 Cr", "(123)", " 42 ", "4 2", "\x1c7\x1c", "٣", "１２", "inf", "nan",
+    "12\n%", [1, 2], {"a": 1}, (3,),
+]
+
+EDGE_YEARS = [
+    None, 2015, 1999, 0, "Mar 2015", "Dec 2012", "FY 2020", "FY20", "2015-16",
+    "Mar2015", "12 2099", "1899", "Sep 1990 / Mar 2001", "", "TTM", 2015.0,
+    "Mar ٢٠١٥", [2015],
+]
+
+
+def edge_rows():
+    rng = random.Random(7)
+    rows = []
+    for i in range(2000):
+        row = {"id": f"E{i}", "company_id": f"C{i % 17}", "year": rng.choice(EDGE_YEARS)}
+        for col in ("sales", "tax_percentage", "Net_Profit"):
+            # drop keys now and then: rows don't all share a schema
+            if rng.random() > 0.1:
+                row[col] = rng.choice(EDGE_VALUES)
+        rows.append(row)
+    return rows
+
+
+def messy_rows(companies=200):
+    # mostly ints, with the string forms the real API sends mixed in
+    rng = random.Random(0)
+    rows = []
+    for p in make_universe(companies, decimals=True):
+        for s in ("balancesheet", "profitandloss", "cashflow"):
+            for r in copy.deepcopy(p["data"][s]):
+                for k, v in r.items():
+                    if isinstance(v, int) and rng.random() < 0.15:
+                        r[k] = rng.choice([f"{v:,}", f"{v}%", "NA", f" {v} ", None])
+                rows.append(r)
+    return rows
+
+
+def same(a, b):
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, float) and math.isnan(a):
+        return math.isnan(b)
+    return a == b
+
+
+def assert_rows_equal(got, expected):
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        assert list(g) == list(e)
+        for k in e:
+            assert same(g[k], e[k]), (k, g[k], e[k])
+
+
+def frame_rows(frame, rows):
+    # frame back to clean_financial_rows() shape: each row's own keys
+    cols = {c: frame[c].astype(object).where(frame[c].notna(), None).tolist()
+            for c in frame.columns}
+    return [
+        {k: (v if k.lower() in NON_NUMERIC_KEYS and k.lower() != "year" else cols[k][i])
+         for k, v in r.items()}
+        for i, r in enumerate(rows)
+    ]
+
+
+# ---------- tests ----------
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    clear_parse_caches()
+    yield
+    clear_parse_caches()
+
+
+@pytest.mark.parametrize("value", EDGE_VALUES + EDGE_YEARS)
+def test_parsers_match_the_original_rules(value):
+    for _ in range(2):    # cold, then served from the cache
+        assert same(to_float(value), ref_to_float(value))
+        assert same(extract_year(value), ref_extract_year(value))
+        assert same(extract_period(value), ref_extract_period(value))
+
+
+@pytest.mark.parametrize("rows", [edge_rows(), messy_rows()], ids=["edge", "messy"])
+def test_clean_financial_rows_matches_the_original_rules(rows):
+    expected = ref_clean_financial_rows(rows)
+    assert_rows_equal(clean_financial_rows(rows), expected)
+    assert_rows_equal(clean_financial_rows(rows), expected)
+
+
+@pytest.mark.parametrize("rows", [edge_rows(), messy_rows()], ids=["edge", "messy"])
+def test_clean_financial_frame_matches_the_original_rules(rows):
+    expected = ref_clean_financial_rows(rows)
+    assert_rows_equal(frame_rows(clean_financial_frame(rows), rows), expected)
+
+    # same result from a DataFrame of the raw rows
+    raw = pd.DataFrame(rows, dtype=object)
+    assert_rows_equal(frame_rows(clean_financial_frame(raw), rows), expected)
+
+
+def test_clean_financial_frame_returns_typed_columns():
+    frame = clean_financial_frame([
+        {"id": 1, "company_id": "C1", "year": "Mar 2015", "sales": "1,234", "eps": 12},
+        {"id": 2, "company_id": "C1", "year": 2016, "sales": "NA", "eps": "12.5%"},
+    ])
+    assert frame["year"].dtype == "Int64"
+    assert frame["year"].tolist() == [2015, 2016]
+    assert frame["sales"].dtype == "float64" and frame["eps"].dtype == "float64"
+    assert frame["sales"].isna().tolist() == [False, True]
+    assert frame["eps"].tolist() == [12.0, 12.5]
+    assert frame["company_id"].tolist() == ["C1", "C1"]
+    assert clean_financial_frame([]).empty
+
+
+@pytest.mark.parametrize("value", EDGE_VALUES)
+def test_float_column_matches_per_cell(value):
+    expected = ref_to_float(value)
+    got = to_float_series(pd.Series([value, None], dtype=object)).tolist()
+    assert same(got[0], math.nan if expected is None else expected)
+    assert math.isnan(got[1])
+
+
+@pytest.mark.parametrize("value", EDGE_YEARS)
+def test_year_column_matches_per_cell(value):
+    year = extract_year_series(pd.Series([value, None], dtype=object))[0]
+    assert (None if pd.isna(year) else int(year)) == ref_extract_year(value)
@@ -0,0 +1,62 @@
+import psycopg2
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool
+
+
+class FakeConn:
+    autocommit = False
+
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    outcomes = []
+
+    def connect(dsn, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(db_pool.psycopg2, "connect", connect)
+    return outcomes
+
+
+def test_failed_connect_is_not_a_checkout(connects):
+    pool = ConnectionPool("postgresql://x", pool_size=1, max_overflow=0)
+    connects.append(psycopg2.OperationalError("down"))
+
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    stats = pool.stats()
+    assert stats["checkouts"] == 0
+    assert stats["open"] == 0
+
+    connects.append(FakeConn())
+    with pool.connection():
+        pass
+    assert pool.stats()["checkouts"] == 1
+
+
+def test_recycled_connection_is_replaced(connects):
+    pool = ConnectionPool("postgresql://x", pool_size=1, max_overflow=0, recycle=0)
+    old, new = FakeConn(), FakeConn()
+    connects.extend([old, new])
+
+    pool.putconn(pool.getconn())
+    assert pool.getconn() is new
+    assert old.closed
+    stats = pool.stats()
+    assert stats["recycled"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["open"] == 1
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import fetch_engine
+from benchmarks.stub_api import api_url, serve
+from benchmarks.synthetic import make_payload
+from fetch_cache import ResponseCache
+from fetch_engine import FetchEngine
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch_engine, "backoff_delay", lambda attempt, *a: 0.0)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**config):
+        server = serve(0, **config)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def engine_for(server, **kwargs):
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("burst", 100)
+    return FetchEngine(base_url=api_url(server), verbose=False, **kwargs)
+
+
+def test_fetch_returns_the_payload(stub):
+    with engine_for(stub()) as engine:
+        assert engine.fetch("C1") == json.loads(json.dumps(make_payload("C1")))
+        assert engine.stats["requests"] == 1
+        assert engine.stats["ok"] == 1
+
+
+def test_server_errors_are_retried(stub):
+    server = stub(fail_rate=0.5, seed=3)
+    ids = [f"C{i}" for i in range(20)]
+    with engine_for(server, retries=10, concurrency=4) as engine:
+        results = dict(engine.iter_fetch(ids))
+
+    assert sorted(results) == sorted(ids)
+    assert all(results[cid]["company"]["id"] == cid for cid in ids)
+    assert engine.stats["retries"] == server.config.counts["errors"] > 0
+    assert engine.stats["failed"] == 0
+
+
+def test_gives_up_after_retries(stub):
+    server = stub(fail_rate=1.0)
+    with engine_for(server, retries=3) as engine:
+        assert engine.fetch("C1") is None
+    assert engine.stats["requests"] == 3
+    assert engine.stats["retries"] == 2
+    assert engine.stats["failed"] == 1
+
+
+def test_unknown_endpoint_fails(stub):
+    server = stub()
+    engine = FetchEngine(base_url=api_url(server) + "x", verbose=False, retries=2, rate=1000)
+    with engine:
+        assert engine.fetch("C1") is None
+    assert engine.stats["failed"] == 1
+
+
+def test_fresh_cache_entry_skips_the_request(stub, tmp_path):
+    server = stub()
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=3600)
+    with engine_for(server, cache=cache) as engine:
+        first = engine.fetch("C1")
+        assert engine.fetch("C1") == first
+
+    assert server.config.counts["requests"] == 1
+    assert engine.stats["cache_miss"] == 1
+    assert engine.stats["cache_fresh"] == 1
+    assert engine.stats["bytes_saved"] == engine.stats["bytes"]
+
+
+def test_stale_entry_is_revalidated_with_304(stub, tmp_path):
+    server = stub()
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=0)
+    with engine_for(server, cache=cache) as engine:
+        first = engine.fetch("C1")
+        assert engine.fetch("C1") == first
+
+        server.config.bump(["C1"])
+        changed = engine.fetch("C1")
+        assert json.loads(cache.get("C1").body) == changed
+
+    assert changed != first
+    assert server.config.counts["not_modified"] == 1
+    assert engine.stats["cache_revalidated"] == 1
+    assert engine.stats["cache_miss"] == 2
+
+
+def test_same_body_without_etag_counts_as_unchanged(stub, tmp_path):
+    server = stub(etags=False)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=0)
+    with engine_for(server, cache=cache) as engine:
+        engine.fetch("C1")
+        engine.fetch("C1")
+
+    assert server.config.counts["requests"] == 2
+    assert engine.stats["cache_miss"] == 1
+    assert engine.stats["cache_unchanged"] == 1
@@ -0,0 +1,27 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import CompanyProfiler
+
+
+def test_profiled_calls_from_many_threads_run_one_at_a_time(tmp_path):
+    profiler = CompanyProfiler(top=3)
+    lock = threading.Lock()
+    active, overlap = [0], [0]
+
+    def work(i):
+        with lock:
+            active[0] += 1
+            overlap[0] = max(overlap[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return i
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: profiler.call(f"C{i}", work, i), range(16)))
+
+    assert results == list(range(16))
+    assert overlap[0] == 1
+    assert len(profiler.dump(str(tmp_path))) == 3
@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+
+import json_stream
+from json_stream import COMPANY, ROWS, SECTION, VALUE, iter_events
+from benchmarks.synthetic import make_payload
+
+
+def rebuild(events):
+    payload = {}
+    for kind, value in events:
+        if kind == COMPANY:
+            payload["company"] = value
+        elif kind == SECTION:
+            payload.setdefault("data", {})[value] = []
+        elif kind == ROWS:
+            name, rows = value
+            payload["data"][name].extend(rows)
+        elif kind == VALUE:
+            name, v = value
+            payload.setdefault("data", {})[name] = v
+    return payload
+
+
+def sample():
+    p = make_payload("C1", years=7)
+    p["data"]["note"] = {"source": "api", "tags": ["a", "b"]}
+    p["data"]["empty"] = []
+    p["meta"] = {"skipped": [1, 2, {"deep": True}]}
+    return p
+
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_stream, "ijson", None)
+    elif json_stream.ijson is None:
+        pytest.skip("ijson not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 256])
+def test_round_trip_from_bytes(parser, chunk_rows):
+    p = sample()
+    events = list(iter_events(json.dumps(p).encode(), chunk_rows=chunk_rows))
+
+    assert all(len(v[1]) <= chunk_rows for k, v in events if k == ROWS)
+    p.pop("meta")
+    assert rebuild(events) == p
+
+
+def test_round_trip_from_path_and_file(parser, tmp_path):
+    p = sample()
+    path = tmp_path / "C1.json"
+    path.write_text(json.dumps(p, indent=4))
+    p.pop("meta")
+
+    assert rebuild(iter_events(str(path))) == p
+    with open(path, "rb") as f:
+        assert rebuild(iter_events(f)) == p
+    assert rebuild(iter_events(io.BytesIO(path.read_bytes()))) == p
+
+
+def test_numbers_decode_like_json(parser):
+    p = {"company": {"id": "C1", "face_value": 10, "book_value": 234.56}, "data": {}}
+    company = dict(iter_events(json.dumps(p).encode()))[COMPANY]
+    assert company == p["company"]
+    assert type(company["face_value"]) is int and type(company["book_value"]) is float
+
+
+@pytest.mark.parametrize("body", [
+    b"[1, 2]",
+    b'{"company": {"id": "C1"}, "data": [1]}',
+    b'{"company": {"id": "C1"}, "data": {"profitandloss": [{"year": 1}',
+    b"not json",
+])
+def test_malformed_payloads_raise_value_error(parser, body):
+    with pytest.raises(ValueError):
+        list(iter_events(body))
@@ -0,0 +1,84 @@
+import pytest
+
+import screener as screener_module
+from benchmarks.synthetic import make_payload
+from panel import COMPANY_COLUMNS, PANEL_COLUMNS
+from screener import ScreenError, Screener, compile_filter, parse_sort
+
+
+@pytest.mark.parametrize("text", [
+    "__import__('os').system('true')",
+    "roe.__class__",
+    "[roe for roe in ()]",
+    "lambda: 1",
+    "roe > 'a'",
+    "roe > True",
+    "roe ** 2 > 1",
+    "roe in (1, 2)",
+    "roe is None",
+    "open('x')",
+    "roe if sales else eps",
+    "nosuchmetric > 1",
+])
+def test_filter_rejects_anything_outside_the_whitelist(text):
+    with pytest.raises(ScreenError):
+        compile_filter(text)
+
+
+def test_filter_syntax_error_is_a_screen_error():
+    with pytest.raises(ScreenError, match="invalid filter"):
+        compile_filter("roe >")
+
+
+def test_filter_accepts_metrics_percentages_and_commas():
+    assert compile_filter("") is None
+    assert compile_filter("ROE > 20, sales_cagr_5y > 15% and not debt_equity >= 0.5") is not None
+    assert compile_filter("-eps + net_profit / sales * 2 != 0") is not None
+
+
+@pytest.mark.parametrize("text", ["-" * 5000 + "1 > 0", "not " * 3000 + "roe"])
+def test_overlong_filter_is_a_screen_error(text):
+    with pytest.raises(ScreenError, match="longer than"):
+        compile_filter(text)
+
+
+@pytest.mark.parametrize("text", ["-" * 5000 + "1 > 0", "not " * 3000 + "roe"])
+def test_deeply_nested_filter_is_a_screen_error(text, monkeypatch):
+    monkeypatch.setattr(screener_module, "SCREEN_MAX_FILTER_CHARS", 10**6)
+    with pytest.raises(ScreenError, match="nested too deeply"):
+        compile_filter(text)
+
+
+def test_sort_rejects_unknown_metrics():
+    assert parse_sort("-roe, sales") == [("roe", True), ("sales", False)]
+    with pytest.raises(ScreenError):
+        parse_sort("__class__")
+
+
+def test_screen_over_a_loaded_panel():
+    payloads = [make_payload(f"C{i}", years=6) for i in range(8)]
+    companies = [
+        {"company_id": p["company"]["id"], "company_name": p["company"]["company_name"],
+         **{c: p["company"][c] for c in COMPANY_COLUMNS}}
+        for p in payloads
+    ]
+    statements = {t: [r for p in payloads for r in p["data"][t]] for t in PANEL_COLUMNS}
+
+    screener = Screener()
+    screener.load(companies, statements)
+
+    everyone = screener.screen(limit=100)
+    assert everyone["universe"] == everyone["count"] == 8
+
+    result = screener.screen("roe > 20", sort="-roe", limit=100)
+    roes = [r["roe"] for r in result["results"]]
+    assert roes == sorted(roes, reverse=True)
+    assert all(r > 20 for r in roes)
+    assert result["count"] == len(roes) < 8
+
+    with pytest.raises(ScreenError):
+        screener.screen("sales.__class__")
+
+    # the longest filter allowed still evaluates
+    deep = "-" * (screener_module.SCREEN_MAX_FILTER_CHARS - len("roe > 0")) + "roe > 0"
+    assert screener.screen(deep)["count"] >= 0
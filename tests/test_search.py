@@ -0,0 +1,123 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from search import AutoSearch, MemorySearch, create_search_engine
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        if "pg_extension" in sql:
+            self.rows = [{"?column?": 1}] if self.pool.trgm else []
+            return
+        self.pool.executed.append(sql)
+        self.pool.loads += 1
+        time.sleep(self.pool.delay)
+        self.rows = list(self.pool.companies)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """
+    Just enough of db_pool.ConnectionPool; down=True refuses connections.
+    """
+
+    def __init__(self, companies, trgm=False, down=False, delay=0.0):
+        self.companies = companies
+        self.trgm = trgm
+        self.down = down
+        self.delay = delay
+        self.loads = 0
+        self.executed = []
+
+    @contextmanager
+    def connection(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+        conn = type("Conn", (), {"cursor": lambda _: FakeCursor(self)})()
+        yield conn
+
+
+COMPANIES = [
+    {"company_id": "TCS", "company_name": "Tata Consultancy Services"},
+    {"company_id": "INFY", "company_name": "Infosys"},
+]
+
+
+def test_auto_backend_is_decided_once_the_db_is_reachable():
+    pool = FakePool(COMPANIES, down=True)
+    engine = create_search_engine(pool, "auto")
+    assert isinstance(engine, AutoSearch)
+
+    with pytest.raises(ConnectionError):
+        engine.search("tcs")
+    assert engine.backend == "auto"
+
+    pool.down = False
+    assert engine.search("tcs")[0]["company_id"] == "TCS"
+    assert engine.backend == "memory"
+
+
+def test_auto_picks_pg_trgm_when_the_extension_exists():
+    engine = create_search_engine(FakePool(COMPANIES, trgm=True), "auto")
+    engine._resolve()
+    assert engine.backend == "pg_trgm"
+
+
+def test_on_versions_rebuilds_the_memory_index():
+    pool = FakePool(list(COMPANIES))
+    engine = MemorySearch(pool, ttl=3600)
+    assert engine.search("wipro") == []
+
+    pool.companies.append({"company_id": "WIPRO", "company_name": "Wipro"})
+    assert engine.search("wipro") == []          # still within the TTL
+
+    engine.on_versions({"WIPRO": 1})
+    assert engine.search("wipro")[0]["company_id"] == "WIPRO"
+    assert pool.loads == 2
+
+
+def test_concurrent_searches_build_the_index_once():
+    pool = FakePool(COMPANIES, delay=0.05)
+    engine = MemorySearch(pool, ttl=3600)
+
+    threads = [threading.Thread(target=engine.search, args=("infy",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pool.loads == 1
+
+    # a stale index keeps serving while one request rebuilds
+    engine.invalidate()
+    threads = [threading.Thread(target=engine.search, args=("infy",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pool.loads == 2
+
+
+def test_pg_trgm_thresholds_are_scoped_to_the_search():
+    pool = FakePool(COMPANIES, trgm=True)
+    pool.companies = [{**COMPANIES[0], "score": 1.0, "exact": True}]
+    engine = create_search_engine(pool, "pg_trgm")
+    assert engine.search("tcs")[0]["company_id"] == "TCS"
+
+    statements = [s.strip() for s in pool.executed[0].split(";") if s.strip().startswith("SET")]
+    assert len(statements) == 2
+    assert all(s.startswith("SET LOCAL pg_trgm.") for s in statements)
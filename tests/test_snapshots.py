@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from bulk_loader import payload_hash
+from history import run_time
+from ingest import clean_payload
+from snapshots import MISSING_COL, SnapshotWriter, iter_payloads, list_runs, read_section
+from benchmarks.synthetic import make_payload, make_universe
+
+
+@pytest.mark.parametrize("fmt,compression", [
+    ("parquet", "zstd"), ("parquet", "snappy"), ("feather", "lz4"), ("feather", "uncompressed"),
+])
+def test_round_trip_across_parts(tmp_path, fmt, compression):
+    raw = list(make_universe(7, years=4, decimals=True))
+    raw[2]["data"]["note"] = {"source": "api"}
+    raw[4]["data"]["documents"] = []
+
+    with SnapshotWriter(root=str(tmp_path), run_id="r1", fmt=fmt,
+                        compression=compression, part_size=3) as snap:
+        for p in raw:
+            assert snap.add(p)
+        assert not snap.add({"company": "bad"})
+
+    assert snap.summary()["parts"] == 3
+    assert snap.skipped == 1
+    assert list(iter_payloads("latest", root=str(tmp_path))) == raw
+
+
+def test_same_company_twice_goes_to_a_new_part(tmp_path):
+    first, again = make_payload("A1", years=2), make_payload("A1", years=3)
+    with SnapshotWriter(root=str(tmp_path), run_id="r1") as snap:
+        snap.add(first)
+        snap.add(again)
+
+    assert snap.part == 2
+    assert list(iter_payloads("r1", root=str(tmp_path))) == [first, again]
+
+
+def test_runs_are_listed_and_unknown_runs_raise(tmp_path):
+    for run_id in ("20260101T000000Z", "20260102T000000Z"):
+        with SnapshotWriter(root=str(tmp_path), run_id=run_id) as snap:
+            snap.add(make_payload(run_id[6:8], years=1))
+
+    assert list_runs(str(tmp_path)) == ["20260101T000000Z", "20260102T000000Z"]
+    assert next(iter_payloads(root=str(tmp_path)))["company"]["id"] == "02"
+    with pytest.raises(FileNotFoundError):
+        next(iter_payloads("nope", root=str(tmp_path)))
+
+
+def sparse_payload(cid):
+    p = make_payload(cid, years=3)
+    del p["data"]["profitandloss"][0]["eps"]
+    del p["data"]["balancesheet"][2]["reserves"]
+    p["data"]["profitandloss"][1]["remarks"] = "restated"
+    del p["company"]["website"]
+    return p
+
+
+def test_sparse_rows_rebuild_without_the_missing_keys(tmp_path):
+    raw = [sparse_payload("A1"), make_payload("A2", years=3)]
+    with SnapshotWriter(root=str(tmp_path), run_id="r1") as snap:
+        for p in raw:
+            snap.add(p)
+
+    rebuilt = list(iter_payloads("r1", root=str(tmp_path)))
+    assert rebuilt == raw
+    assert "eps" not in rebuilt[0]["data"]["profitandloss"][0]
+    assert "website" not in rebuilt[0]["company"]
+
+    for before, after in zip(raw, rebuilt):
+        assert payload_hash(clean_payload(after)) == payload_hash(clean_payload(before))
+
+
+def test_explicit_none_is_kept(tmp_path):
+    p = make_payload("A1", years=2)
+    p["data"]["cashflow"][0]["net_cash_flow"] = None
+    with SnapshotWriter(root=str(tmp_path), run_id="r1") as snap:
+        snap.add(p)
+
+    rebuilt = next(iter_payloads("r1", root=str(tmp_path)))
+    assert "net_cash_flow" in rebuilt["data"]["cashflow"][0]
+    assert rebuilt == p
+
+
+def test_dense_parts_have_no_missing_column(tmp_path):
+    with SnapshotWriter(root=str(tmp_path), run_id="r1") as snap:
+        snap.add(make_payload("A1", years=2))
+    assert MISSING_COL not in read_section("profitandloss", run_id="r1", root=str(tmp_path)).column_names
+
+
+def test_writers_started_in_the_same_second_keep_separate_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr("time.gmtime", lambda *a: time.struct_time((2026, 1, 2, 3, 4, 5, 4, 2, 0)))
+    first, second = SnapshotWriter(root=str(tmp_path)), SnapshotWriter(root=str(tmp_path))
+    first.add(make_payload("A1", years=2))
+    second.add(make_payload("B1", years=2))
+    first.close()
+    second.close()
+
+    assert first.run_id != second.run_id
+    assert first.run_id.startswith("20260102T030405Z-")
+    assert sorted(list_runs(str(tmp_path))) == sorted([first.run_id, second.run_id])
+    for snap, cid in ((first, "A1"), (second, "B1")):
+        assert [p["company"]["id"] for p in iter_payloads(snap.run_id, root=str(tmp_path))] == [cid]
+        assert run_time(snap.run_id).isoformat() == "2026-01-02T03:04:05+00:00"
+
+
+def test_old_run_ids_do_not_pick_up_newer_parts(tmp_path):
+    for run_id in ("20260102T030405Z", "20260102T030405Z-abc123"):
+        with SnapshotWriter(root=str(tmp_path), run_id=run_id) as snap:
+            snap.add(make_payload(run_id[-3:], years=1))
+
+    old = list(iter_payloads("20260102T030405Z", root=str(tmp_path)))
+    assert [p["company"]["id"] for p in old] == ["05Z"]
@@ -0,0 +1,28 @@
+import pytest
+
+import run_pipeline
+from work_queue import new_run_id
+
+
+def test_run_ids_started_in_the_same_second_differ():
+    ids = {new_run_id() for _ in range(200)}
+    assert len(ids) == 200
+    assert len({i.split("-")[0] for i in ids}) <= 2
+
+
+def test_plain_run_is_new_and_resume_joins_the_open_run(monkeypatch):
+    created = []
+    monkeypatch.setattr(run_pipeline, "get_company_ids", lambda: ["A", "B"])
+    monkeypatch.setattr(run_pipeline, "join_or_create_run", lambda conn, ids: ("open-run", False))
+    monkeypatch.setattr(run_pipeline, "create_run",
+                        lambda conn, ids: created.append(list(ids)) or "new-run")
+    monkeypatch.setattr(run_pipeline, "run_exists", lambda conn, run_id: run_id == "old-run")
+
+    assert run_pipeline.open_run(None) == "new-run"
+    assert created == [["A", "B"]]
+
+    assert run_pipeline.open_run(None, resume=True) == "open-run"
+    assert run_pipeline.open_run(None, resume="old-run") == "old-run"
+    with pytest.raises(SystemExit):
+        run_pipeline.open_run(None, resume="missing-run")
+    assert len(created) == 1
@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+
+from db_pool import POOL_SIZE
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# WARMUP=0: no startup warming, /ready is OK as soon as the app serves
+# (first requests then pay for connects, template compiles, index loads)
+WARMUP_ENABLED = os.getenv("WARMUP", "1") == "1"
+
+# pool connections opened before the app reports ready
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(POOL_SIZE)))
+
+# load the screener panel during warmup (the slowest step on a big universe)
+WARMUP_SCREENER = os.getenv("WARMUP_SCREENER", "1") == "1"
+
+# failed steps (DB not reachable yet) are retried this often
+WARMUP_RETRY_S = float(os.getenv("WARMUP_RETRY_S", "5"))
+
+# freshness of fingerprinted static URLs (?v=<content hash>)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+
+# =====================================================
+# STATIC ASSET FINGERPRINTS
+# =====================================================
+
+class StaticAssets:
+    """
+    Content hash of every file under directory, taken once per process:
+    url("home.css") -> "/static/home.css?v=3f1c9a0b2e". A deploy that
+    changes a file changes its URL, so browsers and CDNs can keep the
+    old one forever. Unknown paths get a plain URL.
+    """
+
+    def __init__(self, directory: str, prefix: str = "/static"):
+        self.directory = directory
+        self.prefix = prefix
+        self._hashes: Optional[Dict[str, str]] = None
+
+    def scan(self) -> int:
+        hashes = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    hashes[rel] = hashlib.blake2b(f.read(), digest_size=5).hexdigest()
+
+        # swap in one go; scan() may race the first url() call
+        self._hashes = hashes
+        return len(hashes)
+
+    def version(self, path: str) -> Optional[str]:
+        if self._hashes is None:
+            self.scan()
+        return self._hashes.get(path.replace(os.sep, "/").lstrip("/"))
+
+    def url(self, path: str) -> str:
+        version = self.version(path)
+        url = f"{self.prefix}/{path.lstrip('/')}"
+        return f"{url}?v={version}" if version else url
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles whose responses to the current ?v= fingerprint are
+    immutable for STATIC_MAX_AGE; any other URL revalidates (ETag).
+    """
+
+    def __init__(self, assets: StaticAssets, **kwargs: Any):
+        super().__init__(directory=assets.directory, **kwargs)
+        self.assets = assets
+
+    async def get_response(self, path: str, scope) -> Any:
+        response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 304):
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            version = query.get("v", [None])[0]
+            if version is not None and version == self.assets.version(path):
+                response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+# =====================================================
+# WARMUP STEPS
+# =====================================================
+
+def warm_templates(templates) -> int:
+    """
+    Compiles every template into the Jinja environment's cache, so the
+    first render after a deploy doesn't parse and compile it.
+    """
+    env = templates.env
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def warm_pool(pool, connections: int = WARMUP_CONNECTIONS) -> int:
+    """
+    Opens up to pool_size connections (held together, so each is a new
+    one) and returns them idle. Returns how many.
+    """
+    conns = []
+    try:
+        for _ in range(max(1, min(connections, pool.pool_size))):
+            conns.append(pool.getconn())
+        with conns[0].cursor() as cur:
+            cur.execute("SELECT 1")
+    finally:
+        for conn in conns:
+            pool.putconn(conn)
+    return len(conns)
+
+
+def warm_search(engine) -> str:
+    # MemorySearch loads its index on the first lookup
+    engine.search("a", limit=1)
+    return engine.backend
+
+
+def warm_screener(screener) -> int:
+    # loads the company x year panel; returns the universe size
+    return screener.screen(limit=1).get("universe", 0)
+
+
+# =====================================================
+# READINESS
+# =====================================================
+
+class Readiness:
+    """
+    Named warmup checks. Ready once every expected check has passed;
+    report() is the /ready body.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ready_after: Optional[float] = None
+        self._checks: Dict[str, Dict[str, Any]] = {}
+
+    def expect(self, *names: str) -> None:
+        for name in names:
+            self._checks.setdefault(name, {"ok": False})
+
+    def ok(self, name: str) -> bool:
+        return self._checks.get(name, {}).get("ok", False)
+
+    def _record(self, name: str, t0: float, result: Any = None,
+                error: Optional[Exception] = None) -> bool:
+        check = {"ok": error is None, "seconds": round(time.perf_counter() - t0, 4)}
+        if error is None:
+            check["result"] = result
+        else:
+            check["error"] = str(error)
+            check["attempts"] = self._checks.get(name, {}).get("attempts", 0) + 1
+        self._checks[name] = check
+        return error is None
+
+    def run(self, name: str, fn: Callable[..., Any], *args: Any) -> bool:
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            return self._record(name, t0, error=e)
+        return self._record(name, t0, result)
+
+    async def arun(self, name: str, fn: Callable[..., Any], *args: Any) -> bool:
+        t0 = time.perf_counter()
+        try:
+            result = await fn(*args)
+        except Exception as e:
+            return self._record(name, t0, error=e)
+        return self._record(name, t0, result)
+
+    @property
+    def ready(self) -> bool:
+        return all(c["ok"] for c in self._checks.values())
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "ready_after_s": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "checks": self._checks,
+        }
+
+
+def start_warmup(state, readiness: Readiness, retry_s: float = WARMUP_RETRY_S) -> asyncio.Task:
+    """
+    Registers the cache checks with readiness, then warms in a background
+    task (app.state holds the pools and caches): opens pool connections,
+    loads the search index and the screener panel, retrying failed steps
+    until all pass. Cancel the task on shutdown.
+    """
+    steps = {
+        "db_pool": (warm_pool, state.db_pool),
+        "search": (warm_search, state.search),
+    }
+    if WARMUP_SCREENER:
+        steps["screener"] = (warm_screener, state.screener)
+
+    readiness.expect(*steps)
+    if state.db_apool is not None:
+        readiness.expect("db_apool")
+
+    return asyncio.create_task(_warm(state, readiness, steps, retry_s))
+
+
+async def _warm(state, readiness: Readiness, steps: Dict[str, tuple], retry_s: float) -> None:
+    warned = False
+    while True:
+        if state.db_apool is not None and not readiness.ok("db_apool"):
+            await readiness.arun("db_apool", state.db_apool.wait, retry_s)
+
+        for name, (fn, *args) in steps.items():
+            if not readiness.ok(name):
+                await run_in_threadpool(readiness.run, name, fn, *args)
+
+        report = readiness.report()
+        if report["ready"]:
+            readiness.ready_after = time.monotonic() - readiness.started
+            took = ", ".join(f"{n} {c['seconds']:.2f}s" for n, c in report["checks"].items())
+            print(f"🔥 Warm after {readiness.ready_after:.2f}s ({took})")
+            return
+
+        # DB not reachable yet: /ready shows each check's error, keep trying
+        if not warned:
+            failed = [n for n, c in report["checks"].items() if not c["ok"]]
+            print(f"⚠️ warmup: {', '.join(failed)} not ready, retrying every {retry_s:g}s")
+            warned = True
+        await asyncio.sleep(retry_s)
@@ -0,0 +1,434 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from psycopg2.extras import RealDictCursor
+
+from instrumentation import Histogram
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+WEB_METRICS_ENABLED = os.getenv("WEB_METRICS", "1") == "1"
+
+# queries slower than this are printed and kept for /health/queries
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "50"))
+
+# distinct (route, fingerprint) pairs tracked; the rest share "<other>"
+QUERY_FINGERPRINTS_MAX = int(os.getenv("QUERY_FINGERPRINTS_MAX", "500"))
+
+# Server-Timing header (db / render / total ms) on every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+BACKGROUND = "<background>"   # queries outside a request (poller, screener load)
+UNMATCHED = "<unmatched>"     # requests no route matched (404s)
+OTHER = "<other>"
+
+
+# =====================================================
+# SQL FINGERPRINTS
+# =====================================================
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """
+    SQL with literals and parameters replaced by ? and whitespace
+    collapsed, so every execution of one statement shares a key.
+    """
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def query_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:12]
+
+
+def _sql_text(query: Any, cursor: Any) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    try:
+        return query.as_string(cursor)   # psycopg2 / psycopg sql.Composed
+    except Exception:
+        return str(query)
+
+
+# =====================================================
+# REQUEST CONTEXT
+# =====================================================
+# One RequestTiming per request, in a ContextVar: run_in_threadpool copies
+# the context into the worker thread, and the object itself is shared, so
+# queries on sync routes add to the same totals as async ones.
+
+class RequestTiming:
+    __slots__ = ("scope", "db_seconds", "queries", "render_seconds")
+
+    def __init__(self, scope: Dict[str, Any]):
+        self.scope = scope
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.render_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("web_request_timing", default=None)
+
+
+def route_of(scope: Dict[str, Any], root_path: str = "") -> str:
+    """
+    The matched route's path template (/company/{cid}), a mount prefix
+    (/static), or UNMATCHED.
+    """
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    mount = scope.get("root_path", "")
+    if mount != root_path:
+        return mount[len(root_path):] or "/"
+    return UNMATCHED
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name: str, labels: str, hist: Histogram) -> List[str]:
+    lines = [f'{name}_bucket{{{labels},le="{le}"}} {n}' for le, n in hist.cumulative()]
+    lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+
+# =====================================================
+# REGISTRY
+# =====================================================
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db = Histogram()
+        self.render = Histogram()
+        self.statuses: Dict[int, int] = {}
+        self.queries = 0
+
+
+class QueryStats:
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        self.id = query_id(fp)
+        self.latency = Histogram()
+        self.rows = 0
+        self.slow = 0
+
+
+class WebMetrics:
+    """
+    Per-process request and query metrics (each uvicorn worker keeps its
+    own; Prometheus sums them across scrapes of every instance).
+
+      routes   latency / DB time / render time histograms and status
+               counts per (method, route template)
+      queries  latency histogram, rows and slow count per
+               (route, SQL fingerprint)
+      slow     the last SLOW_QUERY_LOG_SIZE queries above SLOW_QUERY_MS
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS,
+                 max_fingerprints: int = QUERY_FINGERPRINTS_MAX):
+        self.slow_ms = slow_ms
+        self.max_fingerprints = max_fingerprints
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.queries: Dict[Tuple[str, str], QueryStats] = {}
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    # ---------- recording ----------
+    def record_request(self, method: str, route: str, status: int,
+                       seconds: float, timing: RequestTiming) -> None:
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.latency.observe(seconds)
+            stats.db.observe(timing.db_seconds)
+            if timing.render_seconds:
+                stats.render.observe(timing.render_seconds)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.queries += timing.queries
+
+    def record_query(self, sql: str, rows: int, seconds: float) -> None:
+        timing = _current.get()
+        route = route_of(timing.scope) if timing is not None else BACKGROUND
+        if timing is not None:
+            timing.db_seconds += seconds
+            timing.queries += 1
+
+        fp = fingerprint(sql)
+        slow = seconds * 1000 >= self.slow_ms
+
+        with self._lock:
+            key = (route, fp)
+            stats = self.queries.get(key)
+            if stats is None:
+                if len(self.queries) >= self.max_fingerprints:
+                    key = (route, OTHER)
+                    stats = self.queries.get(key)
+                if stats is None:
+                    stats = self.queries[key] = QueryStats(key[1])
+            stats.latency.observe(seconds)
+            stats.rows += max(rows, 0)
+            if slow:
+                stats.slow += 1
+                self.slow.append({
+                    "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "route": route,
+                    "ms": round(seconds * 1000, 2),
+                    "rows": rows,
+                    "query_id": stats.id,
+                    "fingerprint": fp,
+                })
+
+        if slow:
+            print(f"🐢 slow query {seconds * 1000:.1f}ms rows={rows} [{route}] {fp[:200]}")
+
+    def record_render(self, seconds: float) -> None:
+        timing = _current.get()
+        if timing is not None:
+            timing.render_seconds += seconds
+
+    # ---------- reports ----------
+    def query_report(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        Fingerprints by total time, for /health/queries.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "route": route,
+                    "query_id": q.id,
+                    "fingerprint": q.fingerprint,
+                    "count": q.latency.count,
+                    "total_ms": round(q.latency.sum * 1000, 2),
+                    "mean_ms": round(q.latency.sum / q.latency.count * 1000, 3),
+                    "p95_ms": round(q.latency.quantile(0.95) * 1000, 3),
+                    "max_ms": round(q.latency.max * 1000, 3),
+                    "rows": q.rows,
+                    "slow": q.slow,
+                }
+                for (route, _), q in self.queries.items() if q.latency.count
+            ]
+            slow = list(self.slow)
+
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "fingerprints": len(rows),
+            "top": rows[:limit],
+            "recent_slow": slow[::-1],
+        }
+
+    def prometheus(self) -> str:
+        """
+        Everything in the Prometheus text exposition format.
+        """
+        with self._lock:
+            routes = sorted(self.routes.items())
+            queries = sorted(self.queries.items())
+
+            out = [
+                "# TYPE web_process_start_time_seconds gauge",
+                f"web_process_start_time_seconds {self.started_at:.0f}",
+                "# TYPE web_requests_total counter",
+            ]
+            for (method, route), s in routes:
+                for status, n in sorted(s.statuses.items()):
+                    out.append(f'web_requests_total{{method="{method}",route="{_label(route)}",'
+                               f'status="{status}"}} {n}')
+
+            for metric, attr in (("web_request_seconds", "latency"),
+                                 ("web_request_db_seconds", "db"),
+                                 ("web_request_render_seconds", "render")):
+                out.append(f"# TYPE {metric} histogram")
+                for (method, route), s in routes:
+                    hist = getattr(s, attr)
+                    if hist.count:
+                        out += _histogram_lines(
+                            metric, f'method="{method}",route="{_label(route)}"', hist)
+
+            out.append("# TYPE web_request_queries_total counter")
+            for (method, route), s in routes:
+                out.append(f'web_request_queries_total{{method="{method}",'
+                           f'route="{_label(route)}"}} {s.queries}')
+
+            out.append("# TYPE web_db_query_seconds histogram")
+            for (route, _), q in queries:
+                out += _histogram_lines(
+                    "web_db_query_seconds", f'route="{_label(route)}",query_id="{q.id}"', q.latency)
+
+            for metric, attr in (("web_db_query_rows_total", "rows"),
+                                 ("web_db_slow_queries_total", "slow")):
+                out.append(f"# TYPE {metric} counter")
+                for (route, _), q in queries:
+                    out.append(f'{metric}{{route="{_label(route)}",query_id="{q.id}"}} '
+                               f'{getattr(q, attr)}')
+
+            # query_id -> SQL, joinable in PromQL (group_left)
+            out.append("# TYPE web_db_query_info gauge")
+            for q in {q.id: q for _, q in queries}.values():
+                out.append(f'web_db_query_info{{query_id="{q.id}",'
+                           f'fingerprint="{_label(q.fingerprint[:200])}"}} 1')
+
+        return "\n".join(out) + "\n"
+
+
+METRICS = WebMetrics()
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times every HTTP request, collects the DB and
+    render time spent inside it, and records them under the matched route
+    template once the response is sent. Adds a Server-Timing header.
+    """
+
+    def __init__(self, app, metrics: WebMetrics = METRICS,
+                 server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope)
+        token = _current.set(timing)
+        root_path = scope.get("root_path", "")
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    value = (f"db;dur={timing.db_seconds * 1000:.1f};desc=\"{timing.queries} queries\", "
+                             f"render;dur={timing.render_seconds * 1000:.1f}, "
+                             f"app;dur={(time.perf_counter() - t0) * 1000:.1f}")
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", value.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            self.metrics.record_request(
+                scope["method"], route_of(scope, root_path), status,
+                time.perf_counter() - t0, timing
+            )
+
+
+# =====================================================
+# TRACED CURSORS / TEMPLATES
+# =====================================================
+
+class TracingCursor(RealDictCursor):
+    """
+    RealDictCursor that records every execute() in METRICS.
+    """
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            METRICS.record_query(_sql_text(query, self), self.rowcount,
+                                 time.perf_counter() - t0)
+
+    def executemany(self, query, vars_list):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            METRICS.record_query(_sql_text(query, self), self.rowcount,
+                                 time.perf_counter() - t0)
+
+
+def sync_cursor_factory():
+    """
+    cursor_factory for db_pool.create_pool().
+    """
+    return TracingCursor if WEB_METRICS_ENABLED else RealDictCursor
+
+
+_async_cursor = None
+
+
+def async_cursor_factory():
+    """
+    psycopg 3 AsyncCursor subclass recording execute() in METRICS (None
+    when metrics are off); built on first use, psycopg being optional.
+    """
+    global _async_cursor
+    if not WEB_METRICS_ENABLED:
+        return None
+
+    if _async_cursor is None:
+        from psycopg import AsyncCursor
+
+        class TracingAsyncCursor(AsyncCursor):
+            async def execute(self, query, params=None, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await super().execute(query, params, **kwargs)
+                finally:
+                    METRICS.record_query(_sql_text(query, self), self.rowcount,
+                                         time.perf_counter() - t0)
+
+        _async_cursor = TracingAsyncCursor
+    return _async_cursor
+
+
+class TimedTemplates(Jinja2Templates):
+    """
+    Jinja2Templates whose TemplateResponse (which renders eagerly) counts
+    as the request's render time.
+    """
+
+    def TemplateResponse(self, *args: Any, **kwargs: Any):
+        t0 = time.perf_counter()
+        try:
+            return super().TemplateResponse(*args, **kwargs)
+        finally:
+            METRICS.record_render(time.perf_counter() - t0)
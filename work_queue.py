@@ -0,0 +1,404 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import socket
+import sys
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+from db_pool import DB_SSLMODE
+from fetch_engine import backoff_delay
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# a claimed job is reclaimable by other workers once its lease runs out
+# (worker crashed / machine gone)
+PIPELINE_LEASE_S = float(os.getenv("PIPELINE_LEASE_S", "300"))
+
+# companies claimed per round (one fetch + load batch)
+PIPELINE_CLAIM_SIZE = int(os.getenv("PIPELINE_CLAIM_SIZE", "50"))
+
+# attempts before a company is marked failed for the run
+PIPELINE_MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "5"))
+
+# requeue backoff: full jitter, base * 2^(attempt-1) capped
+PIPELINE_RETRY_BASE = float(os.getenv("PIPELINE_RETRY_BASE", "30"))
+PIPELINE_RETRY_MAX = float(os.getenv("PIPELINE_RETRY_MAX", "1800"))
+
+# a worker with nothing claimable waits for retries / expiring leases at
+# most this long before leaving the rest to a later --resume
+PIPELINE_WAIT_S = float(os.getenv("PIPELINE_WAIT_S", "120"))
+
+# session advisory lock held while a worker looks for an open run and
+# creates one, so workers started together all join the same run
+RUN_LOCK_KEY = 0x70697065
+
+PENDING, FETCHED, LOADED, FAILED = "pending", "fetched", "loaded", "failed"
+STATES = (PENDING, FETCHED, LOADED, FAILED)
+
+
+def get_conn():
+    conn = psycopg2.connect(
+        os.environ["DATABASE_URL"],
+        sslmode=DB_SSLMODE,
+        connect_timeout=5
+    )
+    conn.autocommit = True
+    return conn
+
+
+def _cursor(conn):
+    # tuple rows whatever cursor factory the connection uses
+    return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+# =====================================================
+# RUNS
+# =====================================================
+
+def new_run_id() -> str:
+    # sorts by start time; the suffix keeps runs started in the same second apart
+    return f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+
+
+def create_run(conn, company_ids: Iterable[str], run_id: Optional[str] = None) -> str:
+    """
+    A new queue run with one pending job per company.
+    """
+    ids = list(dict.fromkeys(str(c) for c in company_ids))
+    run_id = run_id or new_run_id()
+
+    # one transaction: a run is never visible half enqueued
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    cur = _cursor(conn)
+    try:
+        cur.execute(
+            "INSERT INTO pipeline_runs (run_id, companies) VALUES (%s, %s)",
+            (run_id, len(ids))
+        )
+        execute_values(
+            cur,
+            "INSERT INTO pipeline_jobs (run_id, company_id) VALUES %s",
+            [(run_id, cid) for cid in ids],
+            page_size=1000
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.autocommit = autocommit
+    return run_id
+
+
+def latest_open_run(conn) -> Optional[str]:
+    cur = _cursor(conn)
+    cur.execute("""
+        SELECT run_id FROM pipeline_runs
+        WHERE finished_at IS NULL
+        ORDER BY created_at DESC, run_id DESC
+        LIMIT 1
+    """)
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else None
+
+
+def join_or_create_run(conn, company_ids: Callable[[], Iterable[str]]) -> Tuple[str, bool]:
+    """
+    The latest open run, or (when there is none) a new one over
+    company_ids(). Returns (run_id, created). Serialized across workers
+    by RUN_LOCK_KEY, so a fleet started at once shares one run.
+    """
+    cur = _cursor(conn)
+    cur.execute("SELECT pg_advisory_lock(%s)", (RUN_LOCK_KEY,))
+    try:
+        run_id = latest_open_run(conn)
+        if run_id is not None:
+            return run_id, False
+        return create_run(conn, company_ids()), True
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (RUN_LOCK_KEY,))
+        cur.close()
+
+
+def run_exists(conn, run_id: str) -> bool:
+    cur = _cursor(conn)
+    cur.execute("SELECT 1 FROM pipeline_runs WHERE run_id = %s", (run_id,))
+    found = cur.fetchone() is not None
+    cur.close()
+    return found
+
+
+# =====================================================
+# WORK QUEUE
+# =====================================================
+
+class WorkQueue:
+    """
+    The jobs of one pipeline run in Postgres, shared by any number of
+    workers on any number of machines.
+
+    claim() leases due jobs with FOR UPDATE SKIP LOCKED, so concurrent
+    workers never get the same company while its lease holds; a job whose
+    worker died is reclaimed when the lease expires. Every state change
+    is committed immediately: a crashed run resumes from the table.
+
+    Needs an autocommit connection (get_conn()).
+    """
+
+    def __init__(self, conn, run_id: str, owner: Optional[str] = None,
+                 lease_s: float = PIPELINE_LEASE_S,
+                 max_attempts: int = PIPELINE_MAX_ATTEMPTS):
+        self.conn = conn
+        self.run_id = run_id
+        self.owner = owner or worker_name()
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+
+    def _execute(self, sql: str, args: Tuple) -> List[Tuple]:
+        cur = _cursor(self.conn)
+        try:
+            cur.execute(sql, args)
+            return cur.fetchall() if cur.description else []
+        finally:
+            cur.close()
+
+    def claim(self, limit: int = PIPELINE_CLAIM_SIZE) -> List[str]:
+        """
+        Leases up to limit due jobs (pending, or fetched but never loaded)
+        to this worker. Returns their company ids.
+        """
+        # MATERIALIZED: a subquery the planner rescans would lock a new
+        # set of rows (SKIP LOCKED) on every rescan and claim too many
+        rows = self._execute("""
+            WITH due AS MATERIALIZED (
+                SELECT company_id FROM pipeline_jobs
+                WHERE run_id = %s
+                  AND state IN ('pending', 'fetched')
+                  AND next_attempt_at <= now()
+                  AND (lease_expires IS NULL OR lease_expires < now())
+                ORDER BY next_attempt_at, company_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE pipeline_jobs j
+            SET lease_owner = %s,
+                lease_expires = now() + make_interval(secs => %s),
+                attempts = j.attempts + 1,
+                updated_at = now()
+            FROM due
+            WHERE j.run_id = %s AND j.company_id = due.company_id
+            RETURNING j.company_id
+        """, (self.run_id, limit, self.owner, self.lease_s, self.run_id))
+        return sorted(r[0] for r in rows)
+
+    def mark(self, company_ids: List[str], state: str) -> None:
+        """
+        fetched / loaded. fetched also renews the lease for the load.
+        """
+        if not company_ids:
+            return
+        self._execute("""
+            UPDATE pipeline_jobs
+            SET state = %s,
+                lease_expires = CASE WHEN %s = 'loaded' THEN NULL
+                                     ELSE now() + make_interval(secs => %s) END,
+                lease_owner = CASE WHEN %s = 'loaded' THEN NULL ELSE lease_owner END,
+                last_error = CASE WHEN %s = 'loaded' THEN NULL ELSE last_error END,
+                updated_at = now()
+            WHERE run_id = %s AND company_id = ANY(%s) AND state <> 'loaded'
+        """, (state, state, self.lease_s, state, state, self.run_id, company_ids))
+
+    def fail(self, company_id: str, error: str) -> str:
+        """
+        Back to pending after a backoff, or failed after max_attempts.
+        Only while this worker holds the lease. Returns the new state.
+        """
+        rows = self._execute("""
+            SELECT attempts FROM pipeline_jobs
+            WHERE run_id = %s AND company_id = %s AND lease_owner = %s
+              AND state IN ('pending', 'fetched')
+        """, (self.run_id, company_id, self.owner))
+        if not rows:
+            return ""   # lease lost: the new owner decides
+
+        attempts = rows[0][0]
+        state = FAILED if attempts >= self.max_attempts else PENDING
+        delay = backoff_delay(attempts - 1, PIPELINE_RETRY_BASE, PIPELINE_RETRY_MAX)
+
+        self._execute("""
+            UPDATE pipeline_jobs
+            SET state = %s,
+                next_attempt_at = now() + make_interval(secs => %s),
+                lease_owner = NULL,
+                lease_expires = NULL,
+                last_error = %s,
+                updated_at = now()
+            WHERE run_id = %s AND company_id = %s AND lease_owner = %s
+        """, (state, delay, error[:500], self.run_id, company_id, self.owner))
+        return state
+
+    def release(self) -> None:
+        """
+        Gives back every lease this worker still holds (clean shutdown).
+        """
+        self._execute("""
+            UPDATE pipeline_jobs
+            SET lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1
+            WHERE run_id = %s AND lease_owner = %s AND state IN ('pending', 'fetched')
+        """, (self.run_id, self.owner))
+
+    def reclaim_local(self) -> int:
+        """
+        Expires the leases of workers on this host whose process is gone,
+        so a --resume right after a crash doesn't wait out the lease.
+        """
+        host = socket.gethostname()
+        owners = self._execute("""
+            SELECT DISTINCT lease_owner FROM pipeline_jobs
+            WHERE run_id = %s AND lease_owner LIKE %s AND state IN ('pending', 'fetched')
+        """, (self.run_id, f"{host}:%"))
+
+        dead = []
+        for (owner,) in owners:
+            pid = owner[len(host) + 1:].split(":")[0]
+            if owner == self.owner or not pid.isdigit():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                dead.append(owner)
+            except PermissionError:
+                pass   # alive, another user's process
+
+        if not dead:
+            return 0
+        rows = self._execute("""
+            UPDATE pipeline_jobs SET lease_expires = now()
+            WHERE run_id = %s AND lease_owner = ANY(%s) AND state IN ('pending', 'fetched')
+            RETURNING company_id
+        """, (self.run_id, dead))
+        return len(rows)
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute(
+            "SELECT state, count(*) FROM pipeline_jobs WHERE run_id = %s GROUP BY state",
+            (self.run_id,)
+        )
+        counts = {s: 0 for s in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def next_due_in(self) -> Optional[float]:
+        """
+        Seconds until some open job becomes claimable (retry due or lease
+        expiring); None when the run has no open jobs left.
+        """
+        rows = self._execute("""
+            SELECT EXTRACT(EPOCH FROM min(GREATEST(next_attempt_at,
+                                                   COALESCE(lease_expires, next_attempt_at)))
+                                      - now())
+            FROM pipeline_jobs
+            WHERE run_id = %s AND state IN ('pending', 'fetched')
+        """, (self.run_id,))
+        due = rows[0][0] if rows else None
+        return None if due is None else max(0.0, float(due))
+
+    def finish_if_done(self) -> bool:
+        """
+        Marks the run finished once no job is pending or fetched.
+        """
+        rows = self._execute("""
+            UPDATE pipeline_runs SET finished_at = now()
+            WHERE run_id = %s AND finished_at IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM pipeline_jobs
+                  WHERE run_id = %s AND state IN ('pending', 'fetched')
+              )
+            RETURNING run_id
+        """, (self.run_id, self.run_id))
+        return bool(rows) or self.next_due_in() is None
+
+    def requeue_failed(self) -> int:
+        rows = self._execute("""
+            UPDATE pipeline_jobs
+            SET state = 'pending', attempts = 0, next_attempt_at = now(), updated_at = now()
+            WHERE run_id = %s AND state = 'failed'
+            RETURNING company_id
+        """, (self.run_id,))
+        if rows:
+            self._execute("UPDATE pipeline_runs SET finished_at = NULL WHERE run_id = %s",
+                          (self.run_id,))
+        return len(rows)
+
+    def summary(self) -> str:
+        c = self.counts()
+        return (f"🧾 Run {self.run_id}: {c[LOADED]} loaded, {c[PENDING]} pending, "
+                f"{c[FETCHED]} fetched, {c[FAILED]} failed")
+
+
+def claim_rounds(queue: WorkQueue, size: int = PIPELINE_CLAIM_SIZE,
+                 wait_s: float = PIPELINE_WAIT_S) -> Iterable[List[str]]:
+    """
+    Claimed batches until the run has no open jobs, or none becomes
+    claimable within wait_s (left for a later --resume).
+    """
+    while True:
+        batch = queue.claim(size)
+        if batch:
+            yield batch
+            continue
+
+        due = queue.next_due_in()
+        if due is None or due > wait_s:
+            return
+        time.sleep(min(max(due, 0.5), 5.0))
+
+
+# =====================================================
+# CLI
+# =====================================================
+#   python work_queue.py status [RUN]
+#   python work_queue.py requeue-failed [RUN]
+
+if __name__ == "__main__":
+    conn = get_conn()
+    args = sys.argv[1:] or ["status"]
+    run = args[1] if len(args) > 1 else latest_open_run(conn)
+
+    if run is None or not run_exists(conn, run):
+        print("ℹ️  no open pipeline run")
+    elif args[0] == "requeue-failed":
+        q = WorkQueue(conn, run)
+        print(f"🔁 {q.requeue_failed()} failed companies back to pending")
+        print(q.summary())
+    else:
+        q = WorkQueue(conn, run)
+        print(q.summary())
+        cur = _cursor(conn)
+        cur.execute("""
+            SELECT company_id, attempts, last_error FROM pipeline_jobs
+            WHERE run_id = %s AND last_error IS NOT NULL
+            ORDER BY updated_at DESC LIMIT 20
+        """, (run,))
+        for cid, attempts, error in cur.fetchall():
+            print(f"   ❌ {cid:<12} attempt {attempts}: {error}")
+        cur.close()
+
+    conn.close()